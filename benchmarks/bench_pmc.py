@@ -0,0 +1,272 @@
+"""
+InfuenceMaximizer(PMC)のベンチマーク
+
+合成グラフ(generators.py)に対して、以下の経過時間とスループット、ピークメモリを計測してJSONに書き出す
+- make_random_DAGs : R回分のlive-edgeの抽選, 強連結成分分解, ハブの探索
+- gain : 最初のラウンドの全ノードのgainの計算
+- update : 最良のノードをR回分のDAGから消去する
+- run : 新しいInfuenceMaximizerでのrun()全体(フェーズごとの内訳はRunStats)
+ピークメモリを計測ごとに分けるため、各計測は別プロセスで実行する
+デフォルトは1000〜100000ノード、100万ノードは --sizes で指定する(R=50で数GBのメモリが必要)
+
+Example
+-------
+$ python -m benchmarks.bench_pmc --sizes 1000 10000 --output results.json
+$ python -m benchmarks.bench_pmc --generators follower --sizes 1000000 -R 20
+$ python -m benchmarks.bench_pmc --sizes 1000 10000 --output new.json --compare results.json
+$ python -m benchmarks.bench_pmc --sizes 5000 20000 -R 8 --calibrate
+"""
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from benchmarks.generators import GENERATORS
+from influence.pmc import InfuenceMaximizer
+from influence.csr import reachable_weights
+from influence.stats import peak_rss
+
+
+def bench_case(generator, n, R, k, seed, options):
+    """
+    1つのグラフについて各フェーズを計測する
+
+    Parameters
+    ----------
+    generator : str
+        GENERATORSの名前
+    n : int
+        ノード数
+    R : int
+        シミュレーション数
+    k : int
+        選ぶノード数
+    seed : int
+        グラフとシミュレーションの乱数のseed
+    options : dict
+        InfuenceMaximizerのその他の引数(backend, greedy, n_jobs, n_hubsなど)
+
+    Returns
+    -------
+    result : dict
+        計測結果(timesは秒, throughputは1秒あたりの処理量, peak_rssはバイト)
+        peak_rssはこのプロセスのみ、peak_rss_childrenはGainPoolのworker(n_jobs > 1)のうち最大のもの
+    """
+    start = time.perf_counter()
+    network = GENERATORS[generator](n, seed=seed)
+    generate = time.perf_counter() - start
+    m = len(network)
+
+    inf = InfuenceMaximizer(network, k, R, seed=seed, progress=False, **options)
+    try:
+        start = time.perf_counter()
+        inf.make_random_DAGs()
+        dags = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if inf.backend == 'array':
+            gains = inf.all_node_gains()
+        else:
+            gains = np.array([inf.node_gain(l) for l in range(len(inf.nodes))])
+        gain = time.perf_counter() - start
+
+        t = inf.nodes[np.argmax(gains)]
+        start = time.perf_counter()
+        # runと同じく、n_jobs > 1ではGainPoolのworkerでupdateする
+        inf.update_all(t)
+        update = time.perf_counter() - start
+        dag_stats = inf.stats.as_dict()['dags']
+    finally:
+        # n_jobs > 1のworkerと共有メモリを残さない
+        inf.close_gain_pool()
+    del inf
+
+    inf = InfuenceMaximizer(network, k, R, seed=seed, progress=False, **options)
+    try:
+        start = time.perf_counter()
+        S = inf.run()
+        run = time.perf_counter() - start
+    finally:
+        inf.close_gain_pool()
+
+    return {
+        'generator': generator,
+        'n': n,
+        'm': m,
+        'R': R,
+        'k': k,
+        'seed': seed,
+        'options': options,
+        'times': {'generate': generate, 'make_random_DAGs': dags, 'gain': gain, 'update': update, 'run': run},
+        'throughput': {
+            'snapshots_per_sec': R / dags,
+            'edges_per_sec': R * m / dags,
+            'node_gains_per_sec': R * len(gains) / gain,
+            'updates_per_sec': R / update if update > 0 else None,
+        },
+        'dags': dag_stats,
+        'run_stats': inf.stats.as_dict(),
+        'S': [int(v) for v in S],
+        'peak_rss': peak_rss(),
+        'peak_rss_children': peak_rss(children=True),
+    }
+
+
+def calibrate(generators, sizes, R, seed):
+    """
+    最初のラウンドの各スナップショットで、reachable_weightsと、全ノードのgain_arrayの経過時間を計測し、
+    InfuenceMaximizerがどちらを使うかを見積もるコスト(kernel_word_costなど)を最小二乗法で求める
+    コストはgain_arrayで1ノード訪れる時間を1とした相対値
+
+    Returns
+    -------
+    costs : dict
+        {'kernel_word_cost', 'kernel_fixed_cost', 'bfs_call_cost' : 値}
+    """
+    kernel, bfs = [], []
+    for generator in generators:
+        for n in sizes:
+            inf = InfuenceMaximizer(GENERATORS[generator](n, seed=seed), 1, R, seed=seed, progress=False)
+            inf.make_random_DAGs()
+            # 初回の呼び出しの準備の時間を含めないように、1回実行しておく
+            reachable_weights(inf.G[0], inf.G[0].weight)
+            for i in range(R):
+                dag = inf.G[i]
+                rows = np.count_nonzero(np.diff(dag.indptr))
+                cols = np.count_nonzero(np.diff(dag.rindptr))
+                weight = np.where(inf.V[i], dag.weight, 0)
+                start = time.perf_counter()
+                reachable_weights(dag, weight)
+                kernel.append((-(-cols // 64) * (rows + len(dag.indices)), time.perf_counter() - start))
+
+                stale = np.flatnonzero(inf.V[i] & ~inf.latest[i])
+                visited = inf.stats.counters['bfs_visited']
+                start = time.perf_counter()
+                for v in stale.tolist():
+                    inf.gain_array(i, v)
+                bfs.append((len(stale), inf.stats.counters['bfs_visited'] - visited, time.perf_counter() - start))
+            print(f'{generator} n={n} done', flush=True)
+
+    # 大きいグラフに引きずられないように、相対誤差で当てはめる
+    kernel, bfs = np.array(kernel), np.array(bfs)
+    x = np.c_[kernel[:, 0], np.ones(len(kernel))] / kernel[:, 1:]
+    (word, fixed), *_ = np.linalg.lstsq(x, np.ones(len(kernel)), rcond=None)
+    (call, visit), *_ = np.linalg.lstsq(bfs[:, :2] / bfs[:, 2:], np.ones(len(bfs)), rcond=None)
+    print(f'reachable_weights: {word * 1e9:.1f}ns/word + {fixed * 1e6:.1f}us, '
+          f'gain_array: {call * 1e6:.2f}us/call + {visit * 1e6:.2f}us/visit')
+    return {'kernel_word_cost': word / visit, 'kernel_fixed_cost': fixed / visit, 'bfs_call_cost': call / visit}
+
+
+def run_isolated(args):
+    """
+    別プロセスでbench_caseを実行する(ピークメモリをプロセスごとに測るため)
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(bench_case, *args).result()
+
+
+def metadata():
+    """
+    実行環境の情報
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': multiprocessing.cpu_count(),
+        'commit': commit or None,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def compare(results, baseline):
+    """
+    同じ条件の計測結果の経過時間とピークメモリの比(今回 / 基準)を表示する
+
+    Parameters
+    ----------
+    results : list of dict
+        今回の計測結果
+    baseline : list of dict
+        基準の計測結果
+
+    Returns
+    -------
+    ratios : list of dict
+        [{'case': (generator, n, R, k), 'times': {フェーズ : 比}, 'peak_rss': 比}, ...]
+    """
+    def case(r):
+        return r['generator'], r['n'], r['R'], r['k'], json.dumps(r['options'], sort_keys=True)
+
+    base = {case(r): r for r in baseline}
+    ratios = []
+    for r in results:
+        b = base.get(case(r))
+        if b is None:
+            continue
+        times = {name: r['times'][name] / b['times'][name]
+                 for name in r['times'] if b['times'].get(name)}
+        peak = r['peak_rss'] / b['peak_rss'] if r['peak_rss'] and b['peak_rss'] else None
+        ratios.append({'case': case(r)[:4], 'times': times, 'peak_rss': peak})
+        print(case(r)[:4], ' '.join(f'{name}={ratio:.2f}x' for name, ratio in times.items()),
+              f'peak_rss={peak:.2f}x' if peak else '')
+    return ratios
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='InfuenceMaximizer benchmark')
+    parser.add_argument('--generators', nargs='+', default=list(GENERATORS), choices=list(GENERATORS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000])
+    parser.add_argument('-R', type=int, default=50)
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backend', default='array')
+    parser.add_argument('--greedy', default='exhaustive')
+    parser.add_argument('--n-jobs', type=int, default=1)
+    parser.add_argument('--n-hubs', type=int, default=1)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help='比較する基準の結果ファイル')
+    parser.add_argument('--calibrate', action='store_true',
+                        help='計測せず、InfuenceMaximizerのkernel_word_costなどを求めて表示する')
+    args = parser.parse_args(argv)
+
+    if args.calibrate:
+        costs = calibrate(args.generators, args.sizes, args.R, args.seed)
+        print(' '.join(f'{name}={value:.3g}' for name, value in costs.items()))
+        return
+
+    options = {'backend': args.backend, 'greedy': args.greedy}
+    if args.n_jobs != 1:
+        options['n_jobs'] = args.n_jobs
+    if args.n_hubs != 1:
+        options['n_hubs'] = args.n_hubs
+
+    results = []
+    for generator in args.generators:
+        for n in args.sizes:
+            result = run_isolated((generator, n, args.R, args.k, args.seed, options))
+            results.append(result)
+            print(f"{generator} n={n} m={result['m']} " +
+                  ' '.join(f'{name}={seconds:.3f}s' for name, seconds in result['times'].items()) +
+                  f" peak_rss={(result['peak_rss'] or 0) / 2**20:.0f}MiB"
+                  f" (workers {(result['peak_rss_children'] or 0) / 2**20:.0f}MiB)", flush=True)
+
+    with open(args.output, 'w') as f:
+        json.dump({'meta': metadata(), 'args': vars(args), 'results': results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)['results'])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import numpy as np
+
+
+def barabasi_albert(n, m=3, prob=0.1, seed=None):
+    """
+    Barabási–Albertモデル(優先的選択)で有向グラフを作る
+    新しいノードは既存のm個のノードを次数に比例した確率で選んでフォローし、
+    フォローされたノードから新しいノードへ枝を張る(影響はフォローされた側から伝わる)
+
+    Parameters
+    ----------
+    n : int
+        ノード数
+    m : int
+        新しいノードがフォローするノード数
+    prob : float
+        全ての枝の枝確率
+    seed : int, optional
+        乱数のseed
+
+    Returns
+    -------
+    network : ndarray of float64
+        [[from_node, to_node, probability], ...]
+    """
+    rng = np.random.default_rng(seed)
+    # これまでの枝の両端を並べた配列から一様に選ぶと、次数に比例した確率で選ぶことになる
+    ends = np.empty(2 * m * n, dtype=np.int64)
+    ends[:m] = np.arange(m)
+    size = m
+    src = np.empty(m * (n - m), dtype=np.int64)
+    dst = np.empty(m * (n - m), dtype=np.int64)
+    for v in range(m, n):
+        targets = np.unique(ends[rng.integers(0, size, m)])
+        e = (v - m) * m
+        src[e:e + len(targets)] = targets
+        dst[e:e + len(targets)] = v
+        # 重複して選ばれた場合は、残りを-1にして後で除く
+        src[e + len(targets):e + m] = -1
+        ends[size:size + len(targets)] = targets
+        ends[size + len(targets):size + 2 * len(targets)] = v
+        size += 2 * len(targets)
+    keep = src >= 0
+    src, dst = src[keep], dst[keep]
+    return np.c_[src, dst, np.full(len(src), prob)].astype(np.float64)
+
+
+def follower_graph(n, mean_degree=10, exponent=2.1, seed=None):
+    """
+    フォロー関係に似た有向グラフを作る
+    フォロー数(入次数)はべき分布に従い、フォローされやすさもべき分布の人気度に比例させる
+    枝確率はweighted cascade(1 / 終点の入次数)とする
+
+    Parameters
+    ----------
+    n : int
+        ノード数
+    mean_degree : float
+        平均のフォロー数(重複と自己ループを除く前)
+    exponent : float
+        フォロー数と人気度のべき指数
+    seed : int, optional
+        乱数のseed
+
+    Returns
+    -------
+    network : ndarray of float64
+        [[from_node, to_node, probability], ...]
+    """
+    rng = np.random.default_rng(seed)
+    # フォロー数は1以上のべき分布を平均がmean_degreeになるように縮める
+    follows = rng.pareto(exponent - 1, n) + 1
+    follows = np.minimum(np.maximum(np.round(follows * mean_degree / follows.mean()), 1), n - 1).astype(np.int64)
+    popularity = rng.pareto(exponent - 1, n) + 1
+    popularity /= popularity.sum()
+
+    dst = np.repeat(np.arange(n, dtype=np.int64), follows)
+    src = rng.choice(n, size=len(dst), p=popularity)
+    key = np.unique(src[src != dst] * n + dst[src != dst])
+    src, dst = key // n, key % n
+    in_degree = np.bincount(dst, minlength=n)
+    return np.c_[src, dst, 1 / in_degree[dst]].astype(np.float64)
+
+
+# 名前 -> 生成関数
+GENERATORS = {
+    'ba': barabasi_albert,
+    'follower': follower_graph,
+}
@@ -1 +1,6 @@
-from influence.pmc import *
\ No newline at end of file
+from influence.edges import *
+from influence.stats import *
+from influence.pmc import *
+from influence.imm import *
+from influence.spread import *
+from influence.engine import *
\ No newline at end of file
@@ -0,0 +1,417 @@
+import numpy as np
+
+
+class CondensedDAG:
+    """
+    強連結成分を集約したDAGをCSR形式で保持するクラス
+
+    Attributes
+    ----------
+    n : int
+        DAGの頂点(強連結成分)数
+    weight : ndarray of int32
+        weight[c] : 強連結成分cに集約された頂点数
+    indptr, indices : ndarray of int32
+        順方向(c -> successor)のCSR
+    rindptr, rindices : ndarray of int32
+        逆方向(c -> predecessor)のCSR
+    """
+    def __init__(self, n, weight, src, dst):
+        """
+        Parameters
+        ----------
+        n : int
+            DAGの頂点数
+        weight : ndarray of int
+            各強連結成分の頂点数
+        src, dst : ndarray of int
+            DAGの枝(重複なし)
+        """
+        self.n = n
+        self.weight = weight.astype(np.int32)
+        self.indptr, self.indices = to_csr(src, dst, n)
+        self.rindptr, self.rindices = to_csr(dst, src, n)
+
+    @classmethod
+    def from_csr(cls, weight, indptr, indices, rindptr, rindices):
+        """
+        作成済みのCSRからコピーせずに作る(memory mapした配列をそのまま使うため)
+
+        Parameters
+        ----------
+        weight : ndarray of int32
+        indptr, indices : ndarray of int32
+            順方向のCSR
+        rindptr, rindices : ndarray of int32
+            逆方向のCSR
+
+        Returns
+        -------
+        dag : CondensedDAG
+        """
+        dag = cls.__new__(cls)
+        dag.n = len(weight)
+        dag.weight = weight
+        dag.indptr, dag.indices = indptr, indices
+        dag.rindptr, dag.rindices = rindptr, rindices
+        return dag
+
+    def successors(self, c):
+        return self.indices[self.indptr[c]:self.indptr[c + 1]]
+
+    def predecessors(self, c):
+        return self.rindices[self.rindptr[c]:self.rindptr[c + 1]]
+
+    def degree(self):
+        """
+        Returns
+        -------
+        degree : ndarray of int32
+            各頂点の入次数 + 出次数
+        """
+        return np.diff(self.indptr) + np.diff(self.rindptr)
+
+
+def to_csr(src, dst, n):
+    """
+    枝リストをCSR形式に変換する
+
+    Parameters
+    ----------
+    src, dst : ndarray of int
+        枝の始点と終点
+    n : int
+        頂点数
+
+    Returns
+    -------
+    indptr : ndarray of int32
+        頂点vの隣接頂点は indices[indptr[v]:indptr[v + 1]]
+    indices : ndarray of int32
+    """
+    order = np.argsort(src, kind='stable')
+    indices = np.asarray(dst, dtype=np.int32)[order]
+    indptr = np.zeros(n + 1, dtype=np.int32)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return indptr, indices
+
+
+def edge_positions(indptr, frontier):
+    """
+    frontierの各頂点から出る枝のCSR上の位置をまとめて返す
+
+    Parameters
+    ----------
+    indptr : ndarray of int
+        CSR
+    frontier : ndarray of int
+        頂点集合
+
+    Returns
+    -------
+    ret : ndarray of int64
+        frontierの順に、各頂点の区間[indptr[v], indptr[v + 1])を連結したもの
+    """
+    starts = indptr[frontier].astype(np.int64)
+    lens = indptr[frontier + 1] - starts
+    total = int(lens.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    # 各頂点のCSR上の区間[start, start + len)を一つの添字列に展開する
+    return np.repeat(starts - np.cumsum(lens) + lens, lens) + np.arange(total)
+
+
+def neighbors(indptr, indices, frontier):
+    """
+    frontierの各頂点の隣接頂点をまとめて返す(重複あり)
+
+    Parameters
+    ----------
+    indptr, indices : ndarray of int32
+        CSR
+    frontier : ndarray of int
+        頂点集合
+
+    Returns
+    -------
+    ret : ndarray of int32
+    """
+    return indices[edge_positions(indptr, frontier)]
+
+
+def bfs(indptr, indices, sources, allowed=None, blocked=None, mark=None):
+    """
+    CSR上のフロンティア単位の幅優先探索
+
+    Parameters
+    ----------
+    indptr, indices : ndarray of int32
+        探索するグラフのCSR
+    sources : array-like of int
+        探索を始める頂点集合(sourcesはallowed, blockedに関わらず訪問済みとなる)
+    allowed : ndarray of bool, optional
+        Falseの頂点は訪問しない
+    blocked : ndarray of bool, optional
+        Trueの頂点は訪問しない
+    mark : ndarray of bool, optional
+        全てFalseの作業用配列。繰り返し呼び出す場合に確保のコストを省くために渡す(終了時にFalseに戻す)
+
+    Returns
+    -------
+    visited : ndarray of int32
+        訪問した頂点集合
+    """
+    frontier = np.unique(np.asarray(sources, dtype=np.int32))
+    own_mark = mark is None
+    if own_mark:
+        mark = np.zeros(len(indptr) - 1, dtype=bool)
+    mark[frontier] = True
+    visited = [frontier]
+    while frontier.size:
+        nxt = neighbors(indptr, indices, frontier)
+        nxt = nxt[~mark[nxt]]
+        if allowed is not None:
+            nxt = nxt[allowed[nxt]]
+        if blocked is not None:
+            nxt = nxt[~blocked[nxt]]
+        frontier = np.unique(nxt)
+        mark[frontier] = True
+        visited.append(frontier)
+    visited = np.concatenate(visited)
+    if not own_mark:
+        mark[visited] = False
+    return visited
+
+
+def scc(indptr, indices, rindptr, rindices, n):
+    """
+    反復版Kosarajuによる強連結成分分解
+
+    Parameters
+    ----------
+    indptr, indices : ndarray of int32
+        順方向のCSR
+    rindptr, rindices : ndarray of int32
+        逆方向のCSR
+    n : int
+        頂点数
+
+    Returns
+    -------
+    comp : ndarray of int32
+        comp[v] : 頂点vが属する強連結成分の番号(DAGのトポロジカル順になっている)
+    n_comp : int
+        強連結成分の数
+    """
+    ip, ix = indptr.tolist(), indices.tolist()
+    rip, rix = rindptr.tolist(), rindices.tolist()
+
+    # 行きがけ深さ優先探索(帰りがけ順を記録する)
+    visited = bytearray(n)
+    order = []
+    for s in range(n):
+        if visited[s]:
+            continue
+        visited[s] = 1
+        stack = [s]
+        it = [ip[s]]
+        while stack:
+            v = stack[-1]
+            p = it[-1]
+            if p < ip[v + 1]:
+                it[-1] = p + 1
+                u = ix[p]
+                if not visited[u]:
+                    visited[u] = 1
+                    stack.append(u)
+                    it.append(ip[u])
+            else:
+                stack.pop()
+                it.pop()
+                order.append(v)
+
+    # 帰りがけ順の逆順に逆グラフを探索する
+    comp = [-1] * n
+    n_comp = 0
+    for s in reversed(order):
+        if comp[s] != -1:
+            continue
+        comp[s] = n_comp
+        stack = [s]
+        while stack:
+            v = stack.pop()
+            for p in range(rip[v], rip[v + 1]):
+                u = rix[p]
+                if comp[u] == -1:
+                    comp[u] = n_comp
+                    stack.append(u)
+        n_comp += 1
+
+    return np.array(comp, dtype=np.int32), n_comp
+
+
+def condense(src, dst, n):
+    """
+    枝リストで与えられたグラフを強連結成分分解し、DAGに集約する
+    枝を持たない頂点は探索せずに、それぞれ一つの強連結成分とする
+
+    Parameters
+    ----------
+    src, dst : ndarray of int
+        枝の始点と終点(頂点番号は0, ..., n-1)
+    n : int
+        頂点数
+
+    Returns
+    -------
+    comp : ndarray of int32
+        comp[v] : 頂点vが属するDAGの頂点番号
+    dag : CondensedDAG
+    """
+    # 枝を持つ頂点のみを詰めた番号で強連結成分分解する
+    touched, inv = np.unique(np.concatenate([src, dst]), return_inverse=True)
+    m = len(touched)
+    s, d = inv[:len(src)], inv[len(src):]
+    indptr, indices = to_csr(s, d, m)
+    rindptr, rindices = to_csr(d, s, m)
+    comp_touched, n_comp = scc(indptr, indices, rindptr, rindices, m)
+
+    # 枝を持たない頂点はそのあとに番号を振る
+    comp = np.empty(n, dtype=np.int32)
+    isolated = np.ones(n, dtype=bool)
+    isolated[touched] = False
+    comp[isolated] = np.arange(n_comp, n_comp + n - m, dtype=np.int32)
+    comp[touched] = comp_touched
+    n_comp += n - m
+
+    # 強連結成分間の枝(重複なし)
+    cs, cd = comp_touched[s].astype(np.int64), comp_touched[d].astype(np.int64)
+    key = np.unique((cs * n_comp + cd)[cs != cd])
+    weight = np.bincount(comp, minlength=n_comp)
+    return comp, CondensedDAG(n_comp, weight, key // n_comp, key % n_comp)
+
+
+def topological_levels(dag):
+    """
+    DAGの頂点を、全ての後続頂点がそれより前の段に含まれるように段に分ける
+
+    Parameters
+    ----------
+    dag : CondensedDAG
+
+    Returns
+    -------
+    levels : list of ndarray
+        levels[0]は出次数0の頂点、levels[l]の頂点の後続頂点は全てlevels[:l]に含まれる
+    """
+    remaining = np.diff(dag.indptr).astype(np.int64)
+    level = np.flatnonzero(remaining == 0)
+    levels = []
+    while level.size:
+        levels.append(level)
+        preds = neighbors(dag.rindptr, dag.rindices, level)
+        remaining -= np.bincount(preds, minlength=dag.n)
+        cand = np.unique(preds)
+        level = cand[remaining[cand] == 0]
+    return levels
+
+
+def reachable_weights(dag, weight=None, max_bytes=1 << 26):
+    """
+    DAGの全ての頂点について、到達可能な頂点(自身を含む)の重みの合計を一度に求める
+    到達可能な頂点の集合をビット列として、後続頂点のビット列の論理和を出次数0の頂点の側から段ごとに伝播させる
+    ビット列は列(到達先の頂点)をブロックに分けて計算するため、作業領域はmax_bytes程度に収まる
+    - ビット列を持つのは出次数が正の頂点のみ
+    - 列になるのは入次数が正の頂点のみ(入次数0の頂点には自身しか到達しない)
+
+    Parameters
+    ----------
+    dag : CondensedDAG
+    weight : ndarray of int, optional
+        各頂点の重み(デフォルトはdag.weight)
+        消去した頂点の重みを0にすれば、消去されていない頂点の数になる(消去した頂点から到達する頂点が全て消去されている場合)
+    max_bytes : int
+        作業領域の目安
+
+    Returns
+    -------
+    total : ndarray of int64
+        total[c] : 頂点cから到達可能な頂点の重みの合計
+    """
+    weight = (dag.weight if weight is None else weight).astype(np.int64)
+    total = weight.copy()
+    out_degree = np.diff(dag.indptr)
+    rows = np.flatnonzero(out_degree > 0)
+    cols = np.flatnonzero(np.diff(dag.rindptr) > 0)
+    if rows.size == 0:
+        return total
+    row_of = np.full(dag.n, -1, dtype=np.int64)
+    row_of[rows] = np.arange(len(rows))
+    col_of = np.full(dag.n, -1, dtype=np.int64)
+    col_of[cols] = np.arange(len(cols))
+
+    # 出次数0の段を除き、段ごとの枝(始点ごとにまとまっている)を先に求めておく
+    levels = []
+    for level in topological_levels(dag)[1:]:
+        deg = out_degree[level]
+        succ = dag.indices[edge_positions(dag.indptr, level)]
+        starts = np.concatenate([[0], np.cumsum(deg)[:-1]])
+        levels.append((row_of[level], col_of[succ], row_of[succ], starts))
+
+    block = max(64, max_bytes // max(len(rows), len(dag.indices)) // 64 * 64)
+    # ビット(バイト内の位置)ごとの値
+    bit_table = (np.arange(256)[:, None] >> np.arange(8)[None, :]) & 1
+    for c0 in range(0, len(cols), block):
+        n_cols = min(block, len(cols) - c0)
+        n_words = (n_cols + 63) // 64
+        reach = np.zeros((len(rows), n_words), dtype=np.uint64)
+        for level_rows, succ_col, succ_row, starts in levels:
+            vals = np.zeros((len(succ_col), n_words), dtype=np.uint64)
+            # 後続頂点自身のビット
+            j = succ_col - c0
+            inb = np.flatnonzero((j >= 0) & (j < n_cols))
+            vals[inb, j[inb] // 64] = np.left_shift(np.uint64(1), (j[inb] % 64).astype(np.uint64))
+            # 後続頂点から到達する頂点のビット
+            has = succ_row >= 0
+            vals[has] |= reach[succ_row[has]]
+            reach[level_rows] = np.bitwise_or.reduceat(vals, starts, axis=0)
+
+        # バイトごとに、256通りの値に対する重みの合計の表を引いて足し合わせる
+        w = np.zeros(n_words * 64, dtype=np.int64)
+        w[:n_cols] = weight[cols[c0:c0 + n_cols]]
+        table = bit_table @ w.reshape(-1, 8).T
+        bytes_ = np.ascontiguousarray(reach, dtype='<u8').view(np.uint8)
+        total[rows] += table[bytes_, np.arange(bytes_.shape[1])].sum(axis=1)
+    return total
+
+
+def forest_subtree_weights(dag, weight=None):
+    """
+    全ての頂点の入次数が1以下のDAG(森)について、各頂点の部分木の重みの合計を一度に求める
+    部分木は互いに重ならないため、葉の側から段ごとに親に足し合わせるだけでよい
+    (Linear Threshold modelのDAGは、各ノードに入る枝が高々1本のため森になる)
+
+    Parameters
+    ----------
+    dag : CondensedDAG
+        全ての頂点の入次数が1以下のもの
+    weight : ndarray of int, optional
+        頂点の重み(デフォルトはdag.weight)
+
+    Returns
+    -------
+    total : ndarray of int64
+        total[c] : cから到達可能な頂点(c自身を含む)の重みの合計
+    """
+    if weight is None:
+        weight = dag.weight
+    if np.any(np.diff(dag.rindptr) > 1):
+        raise ValueError('dag is not a forest')
+    total = np.asarray(weight, dtype=np.int64).copy()
+    parent = np.full(dag.n, -1, dtype=np.int64)
+    has_parent = np.diff(dag.rindptr) == 1
+    parent[has_parent] = dag.rindices[dag.rindptr[:-1][has_parent]]
+    for level in topological_levels(dag):
+        level = level[has_parent[level]]
+        np.add.at(total, parent[level], total[level])
+    return total
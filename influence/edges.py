@@ -0,0 +1,86 @@
+import numpy as np
+
+
+def intern_edges(network):
+    """
+    枝リストのノードをint32のindexに置き換える
+    ノード番号でもscreen_nameなどの文字列でもよく、nodes[src], nodes[dst]で元のノードに戻せる
+
+    Parameters
+    ----------
+    network : ndarray, list or DataFrame
+        [[from_node, to_node, probability], ...]
+        DataFrameの場合は、先頭の3列をfrom_node, to_node, probabilityとして扱う
+        (GetDescriptionNetwork.get_networkのadj_listをそのまま渡せる)
+
+    Returns
+    -------
+    nodes : ndarray
+        ソート済みのノード集合
+        数値のノードは整数(int64)にする(float型の列から読んだ2**53を超えるidは、読んだ時点で丸められている)
+    src, dst : ndarray of int32
+        枝の始点と終点のnodes上のindex
+    prob : ndarray of float32
+        枝確率
+
+    Raises
+    ------
+    ValueError
+        文字列と数値のノードが混ざっている場合
+
+    Example
+    -------
+    >>> nodes, src, dst, prob = intern_edges([['a', 'b', 0.1], ['b', 'c', 0.2]])
+    >>> nodes[src]
+    array(['a', 'b'], dtype=object)
+    """
+    if hasattr(network, 'iloc'):
+        columns = [network.iloc[:, j].to_numpy() for j in range(3)]
+    else:
+        network = np.asarray(network, dtype=object if isinstance(network, list) else None)
+        columns = [network[:, j] for j in range(3)]
+    from_node, to_node, prob = columns
+
+    labels = np.concatenate([from_node, to_node])
+    if labels.dtype.kind in 'US':
+        # 文字列は長さの異なるseedと比較できるようにobjectで持つ
+        labels = labels.astype(object)
+    elif labels.dtype == object:
+        types = set(map(type, labels))
+        is_str = [issubclass(t, str) for t in types]
+        if any(is_str):
+            if not all(is_str):
+                raise ValueError('node labels must be either all strings or all numbers')
+        elif all(issubclass(t, (int, np.integer)) for t in types):
+            # floatを経由すると2**53を超えるid(TwitterのユーザIDなど)が丸められて別のノードと重なる
+            labels = labels.astype(np.int64)
+        else:
+            labels = labels.astype(np.float64).astype(np.int64)
+    elif labels.dtype.kind == 'f':
+        labels = labels.astype(np.int64)
+    nodes, index = np.unique(labels, return_inverse=True)
+    index = index.astype(np.int32)
+    return nodes, index[:len(from_node)], index[len(from_node):], np.asarray(prob, dtype=np.float32)
+
+
+def node_index(nodes, seeds):
+    """
+    ノードをnodes上のindexに変換する
+
+    Parameters
+    ----------
+    nodes : ndarray
+        ソート済みのノード集合
+    seeds : array-like
+        ノード
+
+    Returns
+    -------
+    index : ndarray of int64
+    """
+    seeds = np.asarray(seeds, dtype=object if nodes.dtype == object else None)
+    index = np.minimum(np.searchsorted(nodes, seeds), len(nodes) - 1)
+    unknown = nodes[index] != seeds
+    if np.any(unknown):
+        raise ValueError(f'unknown seeds : {seeds[unknown].tolist()}')
+    return index.astype(np.int64)
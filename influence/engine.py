@@ -0,0 +1,39 @@
+from influence.pmc import InfuenceMaximizer
+from influence.imm import IMMInfuenceMaximizer
+
+# engine名 -> クラス
+ENGINES = {
+    'pmc': InfuenceMaximizer,
+    'imm': IMMInfuenceMaximizer,
+}
+
+
+def make_maximizer(network, k, engine='pmc', **kwargs):
+    """
+    engineを指定して影響最大化のクラスを作る
+    どのengineも run() で影響力を最大にするノード集合を、influence_result() で各ノードの期待影響数を返す
+
+    Parameters
+    ----------
+    network : ndarray, list or DataFrame
+        [[from_node, to_node, probability], ...]
+    k : int
+        kノードで影響力を最大にする
+    engine : str
+        'pmc' : Pruned Monte Carlo(InfuenceMaximizer), kwargsにRが必要
+        'imm' : Reverse Influence Sampling(IMMInfuenceMaximizer), 大きいグラフでメモリが少なくて済む
+    kwargs :
+        各クラスのその他の引数
+
+    Returns
+    -------
+    maximizer : InfuenceMaximizer or IMMInfuenceMaximizer
+
+    Example
+    -------
+    >>> inf = make_maximizer(network, 10, engine='imm', epsilon=0.1)
+    >>> inf.run()
+    """
+    if engine not in ENGINES:
+        raise ValueError(f'unknown engine : {engine}')
+    return ENGINES[engine](network, k, **kwargs)
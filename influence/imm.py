@@ -0,0 +1,252 @@
+import math
+import numpy as np
+from influence.csr import edge_positions, neighbors, to_csr
+from influence.edges import intern_edges
+
+
+class IMMInfuenceMaximizer:
+    """
+    Independent Cascade modelにおける影響力が最大であるノードを、
+    Reverse Influence Sampling(IMM)により特定するクラス
+    InfuenceMaximizer(PMC)と同じネットワークを入力とし、同じようにrun, influence_resultで結果を得る
+
+    ランダムに選んだノードに到達するノード集合(RR集合)をθ個作り、
+    RR集合を最も多く被覆するk個のノードを貪欲法で選ぶ
+    θはIMMの下界に従って決めるため、確率1 - 1/n^ellで(1 - 1/e - epsilon)近似となる
+
+    Attributes
+    ----------
+    k : int
+        kノードで影響力を最大にする
+    epsilon : float
+        近似誤差
+    ell : float
+        失敗確率のパラメータ(1 - 1/n^ellの確率で近似保証が成り立つ)
+    nodes : ndarray
+        グラフ上のノード集合(ソート済み、文字列の場合はobject配列)
+    rindptr, rindices, rprob : ndarray
+        逆向きのCSR(to_node -> from_node)と、それに対応する枝確率
+    rr_ptr, rr_nodes : ndarray
+        RR集合のCSR, RR集合jは rr_nodes[rr_ptr[j]:rr_ptr[j + 1]]
+    theta : int
+        RR集合の数
+    S : list
+        影響力を最大にする頂点集合
+    v_gain : dict
+        {node : expeted influence, ...}
+        1ノードのみを選ぶ場合の期待影響数
+    run_flag : bool
+        runメソッドを実行したかのフラグ
+    """
+    # RR集合をまとめて作る際の、訪問済みフラグ(RR集合数 x ノード数)の上限
+    max_block_size = 1 << 24
+
+    def __init__(self, network, k, epsilon=0.1, ell=1, seed=None, max_samples=None):
+        """
+        Parameters
+        ----------
+        network : ndarray, list or DataFrame
+            [[from_node, to_node, probability], ...]
+            ノードは番号でもscreen_nameなどの文字列でもよい(intern_edgesを参照)
+        k : int
+            kノードで影響力を最大にする
+        epsilon : float
+            近似誤差(小さいほどRR集合が増える)
+        ell : float
+            失敗確率のパラメータ
+        seed : int, optional
+            乱数のseed
+        max_samples : int, optional
+            RR集合の数の上限(近似保証はなくなる)
+        """
+        self.k = k
+        self.epsilon = epsilon
+        self.ell = ell
+        self.max_samples = max_samples
+        self.rng = np.random.default_rng(seed)
+
+        self.nodes, src, dst, prob = intern_edges(network)
+        order = np.argsort(dst, kind='stable')
+        self.rindptr, self.rindices = to_csr(dst, src, len(self.nodes))
+        self.rprob = prob[order]
+
+        self.rr_ptr = np.zeros(1, dtype=np.int64)
+        self.rr_nodes = np.empty(0, dtype=np.int32)
+        self.theta = 0
+        self.S = []
+        self.run_flag = False
+
+    def make_rr_sets(self, size):
+        """
+        RR集合をまとめて作る
+        size個のRR集合の逆向きの幅優先探索をフロンティア単位で同時に行い、各枝は一様乱数で生死を決める
+
+        Parameters
+        ----------
+        size : int
+            作るRR集合の数
+
+        Returns
+        -------
+        ptr, nodes : ndarray
+            RR集合のCSR
+        """
+        n = len(self.nodes)
+        roots = self.rng.integers(0, n, size).astype(np.int32)
+        set_ids = np.arange(size, dtype=np.int64)
+        # 訪問済みフラグ(RR集合id * n + ノード)
+        visited = np.zeros(size * n, dtype=bool)
+        visited[set_ids * n + roots] = True
+
+        members_set, members_node = [set_ids], [roots]
+        frontier_set, frontier_node = set_ids, roots
+        while frontier_node.size:
+            edges = edge_positions(self.rindptr, frontier_node)
+            edge_set = np.repeat(frontier_set, np.diff(self.rindptr)[frontier_node])
+            live = self.rng.random(len(edges)) < self.rprob[edges]
+            key = np.unique(edge_set[live] * n + self.rindices[edges[live]])
+            key = key[~visited[key]]
+            visited[key] = True
+            frontier_set, frontier_node = key // n, (key % n).astype(np.int32)
+            members_set.append(frontier_set)
+            members_node.append(frontier_node)
+
+        members_set = np.concatenate(members_set)
+        members_node = np.concatenate(members_node)
+        order = np.argsort(members_set, kind='stable')
+        ptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(members_set, minlength=size), out=ptr[1:])
+        return ptr, members_node[order]
+
+    def extend_rr_sets(self, theta):
+        """
+        RR集合の数がthetaになるまで追加する
+
+        Parameters
+        ----------
+        theta : int
+            RR集合の数
+        """
+        if self.max_samples is not None:
+            theta = min(theta, self.max_samples)
+        block = max(1, self.max_block_size // len(self.nodes))
+        ptrs, nodes = [self.rr_ptr], [self.rr_nodes]
+        while self.theta < theta:
+            size = min(block, theta - self.theta)
+            ptr, rr = self.make_rr_sets(size)
+            ptrs.append(ptr[1:] + ptrs[-1][-1])
+            nodes.append(rr)
+            self.theta += size
+        self.rr_ptr = np.concatenate(ptrs)
+        self.rr_nodes = np.concatenate(nodes)
+
+    def node_selection(self):
+        """
+        RR集合を最も多く被覆するk個のノードを貪欲法で選ぶ
+        ノードからRR集合への転置インデックスを使い、選んだノードが被覆したRR集合のみカウントを減らす
+
+        Returns
+        -------
+        S : list of int
+            選んだノードのindex
+        coverage : float
+            被覆したRR集合の割合
+        """
+        n = len(self.nodes)
+        counts = np.bincount(self.rr_nodes, minlength=n)
+        set_of = np.repeat(np.arange(self.theta, dtype=np.int64), np.diff(self.rr_ptr))
+        order = np.argsort(self.rr_nodes, kind='stable')
+        inv_ptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=inv_ptr[1:])
+        inv_sets = set_of[order]
+
+        covered = np.zeros(self.theta, dtype=bool)
+        S = []
+        for j in range(min(self.k, n)):
+            v = int(np.argmax(counts))
+            S.append(v)
+            sets = inv_sets[inv_ptr[v]:inv_ptr[v + 1]]
+            sets = sets[~covered[sets]]
+            covered[sets] = True
+            counts -= np.bincount(neighbors(self.rr_ptr, self.rr_nodes, sets), minlength=n)
+            # 全てのRR集合を被覆した後もカウントが0のノードから選び続けるため、選んだノードは除く
+            counts[v] = -1
+        return S, covered.sum() / max(self.theta, 1)
+
+    def sample_size(self):
+        """
+        IMMのサンプリングで必要なRR集合の数を求める
+        最適値の下界を推定するために、RR集合を段階的に増やしながら作る
+
+        Returns
+        -------
+        theta : int
+        """
+        n = len(self.nodes)
+        k = min(self.k, n)
+        eps = self.epsilon
+        eps_ = math.sqrt(2) * eps
+        log_n = math.log(max(n, 2))
+        ell = self.ell * (1 + math.log(2) / log_n)
+        log_cnk = math.lgamma(n + 1) - math.lgamma(k + 1) - math.lgamma(n - k + 1)
+        e = 1 - 1 / math.e
+
+        lambda_ = (2 + 2 / 3 * eps_) * (log_cnk + ell * log_n + math.log(max(math.log2(n), 1))) * n / eps_ ** 2
+        alpha = math.sqrt(ell * log_n + math.log(2))
+        beta = math.sqrt(e * (log_cnk + ell * log_n + math.log(2)))
+        lambda_star = 2 * n * (e * alpha + beta) ** 2 / eps ** 2
+
+        # 最適値の下界LBを求める
+        LB = 1
+        for i in range(1, max(int(math.ceil(math.log2(n))), 2)):
+            x = n / 2 ** i
+            self.extend_rr_sets(int(math.ceil(lambda_ / x)))
+            S, coverage = self.node_selection()
+            if n * coverage >= (1 + eps_) * x:
+                LB = n * coverage / (1 + eps_)
+                break
+        return int(math.ceil(lambda_star / LB))
+
+    def run(self):
+        """
+        IMMを実行する
+
+        Returns
+        -------
+        S : list
+            影響力を最大するノード集合
+
+        Example
+        -------
+        >>> network = pd.read_csv("data.csv").values
+        >>> inf = IMMInfuenceMaximizer(network, 1, epsilon=0.1)
+        >>> inf.run()
+        [0]
+        """
+        theta = self.sample_size()
+        # 下界の推定に使ったRR集合を再利用すると近似保証が崩れるため、作り直す
+        self.rr_ptr = np.zeros(1, dtype=np.int64)
+        self.rr_nodes = np.empty(0, dtype=np.int32)
+        self.theta = 0
+        self.extend_rr_sets(theta)
+        S, coverage = self.node_selection()
+        self.S = [self.nodes[v] for v in S]
+        self.spread = len(self.nodes) * coverage
+
+        counts = np.bincount(self.rr_nodes, minlength=len(self.nodes))
+        self.v_gain = dict(zip(self.nodes, counts * len(self.nodes) / self.theta))
+        self.run_flag = True
+        return self.S
+
+    def influence_result(self):
+        """
+        影響力の計算結果を返す
+
+        Returns
+        -------
+        v_gain : dict
+            {node : expeted influence, ...,}
+        """
+        if not self.run_flag:
+            self.run()
+        return self.v_gain
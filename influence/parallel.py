@@ -0,0 +1,240 @@
+import mmap
+import weakref
+import traceback
+import multiprocessing
+import numpy as np
+from multiprocessing import shared_memory
+from influence.csr import CondensedDAG
+
+# 共有メモリに置く配列(CondensedDAGの属性, InfuenceMaximizerのシミュレーションごとの属性, gain計算用の状態)
+# compは全シミュレーション分を1つの配列として共有メモリの先頭に置く
+_DAG_ARRAYS = ('weight', 'indptr', 'indices', 'rindptr', 'rindices')
+_SNAPSHOT_ARRAYS = ('h', 'A', 'D')
+_STATE_ARRAYS = ('V', 'latest', 'delta')
+
+
+def _snapshot_arrays(maximizer, i):
+    """
+    i回目のシミュレーションの共有メモリに置く配列(compを除く) {名前 : ndarray}
+    """
+    dag = maximizer.G[i]
+    arrays = {name: getattr(dag, name) for name in _DAG_ARRAYS}
+    arrays.update({name: np.asarray(getattr(maximizer, name)[i]) for name in _SNAPSHOT_ARRAYS + _STATE_ARRAYS})
+    return arrays
+
+
+def _mapped(a):
+    # ファイルにmemory mapした配列か(cache_dirから読み込んだもの)
+    while a is not None:
+        if isinstance(a, mmap.mmap):
+            return True
+        a = getattr(a, 'base', None)
+    return False
+
+
+def snapshot_slices(maximizer, n_slices):
+    """
+    DAGの大きさ(ノード数 + 枝数)がほぼ等しくなるように、シミュレーションを連続した範囲に分ける
+
+    Returns
+    -------
+    slices : list of range
+    """
+    cost = np.cumsum([maximizer.G[i].n + len(maximizer.G[i].indices) for i in range(maximizer.R)])
+    bounds = np.searchsorted(cost, cost[-1] * np.arange(1, n_slices) / n_slices)
+    bounds = np.unique(np.concatenate([[0], bounds, [maximizer.R]]))
+    return [range(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if a < b]
+
+
+def _views(buf, layout):
+    return {name: np.ndarray(length, dtype=dtype, buffer=buf, offset=offset)
+            for name, (offset, dtype, length) in layout.items()}
+
+
+def _gain_worker(cls, name, layouts, snapshots, n, result, options, conn):
+    """
+    共有メモリ上のsnapshotsの範囲のDAGと状態を使い、親プロセスからの命令を順に実行する
+
+    命令
+    - ('gains',) : 全てのノードのgainの合計をresult行目に書き込む
+    - ('update', l) : nodes上のindexがlのノードから到達するノードを消去する
+    - ('node_gain', l) : nodes上のindexがlのノードのgainの合計を返す
+    - ('close',) : カウンタを返して終了する
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        views = [_views(shm.buf, layout) for layout in layouts]
+        state = cls.from_snapshots(snapshots, views, **options)
+        out = np.ndarray(n, dtype=np.int64, buffer=shm.buf, offset=result)
+    except Exception:
+        # 最初の命令への返答として失敗を伝える
+        conn.send(('error', traceback.format_exc()))
+        shm.close()
+        return
+    try:
+        while True:
+            command, *args = conn.recv()
+            try:
+                if command == 'gains':
+                    out[:] = 0
+                    for i in snapshots:
+                        out += state.snapshot_gains(i)[state.comp[i]]
+                    conn.send(('ok', None))
+                elif command == 'update':
+                    for i in snapshots:
+                        state.update_array(i, state.comp[i][args[0]])
+                    conn.send(('ok', None))
+                elif command == 'node_gain':
+                    conn.send(('ok', sum(int(state.gain_array(i, state.comp[i][args[0]])) for i in snapshots)))
+                else:
+                    conn.send(('ok', dict(state.stats.counters)))
+                    break
+            except Exception:
+                conn.send(('error', traceback.format_exc()))
+        del views, state, out
+    finally:
+        shm.close()
+
+
+class GainPool:
+    """
+    DAGとgain計算用の状態(V, latest, delta)を共有メモリに置き、シミュレーションを分けてworkerプロセスでgainを計算する
+    親プロセスのV, latest, deltaは共有メモリのviewに置き換えるため、workerのupdateの結果は親プロセスからも見える
+    (workerが命令を実行している間は、親プロセスは状態を変更しない)
+    親プロセスのDAG(G, comp, h, A, D)も共有メモリのviewに置き換えて元の配列を手放すため、DAGの分のメモリは増えない
+    (ファイルにmemory mapしたDAGはページキャッシュにあるため、そのまま使う)
+    closeで親プロセスの配列にコピーし直す
+
+    Attributes
+    ----------
+    slices : list of range
+        workerごとのシミュレーションの範囲
+    """
+
+    def __init__(self, maximizer, n_workers):
+        """
+        Parameters
+        ----------
+        maximizer : InfuenceMaximizer
+            DAGを作成済みのもの(backend='array', チャンクに分けていないもの)
+        n_workers : int
+            workerプロセス数
+        """
+        self.maximizer = maximizer
+        self.slices = snapshot_slices(maximizer, n_workers)
+        n = len(maximizer.nodes)
+
+        # 配列ごとに8バイト境界に揃えて並べる
+        comp = maximizer.comp
+        layouts = []
+        offset = -(-comp.nbytes // 8) * 8
+        for i in range(maximizer.R):
+            layout = {'comp': (i * n * comp.itemsize, comp.dtype.str, n)}
+            for name, a in _snapshot_arrays(maximizer, i).items():
+                layout[name] = (offset, a.dtype.str, len(a))
+                offset += -(-a.nbytes // 8) * 8
+            layouts.append(layout)
+        result = offset
+        self.shm = shared_memory.SharedMemory(create=True, size=max(result + 8 * n * len(self.slices), 1))
+        # closeを呼ばずに終了した場合も共有メモリを消す
+        self._unlink = weakref.finalize(self, self.shm.unlink)
+        shared = np.ndarray(comp.shape, dtype=comp.dtype, buffer=self.shm.buf)
+        shared[:] = comp
+        self.shared_comp = not _mapped(comp)
+        if self.shared_comp:
+            maximizer.comp = shared
+        # 親プロセスの参照を共有メモリのviewに置き換えたDAG
+        self.shared_dags = []
+        for i, layout in enumerate(layouts):
+            views = _views(self.shm.buf, layout)
+            for name, a in _snapshot_arrays(maximizer, i).items():
+                views[name][:] = a
+            # 親プロセスの状態をworkerと共有する
+            names = _STATE_ARRAYS
+            if not _mapped(maximizer.G[i].indices):
+                maximizer.G[i] = CondensedDAG.from_csr(*(views[name] for name in _DAG_ARRAYS))
+                names = _SNAPSHOT_ARRAYS + _STATE_ARRAYS
+                self.shared_dags.append(i)
+            for name in names:
+                getattr(maximizer, name)[i] = views[name]
+        del shared, comp
+        self.results = np.ndarray((len(self.slices), n), dtype=np.int64, buffer=self.shm.buf, offset=result)
+
+        options = {'model': maximizer.model,
+                   'costs': {name: getattr(maximizer, name) for name in maximizer.cost_attributes}}
+        ctx = multiprocessing.get_context()
+        self.conns = []
+        self.workers = []
+        for w, snapshots in enumerate(self.slices):
+            parent, child = ctx.Pipe()
+            worker = ctx.Process(target=_gain_worker, daemon=True,
+                                 args=(type(maximizer), self.shm.name, layouts[snapshots.start:snapshots.stop],
+                                       snapshots, n, result + 8 * n * w, options, child))
+            worker.start()
+            child.close()
+            self.conns.append(parent)
+            self.workers.append(worker)
+
+    def broadcast(self, *command):
+        """
+        全てのworkerに命令を送り、結果を返す
+        """
+        for conn in self.conns:
+            conn.send(command)
+        replies = [conn.recv() for conn in self.conns]
+        for status, value in replies:
+            if status == 'error':
+                raise RuntimeError(f'gain worker failed:\n{value}')
+        return [value for status, value in replies]
+
+    def gains(self):
+        """
+        全てのノードについてR回のシミュレーションにおける影響力の増分の合計(all_node_gainsと同じ)
+        workerごとの合計を足し合わせる
+
+        Returns
+        -------
+        gains : ndarray of int64
+        """
+        self.broadcast('gains')
+        return self.results.sum(axis=0)
+
+    def update(self, l):
+        """
+        全てのシミュレーションで、nodes上のindexがlのノードから到達するノードを消去する
+        """
+        self.broadcast('update', int(l))
+
+    def node_gain(self, l):
+        """
+        nodes上のindexがlのノードのR回のシミュレーションにおける影響力の増分の合計
+        """
+        return sum(self.broadcast('node_gain', int(l)))
+
+    def close(self):
+        """
+        workerを終了し、親プロセスのDAGと状態を共有メモリからコピーして共有メモリを解放する
+        workerのカウンタは親プロセスのstatsに加える
+        """
+        for counters in self.broadcast('close'):
+            for name, value in counters.items():
+                self.maximizer.stats.count(name, value)
+        for worker in self.workers:
+            worker.join()
+        for conn in self.conns:
+            conn.close()
+        maximizer = self.maximizer
+        if self.shared_comp:
+            maximizer.comp = maximizer.comp.copy()
+        for i in self.shared_dags:
+            dag = maximizer.G[i]
+            maximizer.G[i] = CondensedDAG.from_csr(*(getattr(dag, name).copy() for name in _DAG_ARRAYS))
+            for name in _SNAPSHOT_ARRAYS:
+                getattr(maximizer, name)[i] = getattr(maximizer, name)[i].copy()
+        for i in range(maximizer.R):
+            for name in _STATE_ARRAYS:
+                state = getattr(maximizer, name)
+                state[i] = state[i].copy()
+        del self.results
+        self.shm.close()
+        self._unlink()
@@ -1,8 +1,202 @@
+import os
+import time
+import heapq
+import tempfile
 import networkx as nx
 import numpy as np
-from collections import deque
-from tqdm.notebook import tqdm
-from sklearn.preprocessing import LabelEncoder
+from collections import deque, defaultdict
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor
+from tqdm.auto import tqdm
+from influence.csr import CondensedDAG, bfs, condense, reachable_weights, forest_subtree_weights
+from influence.sampling import LiveEdgeSampler, LTLiveEdgeSampler, lt_table, lt_live
+from influence.store import snapshot_key, save_snapshots, load_snapshots
+from influence.spread import SpreadEstimator
+from influence.edges import intern_edges, node_index
+from influence.stats import RunStats
+from influence.parallel import GainPool
+
+
+def make_snapshot(src, dst, live, n, n_hubs=1, times=None):
+    """
+    live-edgeから1回分のシミュレーションのDAGを作る
+    - 強連結成分分解
+    - ハブノードを特定
+    - ハブに到達するノード集合を探索
+    - ハブから到達するノード集合を探索
+    
+    Parameters
+    ----------
+    src, dst : ndarray of int32
+        枝の始点と終点のindex
+    live : ndarray of bool
+        live[e] : 枝eが残ったか
+    n : int
+        ノード数
+    n_hubs : int
+        ハブの数の上限
+    times : dict, optional
+        指定した場合は、'scc', 'hub'に経過時間(秒)を加える
+    
+    Returns
+    -------
+    comp : ndarray of int32
+    dag : CondensedDAG
+    h, A, D :
+        hub_setsを参照
+    """
+    start = time.perf_counter()
+    comp, dag = condense(src[live], dst[live], n)
+    middle = time.perf_counter()
+    hubs = hub_sets(dag, n_hubs)
+    if times is not None:
+        times['scc'] += middle - start
+        times['hub'] += time.perf_counter() - middle
+    return (comp, dag, *hubs)
+
+
+def hub_sets(dag, n_hubs=1):
+    """
+    次数が大きい順にDAG上のノードをハブとし、ハブに到達するノードとハブから到達するノードを探索する
+    ハブから到達するノードの集合が互いに重ならないように、既に選んだハブから到達するノードに到達する候補は除く
+    (重ならないため、複数のハブに到達するノードは、それぞれのハブの影響数を足し合わせればよい)
+    
+    Parameters
+    ----------
+    dag : CondensedDAG
+    n_hubs : int
+        ハブの数の上限(64以下)
+    
+    Returns
+    -------
+    h : ndarray of int32
+        ハブノード(次数の大きい順)
+    A : ndarray of uint8, uint16, uint32 or uint64
+        A[c]のjビット目 : cがh[j]に到達するか(h[j]自身を除く)
+    D : ndarray of int8
+        D[c] : cに到達するハブのindex(ハブから到達しない場合は-1)
+    """
+    degree = dag.degree()
+    # 次数の大きいものから、n_hubsの4倍までを候補とする
+    candidates = np.argsort(-degree, kind='stable')[:4 * n_hubs]
+    D = np.full(dag.n, -1, dtype=np.int8)
+    h = []
+    for c in candidates.tolist():
+        if len(h) == n_hubs:
+            break
+        if D[c] >= 0:
+            continue
+        desc = bfs(dag.indptr, dag.indices, [c])
+        if np.any(D[desc] >= 0):
+            continue
+        D[desc] = len(h)
+        h.append(c)
+    
+    A = np.zeros(dag.n, dtype=np.min_scalar_type((1 << n_hubs) - 1))
+    for j, c in enumerate(h):
+        A[bfs(dag.rindptr, dag.rindices, [c])] |= A.dtype.type(1 << j)
+        A[c] &= ~A.dtype.type(1 << j)
+    return np.array(h, dtype=np.int32), A, D
+
+
+def extend_snapshot(comp, dag, src, dst):
+    """
+    作成済みのDAGに、新たに残った枝を追加する
+    強連結成分の番号はトポロジカル順のため、全ての枝が番号の小さい成分から大きい成分に向かう場合は
+    閉路ができず、枝を追加するだけでよい
+    それ以外の場合は、強連結成分を頂点としたグラフを強連結成分分解し直す(元の枝は見ない)
+    
+    Parameters
+    ----------
+    comp : ndarray of int32
+        元のノードのindex -> DAG上のノード
+    dag : CondensedDAG
+    src, dst : ndarray of int
+        追加する枝の始点と終点(元のノードのindex)
+    
+    Returns
+    -------
+    comp : ndarray of int32
+    dag : CondensedDAG
+    stale : ndarray of bool or None
+        影響数が変わりうるDAG上のノード(追加した枝の始点に到達するノード)
+        強連結成分分解し直した場合はNone(全てのノードが変わりうる)
+    """
+    cs, cd = comp[src], comp[dst]
+    keep = cs != cd
+    cs, cd = cs[keep].astype(np.int64), cd[keep].astype(np.int64)
+    if len(cs) == 0:
+        return comp, dag, np.zeros(dag.n, dtype=bool)
+    
+    all_src = np.concatenate([np.repeat(np.arange(dag.n, dtype=np.int64), np.diff(dag.indptr)), cs])
+    all_dst = np.concatenate([dag.indices, cd])
+    if np.all(cs < cd):
+        key = np.unique(all_src * dag.n + all_dst)
+        new = CondensedDAG(dag.n, dag.weight, key // dag.n, key % dag.n)
+        stale = np.zeros(new.n, dtype=bool)
+        stale[bfs(new.rindptr, new.rindices, np.unique(cs))] = True
+        return comp, new, stale
+    
+    sub, new = condense(all_src, all_dst, dag.n)
+    new.weight = np.bincount(sub, weights=dag.weight, minlength=new.n).astype(np.int32)
+    return sub[comp], new, None
+
+
+def make_snapshots_seeded(src, dst, prob, n, seed_seqs, lt=None, n_hubs=1, times=None):
+    """
+    シミュレーションごとのSeedSequenceから乱数を生成してDAGを作る
+    どのプロセスで実行しても、同じseed_seqからは同じDAGが得られる
+    
+    Parameters
+    ----------
+    src, dst : ndarray of int32
+        枝の始点と終点のindex
+    prob : ndarray of float
+        枝確率
+    n : int
+        ノード数
+    seed_seqs : list of np.random.SeedSequence
+        シミュレーションごとのseed
+    lt : tuple, optional
+        lt_tableの結果、指定した場合はLinear Threshold modelで枝を残す
+    n_hubs : int
+        ハブの数の上限
+    times : dict, optional
+        指定した場合は、'sampling', 'scc', 'hub'に経過時間(秒)を加える
+    
+    Returns
+    -------
+    snapshots : list of tuple
+        [(ビットパックされたlive-edge, comp, dag, h, A, D), ...]
+    """
+    snapshots = []
+    for seed_seq in seed_seqs:
+        start = time.perf_counter()
+        rng = np.random.default_rng(seed_seq)
+        if lt is None:
+            live = rng.uniform(0, 1, len(prob)) < prob
+        else:
+            live = lt_live(lt, rng.uniform(0, 1, n), len(prob))
+        if times is not None:
+            times['sampling'] += time.perf_counter() - start
+        snapshots.append((np.packbits(live),) + make_snapshot(src, dst, live, n, n_hubs, times))
+    return snapshots
+
+
+# プロセスプールの各workerが保持するネットワーク(タスクごとにネットワークを送らないため)
+_worker_network = None
+
+
+def _init_worker(src, dst, prob, n, lt, n_hubs):
+    global _worker_network
+    _worker_network = (src, dst, prob, n, lt, n_hubs)
+
+
+def _worker_make_snapshots(seed_seqs):
+    src, dst, prob, n, lt, n_hubs = _worker_network
+    times = defaultdict(float)
+    return make_snapshots_seeded(src, dst, prob, n, seed_seqs, lt, n_hubs, times), dict(times)
+
 
 class InfuenceMaximizer:
     """
@@ -10,61 +204,241 @@ class InfuenceMaximizer:
     
     Attributes
     ----------
-    network : ndarray[[float, float, float], ...]
-        [[from_node, to_node, probability], ...]
     k : int
         kノードで影響力を最大にする
     R : int
-        シミュレーション数
-    nodes : array of int
-        グラフ上のノード集合
+        シミュレーション数(batch_sizeを指定した場合は、打ち切るまでに使ったシミュレーション数)
+    backend : str
+        'array' : ネットワークをint32のCSR配列で保持し、DAGもCSRで保持する
+        'networkx' : シミュレーションごとのグラフをnx.DiGraphで保持する(大きいグラフではメモリが足りない)
+    nodes : ndarray
+        グラフ上のノード集合(ソート済み)
+        ノードが文字列の場合はobject配列で、S, v_gainも文字列のノードで返す
     edge_size : int
         original graphの枝数
     G_V_only : nx.Graph
-        original graphのノードのみのグラフ
+        original graphのノードのみのグラフ(backend='networkx'のみ)
+    src, dst : ndarray of int32
+        枝の始点と終点のnodes上のindex
+    prob : ndarray of float32
+        枝確率(model='lt'の場合は枝の重み)
+    model : str
+        'ic' : Independent Cascade model
+        'lt' : Linear Threshold model
+    sampler : LiveEdgeSampler
+        R回分の枝の生死をビットパックして保持する(backend='array'のみ)
+    n_jobs : int
+        DAGの作成と、各ラウンドのgainの計算に使うプロセス数(backend='array'のみ)
+    seed : int or None
+        乱数のseed。Noneかつn_jobs=1の場合はnp.randomのグローバルな状態を使う
+    seed_seqs : list of np.random.SeedSequence or None
+        seedから派生させたシミュレーションごとのseed
+    cache_dir : str or None
+        DAGを保存するディレクトリ(backend='array'のみ)
+        ネットワーク, R, seedが同じであれば、保存したDAGをmemory mapで読み込んで使い回す
+    max_memory : int or None
+        DAGとgain計算用の状態に使うメモリの上限(バイト, backend='array'のみ)
+    chunks : list of range
+        メモリに同時に載せるシミュレーションの範囲(max_memoryから決める、backend='array'のみ)
+        複数の場合は、DAGをディスクに保存し、各ラウンドでチャンクごとに読み込んでgainを合計する
+    batch_size : int or None
+        最初に作るシミュレーション数(以降はシミュレーション数を倍にしながら追加する, backend='array'のみ)
+    confidence : float
+        最良のノードと次点のノードのgainの差の信頼区間の信頼係数
+    tolerance : float
+        次点のノードの方が良い可能性を許容する、gainに対する割合
+    time_budget : float or None
+        シミュレーションを追加する時間の上限(秒)、直前の追加にかかった時間から次の追加の時間を見積もって判定する
+    delta0 : dict
+        delta0[index(<R)] : ノードを選ぶ前の各DAG上のノードの影響数(backend='array'のみ)
+        add_edgesで、影響数が変わらないノードの再計算を省くために使う
+    stability : list of dict
+        batch_sizeを指定した場合の、ラウンドごとの最良のノードと次点のノードのgainの差(gain_gapを参照)
+    sampling_report : dict
+        batch_sizeを指定した場合の、打ち切りの結果
+        {'R': 使ったシミュレーション数, 'R_max': 上限, 'stable': 全てのラウンドで選択が安定したか,
+        'elapsed': 秒, 'rounds': stability}
+    greedy : str
+        'exhaustive' : 毎回全ノードのgainを計算する
+        'celf' : gainの上界のヒープを使い、ヒープの先頭のみ再計算する(lazy greedy)
     latest : dict
         latest[index(<R)][node]
         gain計算の高速化に用いるフラグ
+        backend='array'の場合はDAG上のノードで引くbool配列
     delta : dict
         delta[index(<R)][node]
         nodeを追加することで増加する影響数
+        backend='array'の場合はDAG上のノードで引くint32配列
     G : dict
         G[index(<R)] : index回目のシミュレーションにより得られるDAGs
+        backend='array'の場合はCondensedDAG
     comp : dict
         comp[index of DAG][original node number] -> DAG node number
+        backend='array'の場合は、comp[index of DAG, nodes上のindex] -> DAG node numberの(R, ノード数)のint32配列
+    n_hubs : int
+        シミュレーションごとのハブの数の上限(backend='array'のみ1より大きくできる)
     A : dict
         A[index(<R)] : index回目のシミュレーションにおいてハブに到達する頂点の集合
+        backend='array'の場合は、到達するハブをビットで表す配列(hub_setsを参照)
     h : dict
         h[i] : index回目のシミュレーションにおいてのハブノード
+        backend='array'の場合はハブノードの配列
     D : dict
         D[index(<R)] : index回目のシミュレーションにおいてハブから到達する頂点の集合
+        backend='array'の場合は、到達するハブのindex(なければ-1)の配列
     V : dict
-        V[index(<R)] : index回目のシミュレーションにより得られるDAGsの頂点集合
+        V[index(<R)][DAG node] : updateで消去されていない(生きている)か
+        DAG自体は変更せず、V[i]で消去された頂点を管理する
+        backend='array'の場合はbool配列
     S : list
         影響力を最大にする頂点集合
+    v_gain : dict
+        {node : expeted influence, ...}
+        greedy='exhaustive'の場合は最後のラウンド、greedy='celf'の場合は最初のラウンドのgain
+    progress : bool
+        進捗バーを表示するか(tqdm.autoを使うため、notebook以外でも表示できる)
+    stats : RunStats
+        フェーズごとの経過時間, 探索したノード数などのカウンタ, DAGの大きさ, ピークメモリ
+        run, add_edgesを呼ぶたびに加算する
     run_flag : bool
         runメソッドを実行したかのフラグ
     """
-    def __init__(self, network, k, R):
+    # snapshot_gainsで、reachable_weightsとノードごとの探索(gain_array)の見積もりの小さい方を使うためのコスト
+    # gain_arrayで1ノード訪れる時間を1とした相対値(benchmarks.bench_pmc --calibrateの計測から求めたもの)
+    # reachable_weights : kernel_word_cost × ビット列の語数(入次数が正のノード数 / 64) × (出次数が正のノード数 + 枝数)
+    #                     + kernel_fixed_cost
+    # gain_array : 再計算が必要なノード数 × (bfs_call_cost + 1回あたりに訪れたノード数の平均)
+    kernel_word_cost = 0.025
+    kernel_fixed_cost = 1500.0
+    bfs_call_cost = 1.5
+    # 訪れたノード数の平均がこの回数分の探索から分かるまでは、再計算が必要なノードの先頭から探索して見積もる
+    bfs_probe = 64
+    cost_attributes = ('kernel_word_cost', 'kernel_fixed_cost', 'bfs_call_cost', 'bfs_probe')
+    _bfs_calls = 0
+    _bfs_visited = 0
+    
+    def __init__(self, network, k, R, backend='array', n_jobs=1, seed=None, greedy='exhaustive',
+                 cache_dir=None, max_memory=None, spill_dir=None, batch_size=None, confidence=0.95,
+                 tolerance=0.01, time_budget=None, model='ic', n_hubs=1, progress=True, callback=None):
         """
         Parameters
         ----------
-        network : ndarray[[float, float, float], ...]
-        [[from_node, to_node, probability], ...]
+        network : ndarray, list or DataFrame
+            [[from_node, to_node, probability], ...]
+            ノードは番号でもscreen_nameなどの文字列でもよい(intern_edgesを参照)
         k : int
             kノードで影響力を最大にする
         R : int
-            シミュレーション数
+            シミュレーション数(batch_sizeを指定した場合は上限)
+        backend : str
+            'array' or 'networkx'
+            同じ乱数の状態からは、どちらのbackendでも同じSが得られる
+        n_jobs : int
+            DAGの作成に使うプロセス数(-1の場合はCPU数、backend='array'のみ)
+            チャンクに分けない場合は、各ラウンドのgainの計算とupdateもシミュレーションを分けて並列に行う(GainPoolを参照)
+        seed : int, optional
+            各シミュレーションはseedから派生させた自身のseedで乱数を生成するため、
+            n_jobsに関わらず同じ結果になる
+        greedy : str
+            'exhaustive' or 'celf'
+            劣モジュラ性によりgainは単調に減少するため、どちらも同じSが得られる
+        cache_dir : str, optional
+            DAGを保存するディレクトリ(seedの指定が必要)
+        max_memory : int, optional
+            DAGとgain計算用の状態に使うメモリの上限(バイト)
+            R回分が収まらない場合はチャンクに分け、DAGと状態をディスクに退避する(greedy='exhaustive'のみ)
+            1シミュレーション分と作業領域(64MiB以上)が収まらない場合はValueError
+        spill_dir : str, optional
+            チャンクを退避するディレクトリ(デフォルトはtempfileの一時ディレクトリ)
+        batch_size : int, optional
+            指定した場合は、batch_size回から始めてシミュレーション数を倍にしながらSを選び直し、
+            全てのラウンドで選択が安定した時点で打ち切る(greedyに関わらず毎回全ノードのgainを計算する)
+            安定とは、次点のノードと最良のノードのgainの差の信頼区間の上限が、tolerance * gain以下であること
+            (最良のノードとの差が有意であるか、どちらを選んでもほぼ同じであるか)
+        confidence : float
+            gainの差の信頼区間の信頼係数
+        tolerance : float
+            次点のノードの方が良い可能性を許容する、gainに対する割合(0の場合は差が有意になるまで追加する)
+        time_budget : float, optional
+            シミュレーションを追加する時間の上限(秒)、次の追加で超えると見積もられる場合は有意でなくても打ち切る
+            (見積もりは直前の追加にかかった時間から求めるため、多少超えることがある)
+        model : str
+            'ic' : Independent Cascade model(各枝を枝確率で残す)
+            'lt' : Linear Threshold model(各ノードに入る枝のうち高々1本を、枝の重みに比例した確率で残す)
+            ノードに入る枝の重みの合計が1を超える場合は、合計が1になるように正規化する
+            DAGは森になるため、gainは部分木の重みの合計として求める
+        n_hubs : int
+            シミュレーションごとのハブの数の上限(1より大きい場合はbackend='array'のみ、64以下)
+            ハブに到達するノードのgainは、ハブのgainを使い回してハブから到達するノードを探索しない
+            ハブのgainもupdateで変わった場合のみ再計算されるため、全てのラウンドで使い回せる
+        progress : bool
+            進捗バーを表示するか
+        callback : callable, optional
+            callback(event, stats)、DAGの作成後('dags'), ノードを1つ選ぶごと('round'),
+            run, add_edgesの終了後('done')に、その時点のstats(RunStats)を渡して呼ぶ
         """
+        if backend not in ('networkx', 'array'):
+            raise ValueError(f'unknown backend : {backend}')
+        if greedy not in ('exhaustive', 'celf'):
+            raise ValueError(f'unknown greedy : {greedy}')
+        if model not in ('ic', 'lt'):
+            raise ValueError(f'unknown model : {model}')
+        if not 1 <= n_hubs <= 64 or (n_hubs > 1 and backend != 'array'):
+            raise ValueError("n_hubs must be in [1, 64], and n_hubs > 1 requires backend='array'")
+        if n_jobs == -1:
+            n_jobs = os.cpu_count()
+        if n_jobs != 1 and backend != 'array':
+            raise ValueError("n_jobs is only supported with backend='array'")
+        if cache_dir is not None and (backend != 'array' or seed is None):
+            raise ValueError("cache_dir requires backend='array' and seed")
+        if max_memory is not None and (backend != 'array' or greedy != 'exhaustive'):
+            raise ValueError("max_memory requires backend='array' and greedy='exhaustive'")
+        if batch_size is not None and (backend != 'array' or max_memory is not None or cache_dir is not None):
+            raise ValueError("batch_size requires backend='array' without max_memory and cache_dir")
         
-        self.network = network
         self.k = k
         self.R = R
+        self.backend = backend
+        self.n_jobs = n_jobs
+        self.greedy = greedy
+        self.cache_dir = cache_dir
+        self.max_memory = max_memory
+        self.spill_dir = spill_dir
+        self.batch_size = batch_size
+        self.confidence = confidence
+        self.tolerance = tolerance
+        self.model = model
+        self.n_hubs = n_hubs
+        self.time_budget = time_budget
+        self.progress = progress
+        self.stats = RunStats(callback)
+        
+        # n_jobs > 1の場合は、seedがなくてもシミュレーションごとにseedを派生させる
+        if seed is None and n_jobs == 1:
+            self.seed = None
+            self.seed_seqs = None
+        else:
+            seed_seq = np.random.SeedSequence(seed)
+            self.seed = seed_seq.entropy
+            self.seed_seqs = seed_seq.spawn(R)
         
-        self.nodes = np.unique(network[:, :2]).astype(np.int)
-        self.edge_size = self.network.shape[0]
-        self.G_V_only = nx.DiGraph()
-        self.G_V_only.add_nodes_from(self.nodes)
+        self.nodes, self.src, self.dst, self.prob = intern_edges(network)
+        self.edge_size = len(self.src)
+        # Linear Threshold modelの抽選に使う、終点ごとの累積重み
+        self._lt = lt_table(self.dst, self.prob, len(self.nodes)) if model == 'lt' else None
+        if self.backend == 'networkx':
+            self.G_V_only = nx.DiGraph()
+            self.G_V_only.add_nodes_from(self.nodes)
+        else:
+            # bfsの作業用配列
+            self._mark = None
+        self.chunks = [range(R)]
+        # チャンクを退避する一時ディレクトリと、各チャンクにupdateを適用済みのSの長さ
+        self._spill = None
+        self._applied = None
+        self._spread_estimator = None
+        # gainを並列に計算するworker(gain_poolを参照)
+        self._pool = None
         
         self.latest = dict()
         self.delta = {i:dict() for i in range(self.R)}
@@ -75,24 +449,33 @@ class InfuenceMaximizer:
         self.h = dict()
         self.D = dict()
         self.V = dict()
+        self.delta0 = dict()
         self.S = []
+        self.stability = []
         
         self.run_flag = False
         
-    def make_live_edge(self):
+    def make_live_edge(self, random_state=np.random):
         """
         枝確率に従って残った枝を返す
         
+        Parameters
+        ----------
+        random_state : np.random.RandomState or np.random.Generator
+            乱数生成器(デフォルトはnp.randomのグローバルな状態)
+        
         Returns
         -------
-        live_edges : array of int
-            残った枝のarrya型のindex
+        live_edges : zip
+            残った枝の(from_node, to_node)
         """
-        rand = np.random.uniform(0, 1, self.edge_size)
-        l = np.where(rand < self.network[:, 2])[0]
-        return self.network[l][:, :2].astype(np.int)
+        if self._lt is None:
+            l = np.where(random_state.uniform(0, 1, self.edge_size) < self.prob)[0]
+        else:
+            l = np.flatnonzero(lt_live(self._lt, random_state.uniform(0, 1, len(self.nodes)), self.edge_size))
+        return zip(self.nodes[self.src[l]], self.nodes[self.dst[l]])
         
-    def bfs(self, G, S):
+    def bfs(self, G, S, alive=None):
         """
         幅優先探索
         
@@ -102,6 +485,8 @@ class InfuenceMaximizer:
             対象のグラフ
         S : array-like
             seed(幅優先探索する最初のノードの集合)
+        alive : dict, optional
+            {node : bool}, Falseのノードは探索しない
         
         Returns
         -------
@@ -115,12 +500,12 @@ class InfuenceMaximizer:
             v = queue.popleft()
             out_node = G.successors(v)
             for u in out_node:
-                if not (u in visited):
+                if not (u in visited) and (alive is None or alive[u]):
                     queue.append(u)
                     visited[u] = v
         return visited
     
-    def bfs_reverse(self, G, S):
+    def bfs_reverse(self, G, S, alive=None):
         """
         逆グラフにおける幅優先探索
         
@@ -130,6 +515,8 @@ class InfuenceMaximizer:
             対象のグラフ
         S : array-like
             seed(幅優先探索する最初のノードの集合)
+        alive : dict, optional
+            {node : bool}, Falseのノードは探索しない
             
         Returns
         -------
@@ -143,7 +530,7 @@ class InfuenceMaximizer:
             v = queue.popleft()
             in_node = G.predecessors(v)
             for u in in_node:
-                if not (u in visited):
+                if not (u in visited) and (alive is None or alive[u]):
                     queue.append(u)
                     visited[u] = v
         return visited
@@ -161,24 +548,25 @@ class InfuenceMaximizer:
             member属性には、集約された頂点数が格納されている
         """
         
-        # 行きがけ深さ優先探索
+        # 行きがけ深さ優先探索(帰りがけ順の逆順をvsに記録する)
         visited = dict([])
         vs = deque([])
         
         for s in G.nodes():
             if s not in visited:
                 visited[s] = None
-                stack = deque([s])
-                vs_tmp = deque([s])
+                stack = deque([(s, iter(G[s]))])
                 
                 while stack:
-                    v = stack.pop()
-                    vs_tmp.appendleft(v)
-                    for u in G[v]:
+                    v, it = stack[-1]
+                    for u in it:
                         if u not in visited:
                             visited[u] = s
-                            stack.append(u)
-                vs.extendleft(vs_tmp)
+                            stack.append((u, iter(G[u])))
+                            break
+                    else:
+                        stack.pop()
+                        vs.appendleft(v)
 
         # 帰りがけ深さ優先探索
         group = dict([])
@@ -216,19 +604,458 @@ class InfuenceMaximizer:
         - ハブから到達するノード集合を探索
         上記をR回行なっている
         """
+        if self.backend == 'array':
+            return self.make_random_DAGs_array()
         
-        for i in tqdm(range(self.R)):
-            G_ = self.G_V_only.copy()
-            G_.add_edges_from(self.make_live_edge())
+        for i in tqdm(range(self.R), disable=not self.progress):
+            with self.stats.phase('sampling'):
+                G_ = self.G_V_only.copy()
+                if self.seed_seqs is None:
+                    G_.add_edges_from(self.make_live_edge())
+                else:
+                    G_.add_edges_from(self.make_live_edge(np.random.default_rng(self.seed_seqs[i])))
             
-            self.comp[i], self.G[i] = self.scc(G_)
+            with self.stats.phase('scc'):
+                self.comp[i], self.G[i] = self.scc(G_)
+            self.stats.dag_sizes[i] = (self.G[i].number_of_nodes(), self.G[i].number_of_edges())
             
-            G_i_deg = dict(self.G[i].degree())
-            self.h[i] = max(G_i_deg, key=G_i_deg.get)
-            self.D[i] = set(self.bfs(self.G[i], [self.h[i]]))
-            self.A[i] = set(self.bfs_reverse(self.G[i], [self.h[i]])) - set([self.h[i]])
-            self.V[i] = self.G[i].nodes()
+            with self.stats.phase('hub'):
+                G_i_deg = dict(self.G[i].degree())
+                self.h[i] = max(G_i_deg, key=G_i_deg.get)
+                self.D[i] = set(self.bfs(self.G[i], [self.h[i]]))
+                self.A[i] = set(self.bfs_reverse(self.G[i], [self.h[i]])) - set([self.h[i]])
+            self.V[i] = {v: True for v in self.G[i].nodes()}
             self.latest[i] = {v: False for v in self.V[i]}
+    
+    def make_random_DAGs_array(self):
+        """
+        make_random_DAGsのbackend='array'版
+        seedがない場合は、R回分のlive-edgeをまとめて抽選し(make_live_edgeをR回呼んだ場合と同じ乱数を使う)、
+        強連結成分分解をCSR上で行う
+        seedがある場合は、シミュレーションごとのseedでn_jobsプロセスに分けて作成する
+        cache_dirに同じネットワーク, R, seedで作成したDAGがあれば、それを読み込む
+        max_memoryに収まらない場合は、チャンクごとに作成してディスクに退避する
+        """
+        self.sampler = self.make_sampler(self.R)
+        self._key = None
+        self._spill = None
+        if self.seed_seqs is None:
+            with self.stats.phase('sampling'):
+                self.sampler.sample()
+        self.chunks = self.snapshot_chunks()
+        if len(self.chunks) == 1:
+            self.comp = np.empty((self.R, len(self.nodes)), dtype=np.int32)
+            self.load_or_make_snapshots(self.chunks[0], self.cache_dir)
+            return
+        
+        self.comp = dict()
+        self._spill = tempfile.TemporaryDirectory(prefix='pmc-', dir=self.spill_dir)
+        self._applied = [0] * len(self.chunks)
+        for snapshots in tqdm(self.chunks, disable=not self.progress):
+            self.load_or_make_snapshots(snapshots, self.cache_dir or self._spill.name)
+            self.release_snapshots(snapshots)
+    
+    def make_sampler(self, n_sims):
+        """
+        modelに応じたlive-edgeの抽選器を作る
+        
+        Parameters
+        ----------
+        n_sims : int
+            シミュレーション数
+        
+        Returns
+        -------
+        sampler : LiveEdgeSampler or LTLiveEdgeSampler
+        """
+        if self._lt is None:
+            return LiveEdgeSampler(self.prob, n_sims)
+        return LTLiveEdgeSampler(self.prob, n_sims, self.dst, len(self.nodes))
+    
+    def snapshot_chunks(self):
+        """
+        max_memoryに収まるように、シミュレーションをチャンクに分ける
+        1シミュレーションあたりのメモリは、ノード数と枝確率の合計(残る枝数の期待値)から見積もる
+        
+        Returns
+        -------
+        chunks : list of range
+        
+        Raises
+        ------
+        ValueError
+            max_memoryが常にメモリにある分と1シミュレーション分の合計より小さい場合
+        """
+        if self.max_memory is None:
+            return [range(self.R)]
+        n = len(self.nodes)
+        # comp, DAGの重みとindptr, V, latest, A, D, deltaがノード(強連結成分)あたり24バイト、DAGの枝が8バイト
+        per_snapshot = 24 * n + 8 * float(self.prob.sum())
+        # 全シミュレーションのlive-edge, 元のグラフ, reachable_weightsの作業領域, プロセスごとの枝の抽選は常にメモリにある
+        fixed = self.sampler.masks.nbytes + self.src.nbytes + self.dst.nbytes + self.prob.nbytes + (1 << 26) \
+            + 9 * self.edge_size * self.n_jobs
+        if self.max_memory < fixed + per_snapshot:
+            raise ValueError(f'max_memory={self.max_memory} is too small: '
+                             f'at least {int(fixed + per_snapshot) + 1} bytes are required for this graph')
+        size = int((self.max_memory - fixed) // per_snapshot)
+        return [range(a, min(a + size, self.R)) for a in range(0, self.R, size)]
+    
+    def load_or_make_snapshots(self, snapshots, directory):
+        """
+        snapshotsの範囲のDAGをdirectoryから読み込み、なければ作成して保存する
+        
+        Parameters
+        ----------
+        snapshots : range
+            シミュレーションの範囲
+        directory : str or None
+            DAGを保存するディレクトリ(Noneの場合は保存しない)
+        """
+        if directory is not None:
+            if self._key is None:
+                self._key = snapshot_key(self.nodes, self.src, self.dst, self.prob, self.R, self.seed,
+                                         self.model)
+            name = self._key if len(snapshots) == self.R else f'{self._key}.{snapshots.start}-{snapshots.stop}'
+            path = os.path.join(directory, name)
+            if load_snapshots(path, self, self._key, snapshots):
+                self.reserve_mark(snapshots)
+                return
+        
+        self.make_snapshots(snapshots)
+        self.reserve_mark(snapshots)
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            save_snapshots(path, self, self._key, snapshots)
+    
+    def make_snapshots(self, snapshots):
+        """
+        snapshotsの範囲のDAGを作成する
+        
+        Parameters
+        ----------
+        snapshots : range
+            シミュレーションの範囲
+        """
+        n = len(self.nodes)
+        if self.seed_seqs is None:
+            for i in tqdm(snapshots, disable=not self.progress):
+                with self.stats.phase('sampling'):
+                    live = self.sampler.live(i)
+                self.set_snapshot(i, *make_snapshot(self.src, self.dst, live, n, self.n_hubs, self.stats.timers))
+            return
+        
+        # workerごとの偏りを減らすため、1プロセスあたり4チャンクに分ける
+        seed_seqs = self.seed_seqs[snapshots.start:snapshots.stop]
+        n_chunks = min(len(seed_seqs), 4 * self.n_jobs)
+        bounds = np.linspace(0, len(seed_seqs), n_chunks + 1).astype(int)
+        chunks = [seed_seqs[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+        if self.n_jobs == 1:
+            self.set_snapshots((make_snapshots_seeded(self.src, self.dst, self.prob, n, c, self._lt, self.n_hubs,
+                                                      self.stats.timers)
+                                for c in chunks), snapshots.start)
+        else:
+            with ProcessPoolExecutor(max_workers=self.n_jobs, initializer=_init_worker,
+                                     initargs=(self.src, self.dst, self.prob, n, self._lt, self.n_hubs)) as executor:
+                self.set_snapshots(self.merge_times(executor.map(_worker_make_snapshots, chunks)), snapshots.start)
+    
+    def merge_times(self, results):
+        """
+        workerの結果(snapshots, times)から、経過時間をstatsに加えてsnapshotsのみを返す
+        """
+        for snapshots, times in results:
+            self.stats.add_times(times)
+            yield snapshots
+    
+    def reserve_mark(self, snapshots):
+        """
+        bfsの作業用配列を、snapshotsの範囲のDAGのノード数以上にする
+        """
+        size = max(self.G[i].n for i in snapshots)
+        if self._mark is None or len(self._mark) < size:
+            self._mark = np.zeros(size, dtype=bool)
+    
+    def set_snapshots(self, results, start=0):
+        """
+        make_snapshots_seededの結果を順に格納する
+        
+        Parameters
+        ----------
+        results : iterable of list
+            チャンクごとのmake_snapshots_seededの結果(シミュレーション順)
+        start : int
+            最初のシミュレーションのindex
+        """
+        i = start
+        for snapshots in tqdm(results, disable=not self.progress):
+            for packed, *snapshot in snapshots:
+                self.sampler.masks[i] = packed
+                self.set_snapshot(i, *snapshot)
+                i += 1
+    
+    def release_snapshots(self, snapshots):
+        """
+        snapshotsの範囲のDAGと状態をメモリから消去する(チャンクに分けた場合のみ)
+        """
+        for i in snapshots:
+            for state in (self.comp, self.G, self.h, self.A, self.D, self.V, self.latest, self.delta):
+                del state[i]
+    
+    def load_chunk(self, c):
+        """
+        c番目のチャンクのDAGと退避した状態を読み込み、まだ適用していないSのupdateを行う
+        
+        Parameters
+        ----------
+        c : int
+            チャンクのindex
+        """
+        snapshots = self.chunks[c]
+        self.load_or_make_snapshots(snapshots, self.cache_dir or self._spill.name)
+        path = os.path.join(self._spill.name, f'state{c}.npz')
+        if os.path.exists(path):
+            with np.load(path) as f:
+                sizes = np.cumsum([self.G[i].n for i in snapshots])[:-1]
+                for name in ('V', 'latest', 'delta'):
+                    state = getattr(self, name)
+                    for i, a in zip(snapshots, np.split(f[name], sizes)):
+                        state[i] = a
+        for t in self.S[self._applied[c]:]:
+            for i in snapshots:
+                self.update(i, t)
+        self._applied[c] = len(self.S)
+    
+    def spill_chunk(self, c):
+        """
+        c番目のチャンクの状態(V, latest, delta)をディスクに退避し、メモリから消去する
+        
+        Parameters
+        ----------
+        c : int
+            チャンクのindex
+        """
+        snapshots = self.chunks[c]
+        path = os.path.join(self._spill.name, f'state{c}.npz')
+        np.savez(path, **{name: np.concatenate([getattr(self, name)[i] for i in snapshots])
+                          for name in ('V', 'latest', 'delta')})
+        self.release_snapshots(snapshots)
+    
+    def add_edges(self, edges, rerun=True):
+        """
+        作成済みのDAGに枝を追加する(backend='array'のみ)
+        全てのシミュレーションで追加した枝の生死のみを抽選し、DAGを更新する(extend_snapshotを参照)
+        ノードを選ぶ前の影響数(delta0)は、追加した枝の始点に到達しないノードについてはそのまま使う
+        同じseedであれば、同じ順に追加した場合は同じ結果になる
+        (全ての枝で作り直した場合とは乱数が異なるため、Sが一致するとは限らない)
+        
+        Parameters
+        ----------
+        edges : ndarray, list or DataFrame
+            [[from_node, to_node, probability], ...]
+            新しいノードを含んでもよい
+        rerun : bool
+            Trueの場合はSを選び直す
+        
+        Returns
+        -------
+        S : list
+            rerun=Trueの場合は選び直したS
+        
+        Example
+        -------
+        >>> inf = InfuenceMaximizer(adj_list, 5, 100, seed=0)
+        >>> inf.run()
+        >>> adj_list, users_info = network_getter.get_network('user2')
+        >>> inf.add_edges(adj_list)
+        """
+        if self.backend != 'array' or len(self.chunks) > 1 or self.model != 'ic':
+            raise ValueError("add_edges requires backend='array', model='ic' and no chunks")
+        self.close_gain_pool()
+        labels, src, dst, prob = intern_edges(edges)
+        nodes = np.union1d(self.nodes, labels)
+        old = np.searchsorted(nodes, self.nodes)
+        new = np.ones(len(nodes), dtype=bool)
+        new[old] = False
+        new = np.flatnonzero(new)
+        src = np.concatenate([old[self.src], np.searchsorted(nodes, labels[src])]).astype(np.int32)
+        dst = np.concatenate([old[self.dst], np.searchsorted(nodes, labels[dst])]).astype(np.int32)
+        n_edge = self.edge_size
+        self.nodes, self.src, self.dst = nodes, src, dst
+        self.prob = np.concatenate([self.prob, prob])
+        self.edge_size = len(src)
+        self._spread_estimator = None
+        if not self.G:
+            return self.S
+        
+        # 追加した枝の生死を抽選し、ビットパックしたlive-edgeの後ろにつなげる
+        with self.stats.phase('sampling'):
+            if self.seed_seqs is None:
+                live = np.random.uniform(0, 1, (self.R, len(prob))) < prob
+            else:
+                live = np.array([np.random.default_rng(self.seed_seqs[i].spawn(1)[0]).uniform(0, 1, len(prob)) < prob
+                                 for i in range(self.R)]).reshape(self.R, len(prob))
+            masks = np.zeros((self.R, (self.edge_size + 7) // 8), dtype=np.uint8)
+            for i in range(self.R):
+                masks[i] = np.packbits(np.concatenate([self.sampler.live(i), live[i]]))
+        self.sampler.masks = masks
+        self.sampler.prob = self.prob
+        self.sampler.edge_size = self.edge_size
+        
+        comp = np.empty((self.R, len(nodes)), dtype=np.int32)
+        for i in tqdm(range(self.R), disable=not self.progress):
+            # 新しいノードは、それぞれ一つの強連結成分としてDAGの後ろに加える
+            dag = self.G[i]
+            comp[i, old] = self.comp[i]
+            comp[i, new] = np.arange(dag.n, dag.n + len(new), dtype=np.int32)
+            pad = np.full(len(new), dag.indptr[-1], dtype=np.int32)
+            dag = CondensedDAG.from_csr(np.concatenate([dag.weight, np.ones(len(new), dtype=np.int32)]),
+                                        np.concatenate([dag.indptr, pad]), dag.indices,
+                                        np.concatenate([dag.rindptr, pad]), dag.rindices)
+            
+            e = n_edge + np.flatnonzero(live[i])
+            with self.stats.phase('scc'):
+                comp[i], dag, stale = extend_snapshot(comp[i], dag, src[e], dst[e])
+            self.G[i] = dag
+            self.stats.dag_sizes[i] = (dag.n, len(dag.indices))
+            with self.stats.phase('hub'):
+                self.h[i], self.A[i], self.D[i] = hub_sets(dag, self.n_hubs)
+            self.reset_snapshot(i)
+            if stale is not None and i in self.delta0:
+                self.delta[i][:len(self.delta0[i])] = self.delta0[i]
+                self.delta[i][len(self.delta0[i]):] = 1
+                self.latest[i][:] = ~stale
+            self.delta0.pop(i, None)
+        self.comp = comp
+        self._mark = None
+        self.reserve_mark(range(self.R))
+        
+        if rerun:
+            self.S = []
+            try:
+                if self.greedy == 'celf':
+                    self.select_celf()
+                else:
+                    self.select_exhaustive()
+            finally:
+                self.close_gain_pool()
+        self.stats.emit('done')
+        return self.S
+    
+    def set_snapshot(self, i, comp, dag, h, A, D):
+        """
+        i回目のシミュレーションのDAGを格納し、gain計算用の状態を初期化する(backend='array'のみ)
+        compがNoneの場合は、self.comp[i]に格納済みとする
+        """
+        if comp is not None:
+            self.comp[i] = comp
+        self.G[i], self.h[i], self.A[i], self.D[i] = dag, h, A, D
+        self.stats.dag_sizes[i] = (dag.n, len(dag.indices))
+        self.reset_snapshot(i)
+    
+    def reset_snapshot(self, i):
+        """
+        i回目のシミュレーションのgain計算用の状態を、ノードを選ぶ前の状態に戻す(backend='array'のみ)
+        """
+        n = self.G[i].n
+        self.V[i] = np.ones(n, dtype=bool)
+        self.latest[i] = np.zeros(n, dtype=bool)
+        # 影響数はノード数以下のため、int32で足りる
+        self.delta[i] = np.zeros(n, dtype=np.int32)
+    
+    @classmethod
+    def from_snapshots(cls, snapshots, arrays, model='ic', costs=None):
+        """
+        作成済みのDAGと状態の配列から、snapshotsの範囲のgainとupdateのみを計算するインスタンスをコピーせずに作る
+        (GainPoolのworkerが共有メモリ上の配列から作るため)
+        
+        Parameters
+        ----------
+        snapshots : range
+            シミュレーションの範囲
+        arrays : list of dict
+            シミュレーションごとの{'weight', 'indptr', 'indices', 'rindptr', 'rindices',
+            'comp', 'h', 'A', 'D', 'V', 'latest', 'delta' : ndarray}
+        model : str
+            'ic' or 'lt'
+        costs : dict, optional
+            {cost_attributesの名前 : 値}
+        
+        Returns
+        -------
+        maximizer : InfuenceMaximizer
+        """
+        self = cls.__new__(cls)
+        self.backend = 'array'
+        self.model = model
+        for name, value in (costs or dict()).items():
+            setattr(self, name, value)
+        self.stats = RunStats()
+        self.G, self.comp, self.h, self.A, self.D = dict(), dict(), dict(), dict(), dict()
+        self.V, self.latest, self.delta = dict(), dict(), dict()
+        for i, a in zip(snapshots, arrays):
+            self.G[i] = CondensedDAG.from_csr(a['weight'], a['indptr'], a['indices'], a['rindptr'], a['rindices'])
+            for name in ('comp', 'h', 'A', 'D', 'V', 'latest', 'delta'):
+                getattr(self, name)[i] = a[name]
+        self._mark = None
+        self.reserve_mark(snapshots)
+        return self
+    
+    def gain_pool(self):
+        """
+        gainを並列に計算するGainPoolを返す(なければ作る)
+        n_jobs=1の場合, チャンクに分けた場合, batch_sizeを指定した場合は並列にしないためNone
+        
+        Returns
+        -------
+        pool : GainPool or None
+        """
+        if self.n_jobs == 1 or self.backend != 'array' or self._spill is not None or \
+                self.batch_size is not None or self.R < 2:
+            return None
+        if self._pool is None:
+            self._pool = GainPool(self, min(self.n_jobs, self.R))
+        return self._pool
+    
+    def close_gain_pool(self):
+        """
+        GainPoolのworkerを終了する(状態は親プロセスにコピーされる)
+        """
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            pool.close()
+    
+    def memory_usage(self):
+        """
+        シミュレーションごとのメモリ使用量を返す(backend='array'のみ)
+        memory mapで読み込んだ配列も含む
+        チャンクに分けた場合は、メモリに読み込まれていないシミュレーションは0になる
+        
+        Returns
+        -------
+        usage : dict
+            {
+            'comp': 元のノード -> DAG上のノードの対応,
+            'dag': DAGのCSRと重み,
+            'state': V, latest, delta, A, D,
+            'live': ビットパックされたlive-edge,
+            'total': 合計
+            }
+            各値はシミュレーションごとのバイト数のint64配列
+        
+        Example
+        -------
+        >>> inf.make_random_DAGs()
+        >>> inf.memory_usage()['total'].sum() / 2**30
+        1.8
+        """
+        usage = {name: np.zeros(self.R, dtype=np.int64) for name in ('comp', 'dag', 'state', 'live')}
+        for i in self.G:
+            dag = self.G[i]
+            usage['comp'][i] = self.comp[i].nbytes
+            usage['dag'][i] = sum(a.nbytes for a in (dag.weight, dag.indptr, dag.indices, dag.rindptr, dag.rindices))
+            usage['state'][i] = sum(a[i].nbytes for a in (self.V, self.latest, self.delta, self.A, self.D))
+            usage['live'][i] = self.sampler.masks[i].nbytes
+        usage['total'] = usage['comp'] + usage['dag'] + usage['state'] + usage['live']
+        return usage
             
     def gain(self, i, v_V):
         """
@@ -246,6 +1073,12 @@ class InfuenceMaximizer:
         latest[i][v] : float
             影響力の増分
         """
+        if self.backend == 'array':
+            j = np.searchsorted(self.nodes, v_V)
+            if j == len(self.nodes) or self.nodes[j] != v_V:
+                return 0
+            return self.gain_array(i, self.comp[i][j])
+        
         # i回目のシュミレーションにliveしなかった頂点はそもそもgainが0
         if v_V not in self.comp[i]:
             return 0
@@ -253,23 +1086,21 @@ class InfuenceMaximizer:
         # v:i回目のシュミレーションで作成されたグラフのv_Vを含む強連結成分
         v = self.comp[i][v_V]
         
-        if v not in self.G[i].nodes():
-            return 0
-        
-        # G[i].nodes()にvがない場合0(アップデータにより後に消されていく可能性があるため)
-        if v not in self.G[i].nodes():
-            self.delta[i][v] = 0
+        # updateにより消去されている場合は0
+        if not self.V[i][v]:
             return 0
         
         # 計算済みのため、そのまま返す
         if self.latest[i][v]:
+            self.stats.counters['cache_hits'] += 1
             return self.delta[i][v]
         
         self.latest[i][v] = True
+        self.stats.counters['cache_misses'] += 1
         
-        # len(S)==0の理由は初回のみ行えば良いため(h(ハブ)以降の到達頂点数は一回行えば十分であるため)
         # vがhのacestorだった場合、hの到達頂点数を計算して、他のacestorの時にも使い回す
-        if (v in self.A[i]) and (len(self.S) == 0):
+        # hの到達頂点数はupdateで変わった場合のみ再計算されるため、Sを選んだ後のラウンドでも使い回せる
+        if v in self.A[i]:
             # hのGAINをはじめから足しておく([0]なのは、何を選んでもあるvへ写像されるため)
             h_V = self.G[i].nodes[self.h[i]]["members"][0]
             self.delta[i][v] = self.gain(i, h_V)
@@ -283,7 +1114,7 @@ class InfuenceMaximizer:
         while Q:
             u = Q.popleft()
 
-            if (v in self.A[i]) and (u in self.D[i]) and (len(self.S) == 0):
+            if (v in self.A[i]) and (u in self.D[i]):
                 continue
 
             self.delta[i][v] += self.G[i].nodes[u]["weight"]
@@ -292,15 +1123,75 @@ class InfuenceMaximizer:
             Edges = self.G[i].out_edges(u)
             for u_, w in Edges:
                 # 探索済みの強連結成分は探索しなくていいので、w not in X
-                # w in V[i]はのちのupdateでV[i]が変化するため
-                if (w not in X) and (w in self.G[i].nodes()):
+                # V[i][w]はのちのupdateでV[i]が変化するため
+                if (w not in X) and self.V[i][w]:
                     Q.append(w)
                     X.add(w) 
+        self.stats.counters['bfs_visited'] += len(X)
         return self.delta[i][v]
+    
+    def gain_array(self, i, v):
+        """
+        gainのbackend='array'版
+        
+        Parameters
+        ----------
+        i : int
+            何回目のシミュレーションか
+        v : int
+            影響力の増分を計算するDAG上のノード
+        
+        Returns
+        -------
+        delta[i][v] : int
+            影響力の増分
+        """
+        # updateにより消去されている
+        if not self.V[i][v]:
+            return 0
+        
+        # 計算済みのため、そのまま返す
+        if self.latest[i][v]:
+            self.stats.counters['cache_hits'] += 1
+            return self.delta[i][v]
+        
+        self.latest[i][v] = True
+        self.stats.counters['cache_misses'] += 1
+        
+        dag = self.G[i]
+        # vがハブのacestorだった場合、ハブの到達頂点数を使い回し、ハブから到達する頂点は探索しない
+        # (ハブから到達する頂点の集合は互いに重ならない)
+        d = 0
+        hubs = int(self.A[i][v])
+        while hubs:
+            j = (hubs & -hubs).bit_length() - 1
+            d += self.gain_array(i, int(self.h[i][j]))
+            hubs &= hubs - 1
+        hubs = int(self.A[i][v])
+        hub_of = self.D[i]
+        
+        # 到達頂点が少ない場合が多いため、頂点ごとに探索する
+        alive = self.V[i]
+        Q = deque([v])
+        X = set([v])
+        while Q:
+            u = Q.popleft()
+            d += int(dag.weight[u])
+            for w in dag.indices[dag.indptr[u]:dag.indptr[u + 1]].tolist():
+                if (w not in X) and alive[w] and not (hubs and hub_of[w] >= 0 and hubs >> int(hub_of[w]) & 1):
+                    Q.append(w)
+                    X.add(w)
+        
+        self.stats.counters['bfs_visited'] += len(X)
+        self._bfs_calls += 1
+        self._bfs_visited += len(X)
+        self.delta[i][v] = d
+        return d
         
     def update(self, i, t_V):
         """
-        探索する必要のないノードをグラフ上から消去する
+        探索する必要のないノードを消去する
+        DAGは変更せず、V[i]をFalseにすることで消去する
         
         Parameters
         i : int
@@ -309,25 +1200,282 @@ class InfuenceMaximizer:
             t_Vから到達可能な頂点集合を消去する
         ----------
         """
+        if self.backend == 'array':
+            j = np.searchsorted(self.nodes, t_V)
+            if j < len(self.nodes) and self.nodes[j] == t_V:
+                self.update_array(i, self.comp[i][j])
+            return
+        
         if t_V not in self.comp[i]:
-            return self.G[i]
+            return
     
         # t:DAG上でのノードid
         t = self.comp[i][t_V]
 
-        if t in self.G[i]:
-            # t -> u
-            u = list(self.bfs(self.G[i], [t]))
-            # u = list(dict(nx.bfs_edges(G[i], t)))
+        if self.V[i][t]:
+            # t -> u:新たに消去される頂点
+            u = list(self.bfs(self.G[i], [t], self.V[i]))
             # v -> u:上で求めたuにだどりつくvを求める
-            v = set(self.bfs_reverse(self.G[i], u))
-
-            # v かつ Viに存在する頂点
-            v_ = list(v & set(self.G[i].nodes()))
-            self.latest[i].update(zip(v_, [False]*len(v_)))
-
-            self.G[i].remove_nodes_from(u)
+            # 消去済みの頂点から到達する頂点は全て消去済みであり、uへの経路は消去済みの頂点を経由しないため、消去済みの頂点で探索を打ち切る
+            v = list(self.bfs_reverse(self.G[i], u, self.V[i]))
+            self.stats.counters['bfs_visited'] += len(u) + len(v)
+            self.latest[i].update(zip(v, [False]*len(v)))
+            self.V[i].update(zip(u, [False]*len(u)))
+    
+    def update_array(self, i, t):
+        """
+        updateのbackend='array'版
+        DAGは変更せず、V[i]をFalseにすることで消去する
+        
+        Parameters
+        ----------
+        i : int
+            何回目のシミュレーションか
+        t : int
+            DAG上のノード、tから到達可能な頂点集合を消去する
+        """
+        if not self.V[i][t]:
+            return
+        
+        dag = self.G[i]
+        # t -> u:新たに消去される頂点
+        u = bfs(dag.indptr, dag.indices, [t], allowed=self.V[i], mark=self._mark)
+        # v -> u:上で求めたuにだどりつくvを求める(消去済みの頂点で探索を打ち切る)
+        v = bfs(dag.rindptr, dag.rindices, u, allowed=self.V[i], mark=self._mark)
+        self.stats.counters['bfs_visited'] += len(u) + len(v)
+        self.latest[i][v] = False
+        self.V[i][u] = False
+        
+    def snapshot_gains(self, i):
+        """
+        i回目のシミュレーションの全てのDAG上のノードのgainを求める(backend='array'のみ)
+        reachable_weightsで全てのノードを一度に計算する方が、再計算が必要なノードごとに探索するより
+        見積もりのコストが小さい場合はreachable_weightsを使う(kernel_word_costなどを参照)
+        model='lt'の場合はDAGが森のため、再計算が必要なノードがあればforest_subtree_weightsで計算する
+        
+        Parameters
+        ----------
+        i : int
+            何回目のシミュレーションか
+        
+        Returns
+        -------
+        gains : ndarray of int64
+            gains[DAG node] : 影響力の増分(消去されたノードは0)
+        """
+        alive = self.V[i]
+        stale = np.flatnonzero(alive & ~self.latest[i])
+        counters = self.stats.counters
+        counters['cache_hits'] += int(np.count_nonzero(alive)) - len(stale)
+        if self.model == 'lt' and len(stale):
+            self.delta[i][:] = forest_subtree_weights(self.G[i], np.where(alive, self.G[i].weight, 0))
+            self.latest[i][:] = True
+            counters['cache_misses'] += len(stale)
+            counters['kernel_calls'] += 1
+        elif len(stale) and self.prefer_kernel(i, stale):
+            # 消去されたノードから到達するノードは全て消去されているため、重みを0にすれば消去されていないノードの数になる
+            # (prefer_kernelで探索したノードはcache_missesに数え済み)
+            counters['cache_misses'] += int(np.count_nonzero(alive & ~self.latest[i]))
+            self.delta[i][:] = reachable_weights(self.G[i], np.where(alive, self.G[i].weight, 0))
+            self.latest[i][:] = True
+            counters['kernel_calls'] += 1
+        else:
+            for v in stale[~self.latest[i][stale]].tolist():
+                self.gain_array(i, v)
+        return np.where(alive, self.delta[i], 0)
+    
+    def prefer_kernel(self, i, stale):
+        """
+        i回目のシミュレーションで、reachable_weightsの方がstaleのノードごとに探索するより速いと見積もられるか
+        1回あたりに訪れたノード数の平均が分からない場合は、staleの先頭bfs_probe個を先に探索して見積もる
+        (探索したノードはlatestになるため、そのgainはそのまま使う)
+        
+        Parameters
+        ----------
+        i : int
+            何回目のシミュレーションか
+        stale : ndarray
+            再計算が必要なDAG上のノード
         
+        Returns
+        -------
+        ret : bool
+        """
+        if self._bfs_calls < self.bfs_probe:
+            for v in stale[:self.bfs_probe].tolist():
+                self.gain_array(i, v)
+            stale = stale[~self.latest[i][stale]]
+        dag = self.G[i]
+        rows = np.count_nonzero(np.diff(dag.indptr))
+        cols = np.count_nonzero(np.diff(dag.rindptr))
+        kernel = self.kernel_word_cost * -(-cols // 64) * (rows + len(dag.indices)) + self.kernel_fixed_cost
+        bfs = len(stale) * (self.bfs_call_cost + self._bfs_visited / max(self._bfs_calls, 1))
+        return kernel < bfs
+    
+    def all_node_gains(self):
+        """
+        全てのノードについてR回のシミュレーションにおける影響力の増分の合計を求める(backend='array'のみ)
+        
+        Returns
+        -------
+        gains : ndarray of int64
+            gains[nodes上のindex] : 影響力の増分の合計(Rで割ると期待値)
+        """
+        gains = np.zeros(len(self.nodes), dtype=np.int64)
+        if self._spill is None:
+            pool = self.gain_pool()
+            if pool is not None:
+                gains = pool.gains()
+            else:
+                for i in range(self.R):
+                    gains += self.snapshot_gains(i)[self.comp[i]]
+            if not self.S:
+                for i in range(self.R):
+                    self.delta0[i] = self.delta[i].copy()
+            return gains
+        
+        # チャンクごとに読み込んで合計し、状態を退避する
+        for c, snapshots in enumerate(tqdm(self.chunks, leave=False, disable=not self.progress)):
+            self.load_chunk(c)
+            for i in snapshots:
+                gains += self.snapshot_gains(i)[self.comp[i]]
+            self.spill_chunk(c)
+        return gains
+    
+    def node_gain(self, l):
+        """
+        R回のシミュレーションにおける影響力の増分の合計
+        
+        Parameters
+        ----------
+        l : int
+            nodes上のindex
+        
+        Returns
+        -------
+        ret : int
+            影響力の増分の合計(Rで割ると期待値)
+        """
+        if self.backend == 'array':
+            pool = self.gain_pool()
+            if pool is not None:
+                return pool.node_gain(l)
+            return sum([self.gain_array(i, self.comp[i][l]) for i in range(self.R)])
+        return sum([self.gain(i, self.nodes[l]) for i in range(self.R)])
+    
+    def update_all(self, t):
+        """
+        全てのシミュレーションでupdateを行う(GainPoolがあればworkerで並列に行う)
+        
+        Parameters
+        ----------
+        t : int
+            選んだノード
+        """
+        if self._pool is not None:
+            self._pool.update(node_index(self.nodes, [t])[0])
+            return
+        for i in range(self.R):
+            self.update(i, t)
+    
+    def select_exhaustive(self):
+        """
+        毎回全ノードのgainを計算してk個のノードを選ぶ
+        """
+        for j in range(self.k):
+            with self.stats.phase('gain'):
+                if self.backend == 'array':
+                    gains = self.all_node_gains()
+                    self.v_gain = dict(zip(self.nodes, gains/self.R))
+                    t = self.nodes[np.argmax(gains)]
+                    if self.batch_size is not None:
+                        self.stability.append(self.gain_gap(gains))
+                else:
+                    nodes = tqdm(self.nodes, leave=False, disable=not self.progress)
+                    self.v_gain = {v: self.node_gain(l)/self.R for l, v in enumerate(nodes)}
+                    t = max(self.v_gain, key=self.v_gain.get)
+            self.S.append(t)
+            
+            # チャンクに分けた場合は、次に読み込んだときにupdateする
+            if self._spill is None:
+                with self.stats.phase('update'):
+                    self.update_all(t)
+            self.stats.emit('round')
+    
+    def gain_gap(self, gains):
+        """
+        最良のノードと次点のノードのgainの差を、シミュレーションごとの差(対応のある差)で検定する(backend='array'のみ)
+        all_node_gainsの直後に呼ぶため、各シミュレーションのgainは計算済みのものを使う
+        
+        Parameters
+        ----------
+        gains : ndarray of int64
+            all_node_gainsの結果
+        
+        Returns
+        -------
+        stat : dict
+            {
+            'node': 最良のノード,
+            'runner_up': 次点のノード,
+            'gain': 最良のノードのgainの期待値,
+            'gap': gainの差の期待値,
+            'std_error': gapの標準誤差,
+            'z': gap / std_error
+            }
+        """
+        best = int(np.argmax(gains))
+        if len(gains) == 1:
+            return {'node': self.nodes[best], 'runner_up': None, 'gain': gains[best] / self.R,
+                    'gap': np.inf, 'std_error': 0.0, 'z': np.inf}
+        rest = gains.copy()
+        rest[best] = -1
+        second = int(np.argmax(rest))
+        diff = np.array([self.gain_array(i, self.comp[i][best]) - self.gain_array(i, self.comp[i][second])
+                         for i in range(self.R)], dtype=np.float64)
+        gap = diff.mean()
+        std_error = np.sqrt(diff.var(ddof=1) / self.R) if self.R > 1 else np.inf
+        if std_error > 0:
+            z = gap / std_error
+        else:
+            z = np.inf if gap > 0 else 0.0
+        return {'node': self.nodes[best], 'runner_up': self.nodes[second], 'gain': gains[best] / self.R,
+                'gap': gap, 'std_error': std_error, 'z': z}
+    
+    def select_celf(self):
+        """
+        CELF(lazy greedy)でk個のノードを選ぶ
+        ヒープには(-gainの上界, nodes上のindex, 上界を計算したラウンド)を格納する
+        劣モジュラ性により過去のラウンドのgainは上界となるため、
+        先頭が現在のラウンドで計算されたものであれば、それが最大のgainである
+        gainが等しい場合はindexが小さいノードが先頭になるため、select_exhaustiveと同じノードが選ばれる
+        """
+        with self.stats.phase('gain'):
+            if self.backend == 'array':
+                gains = self.all_node_gains().tolist()
+            else:
+                nodes = tqdm(range(len(self.nodes)), leave=False, disable=not self.progress)
+                gains = [self.node_gain(l) for l in nodes]
+        self.v_gain = {v: g/self.R for v, g in zip(self.nodes, gains)}
+        heap = [(-g, l, 0) for l, g in enumerate(gains)]
+        heapq.heapify(heap)
+        
+        for j in range(self.k):
+            with self.stats.phase('gain'):
+                while heap[0][2] < j:
+                    l = heap[0][1]
+                    heapq.heapreplace(heap, (-self.node_gain(l), l, j))
+            # 選んだノードのgainは以降常に0であるため、ラウンドをkとして戻す
+            # (全てのgainが0になった場合、select_exhaustiveと同様に選択済みのノードも選ばれうる)
+            l = heap[0][1]
+            heapq.heapreplace(heap, (0, l, self.k))
+            t = self.nodes[l]
+            self.S.append(t)
+            
+            with self.stats.phase('update'):
+                self.update_all(t)
+            self.stats.emit('round')
+    
     def run(self):
         """
         PMCを実行する
@@ -344,23 +1492,123 @@ class InfuenceMaximizer:
         >>> inf = InfuenceMaximizer(network, 1, 100)
         >>> inf.run()
         [0]
+        
+        screen_nameの隣接リストをそのまま使う
+        >>> adj_list, users_info = GetDescriptionNetwork(...).get_network('user1')
+        >>> InfuenceMaximizer(adj_list, 2, 100).run()
+        ['user3', 'user8']
         """
         if self.k == 1:
             self.run_flag = True
         
+        if self.batch_size is not None:
+            self.run_adaptive()
+            self.stats.emit('done')
+            return self.S
+        
         self.make_random_DAGs()
-        print('comp init')
+        self.stats.emit('dags')
         
-        for j in range(self.k):
-            self.v_gain = {v: sum([self.gain(i, v) for i in range(self.R)])/self.R
-                      for v in tqdm(self.nodes, leave=False)}
-            t = max(self.v_gain, key=self.v_gain.get)
-            self.S.append(t)
+        try:
+            if self.greedy == 'celf':
+                self.select_celf()
+            else:
+                self.select_exhaustive()
+        finally:
+            self.close_gain_pool()
+        self.stats.emit('done')
+        
+        return self.S
+    
+    def run_adaptive(self):
+        """
+        シミュレーションを追加しながらSを選ぶ(backend='array'のみ)
+        batch_size回から始めてシミュレーション数を倍にしながら追加するため、
+        Sを選び直す計算量の合計は、最後のシミュレーション数で1回選ぶ場合の2倍程度に収まる
+        追加するたびに全てのシミュレーションの状態を戻してSを選び直し、
+        全てのラウンドで選択が安定するか、次の追加でtime_budgetを超えると見積もられるか、Rに達した時点で打ち切る
+        次の追加とSの選び直しにかかる時間は、シミュレーション数に比例するとして直前の追加にかかった時間から見積もる
+        (最初のbatch_size回は見積もれないため、time_budgetに関わらず行う)
+        同じseedであれば、打ち切ったシミュレーション数を固定のRとした場合と同じSが得られる
+        """
+        start = time.perf_counter()
+        R_max = self.R
+        z = NormalDist().inv_cdf((1 + self.confidence) / 2)
+        self.sampler = self.make_sampler(R_max)
+        self.comp = np.empty((R_max, len(self.nodes)), dtype=np.int32)
+        self.chunks = [range(R_max)]
+        self._spill = None
+        
+        self.R = 0
+        while True:
+            round_start = time.perf_counter()
+            snapshots = range(self.R, min(max(2 * self.R, self.batch_size), R_max))
+            if self.seed_seqs is None:
+                self.sampler.sample(snapshots=snapshots)
+            self.make_snapshots(snapshots)
+            self.reserve_mark(snapshots)
+            self.R = snapshots.stop
             
             for i in range(self.R):
-                self.update(i, t)
+                self.reset_snapshot(i)
+            self.S = []
+            self.stability = []
+            self.select_exhaustive()
+            
+            # 次点のノードの方が良い場合の差の上限が、許容する範囲に収まるか
+            stable = all(stat['std_error'] * z - stat['gap'] <= self.tolerance * stat['gain']
+                         for stat in self.stability)
+            now = time.perf_counter()
+            elapsed = now - start
+            if stable or self.R == R_max:
+                break
+            # 倍にした場合にかかる時間が、残りの時間に収まらなければ追加しない
+            if self.time_budget is not None and \
+                    elapsed + (now - round_start) * min(2 * self.R, R_max) / self.R > self.time_budget:
+                break
         
-        return self.S
+        # 使ったシミュレーション数に合わせる
+        self.comp = self.comp[:self.R]
+        self.sampler.masks = self.sampler.masks[:self.R]
+        self.chunks = [range(self.R)]
+        self.sampling_report = {
+            'R': self.R,
+            'R_max': R_max,
+            'stable': stable,
+            'elapsed': elapsed,
+            'rounds': self.stability,
+        }
+    
+    def estimate_spread(self, seeds, n_sims=10000, confidence=0.95, seed=None):
+        """
+        任意のシード集合の期待影響数をモンテカルロ法で推定する
+        src, dst, probのCSRを使い、n_sims回のカスケードをまとめて伝播させる(作成済みのDAGは使わない)
+        
+        Parameters
+        ----------
+        seeds : array-like
+            シード集合(ノード番号)
+        n_sims : int
+            シミュレーション数
+        confidence : float
+            信頼区間の信頼係数
+        seed : int, optional
+            乱数のseed
+        
+        Returns
+        -------
+        result : dict
+            {'mean': , 'variance': , 'std_error': , 'ci': (下限, 上限), 'n_sims': }
+        
+        Example
+        -------
+        >>> inf = InfuenceMaximizer(network, 5, 100)
+        >>> inf.estimate_spread(inf.run(), n_sims=100000)['ci']
+        (40.1, 40.6)
+        """
+        if self._spread_estimator is None:
+            self._spread_estimator = SpreadEstimator(self.src, self.dst, self.prob, len(self.nodes), self.model)
+        return self._spread_estimator.estimate(node_index(self.nodes, seeds), n_sims, confidence, seed)
     
     def influence_result(self):
         """
@@ -0,0 +1,239 @@
+import numpy as np
+
+
+class LiveEdgeSampler:
+    """
+    全シミュレーション分の枝の生死をまとめて抽選し、ビットパックして保持するクラス
+    シミュレーションiの枝の生死はmasks[i]の1行(edge_sizeビット)として取り出す
+
+    Attributes
+    ----------
+    prob : ndarray of float
+        枝確率
+    n_sims : int
+        シミュレーション数
+    edge_size : int
+        枝数
+    block_size : int
+        一度の乱数生成でまとめて抽選するシミュレーション数
+    masks : ndarray of uint8
+        shape = (n_sims, ceil(edge_size / 8))
+        ビットパックされた枝の生死
+    """
+    # 一度に生成する乱数(float64)のバイト数の上限
+    max_block_bytes = 1 << 26
+
+    def __init__(self, prob, n_sims, block_size=None):
+        """
+        Parameters
+        ----------
+        prob : ndarray of float
+            枝確率
+        n_sims : int
+            シミュレーション数
+        block_size : int, optional
+            一度の乱数生成でまとめて抽選するシミュレーション数
+            指定しない場合は、乱数の配列がmax_block_bytesに収まるように決める
+        """
+        self.prob = np.asarray(prob)
+        self.n_sims = n_sims
+        self.edge_size = len(self.prob)
+        if block_size is None:
+            block_size = max(1, self.max_block_bytes // (8 * max(1, self.edge_size)))
+        self.block_size = block_size
+        self.masks = np.zeros((n_sims, (self.edge_size + 7) // 8), dtype=np.uint8)
+
+    def sample(self, random_state=np.random, snapshots=None):
+        """
+        block_size回分のシミュレーションの枝の生死を一度の乱数生成で抽選する
+        (block_size x edge_size)の一様乱数は、edge_size個の一様乱数をblock_size回生成した場合と同じ乱数列になる
+        snapshotsを順に分けて抽選しても、全てを一度に抽選した場合と同じになる
+
+        Parameters
+        ----------
+        random_state : np.random.RandomState or np.random.Generator
+            乱数生成器(デフォルトはnp.randomのグローバルな状態)
+        snapshots : range, optional
+            抽選するシミュレーションの範囲(デフォルトは全て)
+
+        Returns
+        -------
+        masks : ndarray of uint8
+        """
+        if snapshots is None:
+            snapshots = range(self.n_sims)
+        for b in range(snapshots.start, snapshots.stop, self.block_size):
+            n = min(self.block_size, snapshots.stop - b)
+            rand = random_state.uniform(0, 1, (n, self.edge_size))
+            self.masks[b:b + n] = np.packbits(rand < self.prob, axis=1)
+        return self.masks
+
+    def live(self, i):
+        """
+        Parameters
+        ----------
+        i : int
+            何回目のシミュレーションか
+
+        Returns
+        -------
+        live : ndarray of bool
+            live[e] : 枝eが残ったか
+        """
+        return np.unpackbits(self.masks[i], count=self.edge_size).view(bool)
+
+    def live_edges(self, i):
+        """
+        Parameters
+        ----------
+        i : int
+            何回目のシミュレーションか
+
+        Returns
+        -------
+        live_edges : ndarray of int
+            残った枝のindex
+        """
+        return np.flatnonzero(self.live(i))
+
+    def live_count(self):
+        """
+        Returns
+        -------
+        count : ndarray of int
+            count[i] : i回目のシミュレーションで残った枝数
+        """
+        return np.unpackbits(self.masks, axis=1, count=self.edge_size).sum(axis=1)
+
+
+class LTLiveEdgeSampler(LiveEdgeSampler):
+    """
+    Linear Threshold modelのlive-edgeを抽選し、ビットパックして保持するクラス
+    各ノードは入ってくる枝のうち高々1本を、枝の重みに比例した確率で残す(lt_tableを参照)
+    """
+    def __init__(self, prob, n_sims, dst, n, block_size=None):
+        """
+        Parameters
+        ----------
+        prob : ndarray of float
+            枝の重み
+        n_sims : int
+            シミュレーション数
+        dst : ndarray of int
+            枝の終点のindex
+        n : int
+            ノード数
+        block_size : int, optional
+            一度の乱数生成でまとめて抽選するシミュレーション数
+        """
+        if block_size is None:
+            block_size = max(1, self.max_block_bytes // (8 * max(1, n)))
+        super().__init__(prob, n_sims, block_size)
+        self.n = n
+        self.table = lt_table(dst, prob, n)
+
+    def sample(self, random_state=np.random, snapshots=None):
+        """
+        block_size回分のシミュレーションについて、ノードごとの一様乱数をまとめて生成して抽選する
+        (block_size x ノード数)の一様乱数は、ノード数個の一様乱数をblock_size回生成した場合と同じ乱数列になる
+
+        Parameters
+        ----------
+        random_state : np.random.RandomState or np.random.Generator
+            乱数生成器(デフォルトはnp.randomのグローバルな状態)
+        snapshots : range, optional
+            抽選するシミュレーションの範囲(デフォルトは全て)
+
+        Returns
+        -------
+        masks : ndarray of uint8
+        """
+        if snapshots is None:
+            snapshots = range(self.n_sims)
+        for b in range(snapshots.start, snapshots.stop, self.block_size):
+            n = min(self.block_size, snapshots.stop - b)
+            rand = random_state.uniform(0, 1, (n, self.n))
+            for j in range(n):
+                self.masks[b + j] = np.packbits(lt_live(self.table, rand[j], self.edge_size))
+        return self.masks
+
+
+def lt_table(dst, prob, n):
+    """
+    Linear Threshold modelのlive-edgeを抽選するための、終点ごとの累積重みを作る
+    終点ごとの重みの合計が1を超える場合は、合計が1になるように正規化する
+
+    Parameters
+    ----------
+    dst : ndarray of int
+        枝の終点のindex
+    prob : ndarray of float
+        枝の重み
+    n : int
+        ノード数
+
+    Returns
+    -------
+    table : tuple
+        (order, indptr, cum, base)
+        order : 終点の順に並べた枝のindex
+        indptr : 終点vに入る枝は order[indptr[v]:indptr[v + 1]]
+        cum : orderの順に並べた重みの累積和
+        base : base[v] = 終点vに入る枝の直前までの累積和
+    """
+    dst = np.asarray(dst)
+    prob = np.asarray(prob, dtype=np.float64)
+    total = np.bincount(dst, weights=prob, minlength=n)
+    scale = 1 / np.maximum(total, 1)
+    order = np.argsort(dst, kind='stable')
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(dst, minlength=n), out=indptr[1:])
+    cum = np.cumsum(prob[order] * scale[dst[order]])
+    base = np.concatenate([[0.0], cum])[indptr[:-1]]
+    return order, indptr, cum, base
+
+
+def lt_choose(table, rand):
+    """
+    ノードごとの一様乱数から、各ノードに入る枝のうち残す1本を選ぶ
+    一様乱数が、そのノードに入る枝の重みの累積和のどの区間に入るかで決める(どこにも入らなければ残さない)
+
+    Parameters
+    ----------
+    table : tuple
+        lt_tableの結果
+    rand : ndarray of float
+        shape = (..., ノード数)の一様乱数
+
+    Returns
+    -------
+    chosen : ndarray of int64
+        randと同じshapeで、各ノードに残った枝のindex(残らない場合は-1)
+    """
+    order, indptr, cum, base = table
+    if len(order) == 0:
+        return np.full(rand.shape, -1, dtype=np.int64)
+    p = np.searchsorted(cum, base + rand, side='right')
+    return np.where(p < indptr[1:], order[np.minimum(p, len(order) - 1)], -1)
+
+
+def lt_live(table, rand, edge_size):
+    """
+    Parameters
+    ----------
+    table : tuple
+        lt_tableの結果
+    rand : ndarray of float
+        ノードごとの一様乱数
+    edge_size : int
+        枝数
+
+    Returns
+    -------
+    live : ndarray of bool
+        live[e] : 枝eが残ったか
+    """
+    chosen = lt_choose(table, rand)
+    live = np.zeros(edge_size, dtype=bool)
+    live[chosen[chosen >= 0]] = True
+    return live
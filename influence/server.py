@@ -0,0 +1,442 @@
+"""
+InfuenceMaximizerのDAGをメモリに保持したまま、影響最大化の問い合わせに答えるサーバ
+
+ネットワークを一度読み込んでR回分のDAGを作り、以下の問い合わせにHTTP(またはUnixソケット)で答える
+- POST /seeds {"k": 10} : 影響力を最大にするk個のノード
+- POST /spread {"seeds": [...]} : シード集合の期待影響数
+- POST /marginal {"seeds": [...], "candidates": [...]} : シード集合にノードを加えた場合の影響力の増分
+- GET /health : ノード数, R, キャッシュの統計
+
+同じパラメータの問い合わせは、実行中のものがあればその結果を待ち(coalescing)、結果はLRUでキャッシュする
+
+Example
+-------
+$ python -m influence.server data.csv -R 200 --seed 0 --port 8000
+$ curl -s localhost:8000/seeds -d '{"k": 5}'
+{"seeds": [3, 10, 7, 1, 42], "gains": [...], "spread": 57.3}
+"""
+import os
+import json
+import stat
+import time
+import argparse
+import threading
+import traceback
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import Future
+from socketserver import ThreadingMixIn, UnixStreamServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from influence.csr import bfs, reachable_weights
+from influence.edges import node_index
+from influence.pmc import InfuenceMaximizer
+
+
+class LRUCache:
+    """
+    スレッドセーフなLRUキャッシュ
+
+    Attributes
+    ----------
+    maxsize : int
+        保持する結果の数の上限(0の場合はキャッシュしない)
+    hits, misses : int
+        キャッシュにあった回数, なかった回数
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns
+        -------
+        found : bool
+        value : object
+            見つからない場合はNone
+        """
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return True, self._data[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class InfluenceService:
+    """
+    R回分のDAGを保持し、シード集合の選択, 期待影響数, 影響力の増分の問い合わせに答えるクラス
+    期待影響数と増分は作成済みのDAG上で数えるため、InfuenceMaximizerのgainと同じ推定値になる
+
+    Attributes
+    ----------
+    maximizer : InfuenceMaximizer
+        DAGを作成済みのもの(backend='array')
+        Sには、これまでに問い合わせのあった最大のkまでのノードが貪欲法で選ばれている
+    gains : list of float
+        gains[j] : S[j]を選んだときの影響力の増分の期待値
+    cache : LRUCache
+        問い合わせの結果
+    stats : dict
+        {'queries': 問い合わせ数, 'coalesced': 実行中の同じ問い合わせを待った数, 'compute_seconds': 計算時間の合計}
+    """
+    # 問い合わせの種類(メソッド名)
+    QUERIES = ('seeds', 'spread', 'marginal')
+
+    def __init__(self, network, R, seed=0, cache_size=1024, **kwargs):
+        """
+        Parameters
+        ----------
+        network : ndarray, list or DataFrame
+            [[from_node, to_node, probability], ...]
+        R : int
+            シミュレーション数
+        seed : int
+            乱数のseed
+        cache_size : int
+            キャッシュする結果の数の上限
+        kwargs :
+            InfuenceMaximizerのその他の引数(n_jobs, cache_dir, model, n_hubsなど)
+            max_memory, batch_sizeは使えない
+        """
+        if kwargs.get('max_memory') is not None or kwargs.get('batch_size') is not None:
+            raise ValueError('max_memory and batch_size are not supported')
+        self.maximizer = InfuenceMaximizer(network, 1, R, backend='array', seed=seed, progress=False, **kwargs)
+        self.maximizer.make_random_DAGs()
+        self.gains = []
+        self.cache = LRUCache(cache_size)
+        self.stats = {'queries': 0, 'coalesced': 0, 'compute_seconds': 0.0}
+        # 貪欲法でSを伸ばす処理はmaximizerの状態を変えるため、同時に1つのみ行う
+        self._select_lock = threading.Lock()
+        self._inflight = dict()
+        self._inflight_lock = threading.Lock()
+
+    def query(self, kind, **params):
+        """
+        問い合わせに答える
+        キャッシュにあればそれを返し、同じ問い合わせが実行中であればその結果を待つ
+
+        Parameters
+        ----------
+        kind : str
+            'seeds', 'spread' or 'marginal'
+        params :
+            各メソッドの引数
+
+        Returns
+        -------
+        result : dict
+        """
+        if kind not in self.QUERIES:
+            raise ValueError(f'unknown query : {kind}')
+        key = json.dumps([kind, params], sort_keys=True, default=str)
+        with self._inflight_lock:
+            self.stats['queries'] += 1
+        found, value = self.cache.get(key)
+        if found:
+            return value
+
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.stats['coalesced'] += 1
+        if not owner:
+            return future.result()
+
+        start = time.perf_counter()
+        try:
+            value = getattr(self, kind)(**params)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.cache.put(key, value)
+            future.set_result(value)
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+                self.stats['compute_seconds'] += time.perf_counter() - start
+        return value
+
+    def seeds(self, k):
+        """
+        影響力を最大にするk個のノードを貪欲法で選ぶ
+        貪欲法で選ぶノードはkによらず先頭から同じであるため、既に選んだノードの続きのみを選ぶ
+
+        Parameters
+        ----------
+        k : int
+
+        Returns
+        -------
+        result : dict
+            {'seeds': ノード, 'gains': 各ノードを選んだときの影響力の増分, 'spread': 期待影響数}
+        """
+        inf = self.maximizer
+        if int(k) < 0:
+            raise ValueError('k must be non-negative')
+        k = min(int(k), len(inf.nodes))
+        with self._select_lock:
+            while len(inf.S) < k:
+                inf.k = 1
+                inf.select_exhaustive()
+                self.gains.append(float(inf.v_gain[inf.S[-1]]))
+            return {'seeds': list(inf.S[:k]), 'gains': self.gains[:k], 'spread': float(sum(self.gains[:k]))}
+
+    def reached(self, i, index):
+        """
+        i回目のシミュレーションで、nodes上のindexのノードから到達するDAG上のノード
+
+        Returns
+        -------
+        mask : ndarray of bool
+        """
+        dag = self.maximizer.G[i]
+        mask = np.zeros(dag.n, dtype=bool)
+        if len(index):
+            mask[bfs(dag.indptr, dag.indices, self.maximizer.comp[i][index])] = True
+        return mask
+
+    def spread(self, seeds, method='snapshots', n_sims=10000, confidence=0.95, seed=None):
+        """
+        シード集合の期待影響数
+
+        Parameters
+        ----------
+        seeds : list
+            シード集合
+        method : str
+            'snapshots' : 作成済みのR回分のDAG上で到達するノード数を数える
+            'mc' : src, dst, probからn_sims回のシミュレーションを新たに行う(InfuenceMaximizer.estimate_spread)
+        n_sims, confidence, seed :
+            method='mc'の場合のシミュレーション数, 信頼係数, 乱数のseed
+
+        Returns
+        -------
+        result : dict
+            {'mean': , 'std_error': , 'n_sims': }(method='mc'の場合はestimate_spreadの結果)
+        """
+        inf = self.maximizer
+        if method == 'mc':
+            result = inf.estimate_spread(seeds, n_sims, confidence, seed)
+            return {key: (list(value) if isinstance(value, tuple) else value) for key, value in result.items()}
+        if method != 'snapshots':
+            raise ValueError(f'unknown method : {method}')
+        index = node_index(inf.nodes, seeds)
+        spread = np.array([inf.G[i].weight[self.reached(i, index)].sum() for i in range(inf.R)], dtype=np.float64)
+        std_error = spread.std(ddof=1) / np.sqrt(inf.R) if inf.R > 1 else 0.0
+        return {'mean': float(spread.mean()), 'std_error': float(std_error), 'n_sims': inf.R}
+
+    def marginal(self, seeds, candidates=None, limit=10):
+        """
+        シード集合にノードを1つ加えた場合の影響力の増分の期待値
+
+        Parameters
+        ----------
+        seeds : list
+            シード集合
+        candidates : list, optional
+            増分を求めるノード(省略した場合は全てのノードから増分の大きいlimit個)
+        limit : int
+            candidatesを省略した場合に返すノード数
+
+        Returns
+        -------
+        result : dict
+            {'nodes': ノード, 'gains': 影響力の増分の期待値}
+        """
+        inf = self.maximizer
+        index = node_index(inf.nodes, seeds)
+        if candidates is None:
+            # シード集合から到達するノードから到達するノードは全て到達済みのため、重みを0にすれば増分になる
+            gains = np.zeros(len(inf.nodes), dtype=np.int64)
+            for i in range(inf.R):
+                dag = inf.G[i]
+                gains += reachable_weights(dag, np.where(self.reached(i, index), 0, dag.weight))[inf.comp[i]]
+            top = np.argsort(-gains, kind='stable')[:limit]
+            return {'nodes': inf.nodes[top].tolist(), 'gains': (gains[top] / inf.R).tolist()}
+
+        target = node_index(inf.nodes, candidates)
+        gains = np.zeros(len(target), dtype=np.int64)
+        for i in range(inf.R):
+            dag = inf.G[i]
+            reached = self.reached(i, index)
+            for j, c in enumerate(inf.comp[i][target].tolist()):
+                if not reached[c]:
+                    gains[j] += dag.weight[bfs(dag.indptr, dag.indices, [c], blocked=reached)].sum()
+        return {'nodes': list(candidates), 'gains': (gains / inf.R).tolist()}
+
+    def close(self):
+        """
+        gainを並列に計算するworkerを終了する(n_jobs > 1の場合)
+        """
+        with self._select_lock:
+            self.maximizer.close_gain_pool()
+
+    def health(self):
+        """
+        サーバの状態
+
+        Returns
+        -------
+        result : dict
+        """
+        inf = self.maximizer
+        return {
+            'nodes': len(inf.nodes),
+            'edges': inf.edge_size,
+            'R': inf.R,
+            'model': inf.model,
+            'selected': len(inf.S),
+            'cache': {'size': len(self.cache), 'maxsize': self.cache.maxsize,
+                      'hits': self.cache.hits, 'misses': self.cache.misses},
+            **self.stats,
+        }
+
+
+def _json_default(o):
+    # numpyのスカラーをPythonの値にする
+    if hasattr(o, 'item'):
+        return o.item()
+    return str(o)
+
+
+def make_handler(service):
+    """
+    serviceに問い合わせるHTTPのハンドラを作る
+
+    Parameters
+    ----------
+    service : InfluenceService
+
+    Returns
+    -------
+    handler : type
+        BaseHTTPRequestHandlerのサブクラス
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            if self.path.rstrip('/') == '/health':
+                self.respond(200, service.health())
+            else:
+                self.respond(404, {'error': f'not found : {self.path}'})
+
+        def do_POST(self):
+            # keep-aliveで次のリクエストと混ざらないように、先に本文を読み切る
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            kind = self.path.strip('/')
+            if kind not in service.QUERIES:
+                self.respond(404, {'error': f'not found : {self.path}'})
+                return
+            try:
+                params = json.loads(body or b'{}')
+                self.respond(200, service.query(kind, **params))
+            except (ValueError, TypeError, KeyError) as e:
+                self.respond(400, {'error': str(e)})
+            except Exception as e:
+                # 想定外の例外でも応答を返し、クライアントを待たせない
+                traceback.print_exc()
+                self.respond(500, {'error': f'{type(e).__name__}: {e}'})
+
+        def respond(self, status, body):
+            data = json.dumps(body, default=_json_default).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def address_string(self):
+            # Unixソケットの場合はclient_addressが文字列になる
+            return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service, host='127.0.0.1', port=8000, unix_socket=None):
+    """
+    問い合わせごとにスレッドで答えるサーバを作る
+
+    Parameters
+    ----------
+    service : InfluenceService
+    host, port :
+        HTTPで待ち受けるアドレス
+    unix_socket : str, optional
+        指定した場合は、HTTPの代わりにこのパスのUnixソケットで待ち受ける
+
+    Returns
+    -------
+    server : socketserver.BaseServer
+        serve_forever()で待ち受ける
+    """
+    handler = make_handler(service)
+    if unix_socket is not None:
+        # 前回のサーバが残したソケットのみ消す
+        if os.path.exists(unix_socket) and stat.S_ISSOCK(os.stat(unix_socket).st_mode):
+            os.remove(unix_socket)
+        return ThreadingUnixHTTPServer(unix_socket, handler)
+    # ヘッダと本文を別々に送るため、Nagleアルゴリズムで応答が遅れないようにする
+    handler.disable_nagle_algorithm = True
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description='influence maximization query server')
+    parser.add_argument('network', help='from_node, to_node, probabilityの3列のCSV')
+    parser.add_argument('-R', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--model', default='ic')
+    parser.add_argument('--n-jobs', type=int, default=1)
+    parser.add_argument('--n-hubs', type=int, default=1)
+    parser.add_argument('--cache-dir')
+    parser.add_argument('--cache-size', type=int, default=1024)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--unix-socket')
+    args = parser.parse_args(argv)
+
+    service = InfluenceService(pd.read_csv(args.network), args.R, seed=args.seed, cache_size=args.cache_size,
+                               model=args.model, n_jobs=args.n_jobs, n_hubs=args.n_hubs, cache_dir=args.cache_dir)
+    server = make_server(service, args.host, args.port, args.unix_socket)
+    print(f'serving {len(service.maximizer.nodes)} nodes, R={args.R} on {args.unix_socket or (args.host, args.port)}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+import numpy as np
+from statistics import NormalDist
+from influence.csr import edge_positions, to_csr
+from influence.edges import intern_edges, node_index
+from influence.sampling import lt_table, lt_choose
+
+
+class SpreadEstimator:
+    """
+    Independent Cascade model(またはLinear Threshold model)における、
+    任意のシード集合の期待影響数をモンテカルロ法で推定するクラス
+    複数回のシミュレーションをフロンティア単位でまとめて伝播させる
+
+    Attributes
+    ----------
+    n : int
+        ノード数
+    indptr, indices : ndarray of int32
+        順方向のCSR(from_node -> to_node)
+    prob : ndarray of float
+        CSRの枝の順に並べた枝確率
+    lt : tuple or None
+        model='lt'の場合のlt_tableの結果
+    position : ndarray of int64 or None
+        position[e] : 枝eのCSR上の位置(model='lt'のみ)
+    """
+    # まとめてシミュレーションする際の、活性化フラグ(シミュレーション数 x ノード数)の上限
+    max_block_size = 1 << 24
+
+    def __init__(self, src, dst, prob, n, model='ic'):
+        """
+        Parameters
+        ----------
+        src, dst : ndarray of int
+            枝の始点と終点のindex
+        prob : ndarray of float
+            枝確率(model='lt'の場合は枝の重み)
+        n : int
+            ノード数
+        model : str
+            'ic' or 'lt'
+        """
+        self.n = n
+        self.indptr, self.indices = to_csr(src, dst, n)
+        order = np.argsort(src, kind='stable')
+        self.prob = np.asarray(prob)[order]
+        self.out_degree = np.diff(self.indptr)
+        self.lt = None
+        self.position = None
+        if model == 'lt':
+            self.lt = lt_table(dst, prob, n)
+            self.position = np.empty(len(order), dtype=np.int64)
+            self.position[order] = np.arange(len(order))
+
+    def simulate(self, seeds, n_sims, rng):
+        """
+        n_sims回のカスケードをまとめて伝播させる
+        各シミュレーションで新たに活性化したノードの枝のみ、一様乱数で生死を決める
+        model='lt'の場合は、先にシミュレーションごとに各ノードに入る枝を高々1本選び、選ばれた枝のみ伝播させる
+
+        Parameters
+        ----------
+        seeds : ndarray of int
+            シード集合のindex(重複なし)
+        n_sims : int
+            シミュレーション数
+        rng : np.random.Generator
+            乱数生成器
+
+        Returns
+        -------
+        spread : ndarray of int
+            spread[j] : j回目のシミュレーションで活性化したノード数
+        """
+        n = self.n
+        sims = np.repeat(np.arange(n_sims, dtype=np.int64), len(seeds))
+        key = sims * n + np.tile(seeds, n_sims)
+        active = np.zeros(n_sims * n, dtype=bool)
+        active[key] = True
+        spread = np.full(n_sims, len(seeds), dtype=np.int64)
+        if self.lt is not None:
+            # chosen[j, v] : j回目のシミュレーションでノードvに入る枝のCSR上の位置(なければ-1)
+            chosen = lt_choose(self.lt, rng.random((n_sims, n)))
+            chosen = np.where(chosen >= 0, self.position[np.maximum(chosen, 0)], -1)
+
+        frontier_sim, frontier_node = sims, np.tile(seeds, n_sims)
+        while frontier_node.size:
+            edges = edge_positions(self.indptr, frontier_node)
+            edge_sim = np.repeat(frontier_sim, self.out_degree[frontier_node])
+            if self.lt is None:
+                live = rng.random(len(edges)) < self.prob[edges]
+            else:
+                live = chosen[edge_sim, self.indices[edges]] == edges
+            key = np.unique(edge_sim[live] * n + self.indices[edges[live]])
+            key = key[~active[key]]
+            active[key] = True
+            frontier_sim, frontier_node = key // n, key % n
+            spread += np.bincount(frontier_sim, minlength=n_sims)
+        return spread
+
+    def estimate(self, seeds, n_sims=10000, confidence=0.95, seed=None):
+        """
+        期待影響数を推定する
+
+        Parameters
+        ----------
+        seeds : array-like of int
+            シード集合のindex
+        n_sims : int
+            シミュレーション数
+        confidence : float
+            信頼区間の信頼係数
+        seed : int, optional
+            乱数のseed
+
+        Returns
+        -------
+        result : dict
+            {
+            'mean': 期待影響数の推定値,
+            'variance': 影響数の(不偏)分散,
+            'std_error': 推定値の標準誤差,
+            'ci': (下限, 上限)の正規近似による信頼区間,
+            'n_sims': シミュレーション数
+            }
+        """
+        seeds = np.unique(np.asarray(seeds, dtype=np.int64))
+        rng = np.random.default_rng(seed)
+        block = max(1, self.max_block_size // max(self.n, 1))
+        spread = np.concatenate([self.simulate(seeds, min(block, n_sims - b), rng)
+                                 for b in range(0, n_sims, block)])
+
+        mean = spread.mean()
+        variance = spread.var(ddof=1) if n_sims > 1 else 0.0
+        std_error = np.sqrt(variance / n_sims)
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        return {
+            'mean': mean,
+            'variance': variance,
+            'std_error': std_error,
+            'ci': (mean - z * std_error, mean + z * std_error),
+            'n_sims': n_sims,
+        }
+
+
+def estimate_spread(network, seeds, n_sims=10000, confidence=0.95, seed=None, model='ic'):
+    """
+    シード集合の期待影響数を推定する
+
+    Parameters
+    ----------
+    network : ndarray, list or DataFrame
+        [[from_node, to_node, probability], ...]
+    seeds : array-like
+        シード集合(ノード番号かscreen_name)
+    n_sims : int
+        シミュレーション数
+    confidence : float
+        信頼区間の信頼係数
+    seed : int, optional
+        乱数のseed
+    model : str
+        'ic' or 'lt'
+
+    Returns
+    -------
+    result : dict
+        SpreadEstimator.estimateを参照
+
+    Example
+    -------
+    >>> estimate_spread(network, [0, 3], n_sims=100000)['mean']
+    12.3
+    """
+    nodes, src, dst, prob = intern_edges(network)
+    estimator = SpreadEstimator(src, dst, prob, len(nodes), model)
+    return estimator.estimate(node_index(nodes, seeds), n_sims, confidence, seed)
+
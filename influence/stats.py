@@ -0,0 +1,149 @@
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Windowsにはresourceがないため、ピークメモリはNoneになる
+    resource = None
+
+
+def peak_rss(children=False):
+    """
+    プロセスのピークメモリ(最大常駐セットサイズ)を返す
+
+    Parameters
+    ----------
+    children : bool
+        Trueなら、終了した(joinした)子プロセスのうち最大のもの(GainPoolのworkerなど)
+        子プロセスのピークは共有メモリに触れた分も含むため、親プロセスの値と足し合わせることはできない
+
+    Returns
+    -------
+    peak : int or None
+        バイト数(取得できない場合はNone)
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Linuxはキロバイト、macOSはバイト単位
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class RunStats:
+    """
+    InfuenceMaximizerの計測結果を保持するクラス
+    フェーズごとの経過時間とカウンタを合計し、区切りごとにcallbackを呼ぶ
+
+    Attributes
+    ----------
+    timers : dict
+        {フェーズ名 : 秒}
+        'sampling' : live-edgeの抽選
+        'scc' : 強連結成分分解
+        'hub' : ハブの到達集合の探索
+        'gain' : gainの計算
+        'update' : updateによる消去
+        n_jobs > 1の場合、'sampling', 'scc', 'hub'は全プロセスの合計
+    counters : dict
+        {カウンタ名 : 値}
+        'bfs_visited' : gain, updateの探索で訪れたDAG上のノード数
+        'cache_hits' : latestが立っていてgainを再計算しなかった回数
+        'cache_misses' : gainを再計算した回数
+        'kernel_calls' : reachable_weights(またはforest_subtree_weights)で全ノードを計算した回数
+    dag_sizes : dict
+        {シミュレーションのindex : (DAGのノード数, DAGの枝数)}
+    peak_memory : int or None
+        プロセスのピークメモリ(バイト)
+    callback : callable or None
+        callback(event, stats)
+        eventは'dags'(DAGの作成後), 'round'(ノードを1つ選ぶごと), 'done'(run, add_edgesの終了後)
+    """
+
+    def __init__(self, callback=None):
+        """
+        Parameters
+        ----------
+        callback : callable, optional
+            callback(event, stats)
+        """
+        self.callback = callback
+        self.timers = defaultdict(float)
+        self.counters = defaultdict(int)
+        self.dag_sizes = dict()
+        self.peak_memory = None
+
+    @contextmanager
+    def phase(self, name):
+        """
+        withの中の経過時間をnameのフェーズに加える
+
+        Example
+        -------
+        >>> with stats.phase('gain'):
+        ...     gains = inf.all_node_gains()
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[name] += time.perf_counter() - start
+
+    def add_times(self, times):
+        """
+        別プロセスなどで計測した{フェーズ名 : 秒}を加える
+        """
+        for name, seconds in times.items():
+            self.timers[name] += seconds
+
+    def count(self, name, value=1):
+        """
+        カウンタnameにvalueを加える
+        """
+        self.counters[name] += int(value)
+
+    def emit(self, event):
+        """
+        ピークメモリを更新し、callbackを呼ぶ
+
+        Parameters
+        ----------
+        event : str
+            'dags', 'round' or 'done'
+        """
+        peak = peak_rss()
+        if peak is not None:
+            self.peak_memory = max(self.peak_memory or 0, peak)
+        if self.callback is not None:
+            self.callback(event, self)
+
+    def as_dict(self):
+        """
+        計測結果をJSONに書き出せるdictで返す
+
+        Returns
+        -------
+        stats : dict
+            {
+            'timers': {フェーズ名 : 秒},
+            'counters': {カウンタ名 : 値},
+            'dags': {'count': DAGの数, 'nodes': ノード数の合計, 'edges': 枝数の合計,
+                     'max_nodes': 最大のノード数, 'max_edges': 最大の枝数},
+            'peak_memory': バイト
+            }
+        """
+        sizes = list(self.dag_sizes.values())
+        return {
+            'timers': dict(self.timers),
+            'counters': dict(self.counters),
+            'dags': {
+                'count': len(sizes),
+                'nodes': sum(n for n, m in sizes),
+                'edges': sum(m for n, m in sizes),
+                'max_nodes': max((n for n, m in sizes), default=0),
+                'max_edges': max((m for n, m in sizes), default=0),
+            },
+            'peak_memory': self.peak_memory,
+        }
@@ -0,0 +1,206 @@
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+from influence.csr import CondensedDAG
+
+# 保存形式を変更した場合は上げる(異なるバージョンのキャッシュは使わずに作り直す)
+FORMAT_VERSION = 3
+
+# 全シミュレーション分を連結して保存する配列 {ファイル名 : dtype}
+# Aのdtypeはハブの数によるため、Noneとして保存時に決める
+_CONCAT_ARRAYS = {
+    'weight': np.int32, 'indptr': np.int32, 'indices': np.int32,
+    'rindptr': np.int32, 'rindices': np.int32, 'A': None, 'D': np.int8, 'hub': np.int32,
+}
+
+
+def _snapshot_array(maximizer, i, name):
+    if name in ('A', 'D'):
+        return getattr(maximizer, name)[i]
+    if name == 'hub':
+        return maximizer.h[i]
+    return getattr(maximizer.G[i], name)
+
+
+def snapshot_key(nodes, src, dst, prob, R, seed, model='ic'):
+    """
+    ネットワーク, シミュレーション数, seed, 拡散モデルから保存先のキーを作る
+
+    Parameters
+    ----------
+    nodes : ndarray
+        ノード集合
+    src, dst : ndarray of int32
+        枝の始点と終点のnodes上のindex
+    prob : ndarray of float32
+        枝確率
+    R : int
+        シミュレーション数
+    seed : int
+        乱数のseed
+    model : str
+        拡散モデル('ic' or 'lt')
+
+    Returns
+    -------
+    key : str
+    """
+    h = hashlib.sha1()
+    h.update(str((FORMAT_VERSION, nodes.dtype.str, len(nodes), len(src), R, seed, model)).encode())
+    if nodes.dtype == object:
+        # 文字列のノードはobject配列のため、値を連結してからハッシュする
+        h.update('\0'.join(map(str, nodes.tolist())).encode())
+    else:
+        h.update(np.ascontiguousarray(nodes).tobytes())
+    for a in (src, dst, prob):
+        h.update(np.ascontiguousarray(a).tobytes())
+    return h.hexdigest()
+
+
+def save_snapshots(path, maximizer, key, snapshots=None):
+    """
+    InfuenceMaximizer(backend='array')のDAGをディレクトリに保存する
+    一時ディレクトリに書き込んだあとに名前を変えるため、書き込み途中のものが読まれることはない
+
+    保存する内容
+    - manifest.json : バージョン, キー, R, seed, 保存したシミュレーションの範囲, 各シミュレーションの配列の長さ
+    - comp.npy : (シミュレーション数, ノード数)のint32
+    - live.npy : ビットパックされたlive-edge
+    - weight, indptr, indices, rindptr, rindices, A, D, hub : 全シミュレーション分を連結した配列
+
+    Parameters
+    ----------
+    path : str
+        保存先のディレクトリ
+    maximizer : InfuenceMaximizer
+        make_random_DAGsを実行済みのもの
+    key : str
+        snapshot_keyで作ったキー
+    snapshots : range, optional
+        保存するシミュレーションの範囲(デフォルトは全て)
+    """
+    if snapshots is None:
+        snapshots = range(maximizer.R)
+    dags = [maximizer.G[i] for i in snapshots]
+    n_comp = [dag.n for dag in dags]
+    n_edge = [len(dag.indices) for dag in dags]
+    n_hub = [len(maximizer.h[i]) for i in snapshots]
+    lengths = {
+        'hub': n_hub,
+        'weight': n_comp, 'A': n_comp, 'D': n_comp,
+        'indptr': [n + 1 for n in n_comp], 'rindptr': [n + 1 for n in n_comp],
+        'indices': n_edge, 'rindices': n_edge,
+    }
+
+    tmp = f'{path}.tmp{os.getpid()}'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    comp = np.lib.format.open_memmap(os.path.join(tmp, 'comp.npy'), mode='w+',
+                                     dtype=np.int32, shape=(len(snapshots), len(maximizer.nodes)))
+    for j, i in enumerate(snapshots):
+        comp[j] = maximizer.comp[i]
+    comp.flush()
+    del comp
+    np.save(os.path.join(tmp, 'live.npy'), maximizer.sampler.masks[snapshots.start:snapshots.stop])
+
+    # 1シミュレーションずつ書き込み、全体を連結した配列をメモリ上に作らない
+    for name, dtype in _CONCAT_ARRAYS.items():
+        if dtype is None:
+            dtype = np.min_scalar_type((1 << maximizer.n_hubs) - 1)
+        out = np.lib.format.open_memmap(os.path.join(tmp, f'{name}.npy'), mode='w+',
+                                        dtype=dtype, shape=(sum(lengths[name]),))
+        offset = 0
+        for i in snapshots:
+            a = _snapshot_array(maximizer, i, name)
+            out[offset:offset + len(a)] = a
+            offset += len(a)
+        out.flush()
+        del out
+
+    manifest = {
+        'version': FORMAT_VERSION,
+        'key': key,
+        'R': maximizer.R,
+        'start': snapshots.start,
+        'stop': snapshots.stop,
+        'seed': str(maximizer.seed),
+        'n_nodes': len(maximizer.nodes),
+        'edge_size': maximizer.edge_size,
+        'n_comp': n_comp,
+        'n_edge': n_edge,
+        'n_hubs': maximizer.n_hubs,
+        'n_hub': n_hub,
+    }
+    with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+
+
+def load_snapshots(path, maximizer, key, snapshots=None):
+    """
+    save_snapshotsで保存したDAGをmemory mapで読み込み、maximizerに格納する
+    バージョン, キー, シミュレーションの範囲のいずれかが一致しない場合は読み込まない
+
+    Parameters
+    ----------
+    path : str
+        保存先のディレクトリ
+    maximizer : InfuenceMaximizer
+    key : str
+        snapshot_keyで作ったキー
+    snapshots : range, optional
+        読み込むシミュレーションの範囲(デフォルトは全て)
+        全てを読み込む場合はmaximizer.compとlive-edgeをmemory mapに置き換え、
+        一部の場合はmaximizer.comp[i]に各行のviewを格納する
+
+    Returns
+    -------
+    loaded : bool
+        読み込めたか
+    """
+    try:
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if snapshots is None:
+        snapshots = range(maximizer.R)
+    if manifest.get('version') != FORMAT_VERSION or manifest.get('key') != key or \
+            manifest['n_hubs'] != maximizer.n_hubs or \
+            (manifest['start'], manifest['stop']) != (snapshots.start, snapshots.stop):
+        return False
+
+    def load(name):
+        # np.memmapのままではスライスごとにオーバーヘッドがあるため、ndarrayのviewにする
+        return np.asarray(np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r'))
+
+    comp = load('comp')
+    arrays = {name: load(name) for name in _CONCAT_ARRAYS}
+    n_comp = np.array(manifest['n_comp'], dtype=np.int64)
+    n_edge = np.array(manifest['n_edge'], dtype=np.int64)
+    comp_offset = np.concatenate([[0], np.cumsum(n_comp)])
+    ptr_offset = np.concatenate([[0], np.cumsum(n_comp + 1)])
+    edge_offset = np.concatenate([[0], np.cumsum(n_edge)])
+    hub_offset = np.concatenate([[0], np.cumsum(manifest['n_hub'])])
+
+    whole = len(snapshots) == maximizer.R
+    if whole:
+        maximizer.sampler.masks = load('live')
+        maximizer.comp = comp
+    else:
+        maximizer.sampler.masks[snapshots.start:snapshots.stop] = load('live')
+    for j, i in enumerate(snapshots):
+        c = slice(comp_offset[j], comp_offset[j + 1])
+        p = slice(ptr_offset[j], ptr_offset[j + 1])
+        e = slice(edge_offset[j], edge_offset[j + 1])
+        dag = CondensedDAG.from_csr(arrays['weight'][c],
+                                    arrays['indptr'][p], arrays['indices'][e],
+                                    arrays['rindptr'][p], arrays['rindices'][e])
+        hub = arrays['hub'][hub_offset[j]:hub_offset[j + 1]]
+        maximizer.set_snapshot(i, None if whole else comp[j], dag, hub, arrays['A'][c], arrays['D'][c])
+    return True
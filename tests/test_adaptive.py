@@ -0,0 +1,65 @@
+import time
+import numpy as np
+import pytest
+from influence.pmc import InfuenceMaximizer
+
+
+@pytest.fixture(scope='module')
+def network():
+    rs = np.random.RandomState(0)
+    n, m = 300, 1200
+    return np.c_[rs.randint(0, n, m), rs.randint(0, n, m), rs.uniform(0, 0.4, m)].astype(float)
+
+
+def test_stops_when_stable(network):
+    inf = InfuenceMaximizer(network, 3, 256, seed=7, batch_size=8, tolerance=1.0)
+    S = inf.run()
+    report = inf.sampling_report
+    assert report['stable']
+    assert report['R'] == inf.R == 16 < report['R_max'] == 256
+    assert len(report['rounds']) == 3
+    assert [stat['node'] for stat in report['rounds']] == S
+    for stat in report['rounds']:
+        assert set(stat) >= {'node', 'runner_up', 'gain', 'gap', 'std_error', 'z'}
+    # 1回前のラウンド(8回)では安定していないため、最初に安定したラウンドで打ち切っている
+    before = InfuenceMaximizer(network, 3, 8, seed=7, batch_size=8, tolerance=1.0)
+    before.run()
+    assert not before.sampling_report['stable']
+
+    # 打ち切ったシミュレーション数を固定のRとした場合と同じ
+    fixed = InfuenceMaximizer(network, 3, 16, seed=7)
+    assert fixed.run() == S
+    assert fixed.v_gain == inf.v_gain
+
+
+@pytest.mark.parametrize('R_max', [100, 256])
+def test_bounded_by_R(network, R_max):
+    inf = InfuenceMaximizer(network, 3, R_max, seed=7, batch_size=8, tolerance=0)
+    inf.run()
+    report = inf.sampling_report
+    assert not report['stable']
+    assert report['R'] == inf.R == R_max
+    assert len(inf.comp) == len(inf.sampler.masks) == R_max
+
+
+def test_time_budget(network, monkeypatch):
+    # Sの選び直しにシミュレーション数と同じ秒数がかかる時計で、8, 16, 32回のラウンドは24 + 32 <= 60秒に収まるが、
+    # 64回のラウンドは56 + 64秒かかると見積もられるため始めない
+    clock = [0.0]
+    monkeypatch.setattr(time, 'perf_counter', lambda: clock[0])
+    inf = InfuenceMaximizer(network, 3, 256, seed=7, batch_size=8, tolerance=0, time_budget=60)
+    select_exhaustive = inf.select_exhaustive
+
+    def select():
+        clock[0] += inf.R
+        select_exhaustive()
+    inf.select_exhaustive = select
+    inf.run()
+    assert inf.sampling_report['R'] == 32
+    assert inf.sampling_report['elapsed'] == 56 <= inf.time_budget
+    monkeypatch.undo()
+
+    # 最初のラウンドは見積もれないため、time_budgetに関わらず行う
+    inf = InfuenceMaximizer(network, 3, 256, seed=7, batch_size=8, tolerance=0, time_budget=0)
+    inf.run()
+    assert inf.sampling_report['R'] == 8
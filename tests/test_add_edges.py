@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+import influence.pmc
+from influence.pmc import InfuenceMaximizer
+
+
+@pytest.fixture(scope='module')
+def network():
+    rs = np.random.RandomState(0)
+    n, m = 200, 600
+    return np.c_[rs.randint(0, n, m), rs.randint(0, n, m), rs.uniform(0, 0.4, m)].astype(float)
+
+
+# 追加する枝の確率を0か1にして、追加した枝の生死が乱数によらないようにする
+# (元の枝の乱数は全ての枝で作り直した場合と同じため、同じDAGになる)
+NEW_NODES = np.array([[5, 1000, 1.0], [1000, 1001, 1.0], [7, 1002, 0.0]])
+EXISTING = np.c_[np.random.RandomState(1).randint(0, 200, (40, 2)), np.tile([1.0, 0.0], 20)]
+
+
+@pytest.fixture
+def recondensed(monkeypatch):
+    # シミュレーションごとに、強連結成分分解し直したか
+    calls = []
+    extend_snapshot = influence.pmc.extend_snapshot
+
+    def record(*args):
+        result = extend_snapshot(*args)
+        calls.append(result[2] is None)
+        return result
+    monkeypatch.setattr(influence.pmc, 'extend_snapshot', record)
+    return calls
+
+
+def assert_same_as_fresh(network, edges, inf, S):
+    # add_edgesで選び直したSとgainが、全ての枝で作り直した場合と一致する
+    fresh = InfuenceMaximizer(np.concatenate([network] + edges), 3, 10, seed=1)
+    assert S == fresh.run()
+    assert inf.v_gain == fresh.v_gain
+    assert np.array_equal(inf.nodes, fresh.nodes)
+
+
+def test_new_nodes_without_recondensing(network, recondensed):
+    # 新しいノードに向かう枝はトポロジカル順を保つため、枝を追加するだけでよい
+    inf = InfuenceMaximizer(network, 3, 10, seed=1)
+    inf.run()
+    S = inf.add_edges(NEW_NODES)
+    assert len(recondensed) == 10 and not any(recondensed)
+    assert_same_as_fresh(network, [NEW_NODES], inf, S)
+
+
+def test_recondensing(network, recondensed):
+    inf = InfuenceMaximizer(network, 3, 10, seed=1)
+    inf.run()
+    S = inf.add_edges(EXISTING)
+    assert any(recondensed)
+    assert_same_as_fresh(network, [EXISTING], inf, S)
+
+
+def test_repeated_add_edges(network):
+    inf = InfuenceMaximizer(network, 3, 10, seed=1)
+    inf.run()
+    inf.add_edges(NEW_NODES, rerun=False)
+    S = inf.add_edges(EXISTING)
+    assert_same_as_fresh(network, [NEW_NODES, EXISTING], inf, S)
+
+
+def test_before_dags(network):
+    # DAGを作る前に追加した場合は、全ての枝で作った場合と同じ
+    inf = InfuenceMaximizer(network, 3, 10, seed=1)
+    inf.add_edges(NEW_NODES)
+    assert inf.run() == InfuenceMaximizer(np.concatenate([network, NEW_NODES]), 3, 10, seed=1).run()
@@ -0,0 +1,116 @@
+import os
+import importlib.util
+import types
+import datetime
+from collections import deque
+import pytest
+
+
+def load_module(name):
+    # twitter/__init__.pyはMeCab, pandasなどを読み込むため、モジュールのファイルを直接読み込む
+    path = os.path.join(os.path.dirname(__file__), os.pardir, 'twitter', f'{name}.py')
+    spec = importlib.util.spec_from_file_location(f'twitter_{name}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+CrawlCheckpoint = load_module('checkpoint').CrawlCheckpoint
+
+
+def crawl(checkpoint, crawler, queue, adj_list, graph, n):
+    # get_networkと同じ順で、探索キューの先頭からn人を探索して記録する
+    for _ in range(n):
+        sizes = checkpoint.mark(crawler, queue, adj_list)
+        user = queue.popleft()
+        for follower in graph.get(user, []):
+            if follower not in crawler.users_info:
+                crawler.users_info[follower] = {'screen_name': follower,
+                                                'created_at': datetime.datetime(2020, 1, 1)}
+                crawler.history[follower] = [user]
+                queue.append(follower)
+            crawler.network[f'{user}->{follower}'] = 1
+            adj_list.append([user, follower, 0.5])
+        checkpoint.record(user, crawler, queue, adj_list, sizes)
+
+
+def start(path, every=1):
+    crawler = types.SimpleNamespace(users_info={'root': {'screen_name': 'root'}}, history={'root': []}, network={})
+    checkpoint = CrawlCheckpoint(path, every=every)
+    checkpoint.start('root', crawler.users_info['root'], ['word'])
+    return checkpoint, crawler, deque(['root']), []
+
+
+GRAPH = {'root': ['a', 'b', 'c'], 'a': ['d', 'b'], 'b': ['e'], 'c': [], 'd': ['f', 'root'], 'e': ['g']}
+
+
+def assert_state(state, crawler, queue, adj_list, visited):
+    assert state['root_user'] == 'root'
+    assert state['network_keywords'] == ['word']
+    assert state['users_info'] == crawler.users_info
+    assert list(state['users_info']) == list(crawler.users_info)
+    assert state['history'] == crawler.history
+    assert state['network'] == crawler.network
+    assert state['queue'] == queue
+    assert state['adj_list'] == adj_list
+    assert state['visited'] == visited
+
+
+def test_load(tmp_path):
+    path = str(tmp_path / 'crawl.jsonl')
+    checkpoint, crawler, queue, adj_list = start(path)
+    crawl(checkpoint, crawler, queue, adj_list, GRAPH, 4)
+    checkpoint.close()
+
+    state = CrawlCheckpoint(path).load()
+    assert_state(state, crawler, queue, adj_list, 4)
+    # datetimeはdatetimeのまま戻る
+    assert state['users_info']['a']['created_at'] == datetime.datetime(2020, 1, 1)
+
+
+def test_resume_after_truncated_last_line(tmp_path):
+    path = str(tmp_path / 'crawl.jsonl')
+    checkpoint, crawler, queue, adj_list = start(path)
+    crawl(checkpoint, crawler, queue, adj_list, GRAPH, 3)
+    checkpoint.close()
+    expected = (dict(crawler.users_info), dict(crawler.history), dict(crawler.network), deque(queue),
+                list(adj_list))
+    crawl(CrawlCheckpoint(path), crawler, queue, adj_list, {}, 0)
+
+    # 4人目の書き込み中に止まった
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"type": "visit", "user": "c", "users_in')
+
+    resumed = CrawlCheckpoint(path)
+    state = resumed.load()
+    crawler = types.SimpleNamespace(users_info=state['users_info'], history=state['history'],
+                                    network=state['network'])
+    assert (crawler.users_info, crawler.history, crawler.network, state['queue'], state['adj_list']) == expected
+    assert state['visited'] == 3
+
+    # 途中までの行を消してから続きを追記する
+    queue, adj_list = state['queue'], state['adj_list']
+    crawl(resumed, crawler, queue, adj_list, GRAPH, 3)
+    resumed.close()
+
+    fresh, fresh_crawler, fresh_queue, fresh_adj_list = start(str(tmp_path / 'fresh.jsonl'))
+    crawl(fresh, fresh_crawler, fresh_queue, fresh_adj_list, GRAPH, 6)
+    fresh.close()
+    assert_state(CrawlCheckpoint(path).load(), fresh_crawler, fresh_queue, fresh_adj_list, 6)
+
+
+def test_every_flushes_in_batches(tmp_path):
+    path = str(tmp_path / 'crawl.jsonl')
+    checkpoint, crawler, queue, adj_list = start(path, every=3)
+    crawl(checkpoint, crawler, queue, adj_list, GRAPH, 2)
+    assert checkpoint._pending == 2
+    crawl(checkpoint, crawler, queue, adj_list, GRAPH, 1)
+    assert checkpoint._pending == 0
+    checkpoint.close()
+
+
+def test_invalid_checkpoint(tmp_path):
+    path = tmp_path / 'crawl.jsonl'
+    path.write_text('{"type": "visit", "user": "a"}\n')
+    with pytest.raises(ValueError, match='not a valid checkpoint'):
+        CrawlCheckpoint(str(path)).load()
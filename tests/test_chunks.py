@@ -0,0 +1,44 @@
+import os
+import numpy as np
+import pytest
+from influence.pmc import InfuenceMaximizer
+
+
+@pytest.fixture(scope='module')
+def network():
+    rs = np.random.RandomState(0)
+    n, m = 300, 1200
+    return np.c_[rs.randint(0, n, m), rs.randint(0, n, m), rs.uniform(0, 0.4, m)].astype(float)
+
+
+# 作業領域(64MiB)と数シミュレーション分
+BUDGET = (1 << 26) + 60_000
+
+
+def maximizer(network, **kwargs):
+    return InfuenceMaximizer(network, 3, 12, backend='array', seed=7, **kwargs)
+
+
+def test_chunks_match_in_memory(network, tmp_path):
+    expected = maximizer(network)
+    S = expected.run()
+    inf = maximizer(network, max_memory=BUDGET, spill_dir=str(tmp_path))
+    assert inf.run() == S
+    assert inf.v_gain == expected.v_gain
+    assert len(inf.chunks) > 1
+    assert [r.start for r in inf.chunks] == list(range(0, 12, len(inf.chunks[0])))
+
+
+def test_too_small_budget(network):
+    with pytest.raises(ValueError, match='is too small'):
+        maximizer(network, max_memory=1 << 20).run()
+
+
+def test_chunks_round_trip(network, tmp_path):
+    # チャンクに分けた場合は、チャンクごとに保存する
+    expected = maximizer(network).run()
+    for _ in range(2):
+        inf = maximizer(network, cache_dir=str(tmp_path), max_memory=BUDGET)
+        assert inf.run() == expected
+        assert len(inf.chunks) > 1
+    assert len(os.listdir(tmp_path)) == len(inf.chunks)
@@ -0,0 +1,116 @@
+import time
+import types
+import random
+import asyncio
+import datetime
+import threading
+import pytest
+
+# twitterパッケージの読み込みに必要なもの
+for module in ('pandas', 'tweepy', 'MeCab', 'emoji', 'mojimoji', 'neologdn'):
+    pytest.importorskip(module)
+
+import tweepy
+from twitter.get_network import GetDescriptionNetwork
+from twitter.rate_limit import RateLimitScheduler
+
+N = 200
+
+
+class Stop(BaseException):
+    # crawlのexcept Exceptionで捕まらない、クロールを途中で止める例外
+    pass
+
+
+class Api:
+    """
+    ランダムなフォロワー関係のユーザ(u13のフォロワーは非公開, u97は削除済み)
+    stop回目のfollowers_idsでStopを送出する
+    """
+    def __init__(self, stop=None):
+        rs = random.Random(1)
+        words = ['cat', 'dog', 'fish', 'bird', 'cow']
+        self.users = {
+            i: types.SimpleNamespace(
+                id=i, screen_name=f'u{i}', location='', url=None, description=' '.join(rs.sample(words, 2)),
+                followers_count=rs.randint(0, 50), friends_count=rs.randint(0, 30), listed_count=rs.randint(0, 3),
+                favourites_count=rs.randint(0, 999), statuses_count=rs.randint(0, 999),
+                created_at=datetime.datetime(2020, 1, 1))
+            for i in range(N)}
+        self.followers = {i: rs.sample(range(N), rs.randint(0, 40)) for i in range(N)}
+        self.stop = stop
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def followers_ids(self, screen_name, cursor):
+        with self.lock:
+            self.calls += 1
+            if self.calls == self.stop:
+                raise Stop()
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.002)
+        with self.lock:
+            self.active -= 1
+        i = int(screen_name[1:])
+        if i == 13:
+            raise tweepy.error.TweepError('not authorized')
+        start = 0 if cursor == -1 else cursor
+        end = start + 7 if start + 7 < len(self.followers[i]) else 0
+        return self.followers[i][start:start + 7], (0, end)
+
+    def lookup_users(self, user_ids):
+        return [self.users[i] for i in user_ids if i != 97]
+
+    def get_user(self, user):
+        if isinstance(user, str):
+            return self.users[int(user[1:])]
+        if user == 97:
+            raise tweepy.error.TweepError('user not found')
+        return self.users[user]
+
+
+def crawler(api):
+    gdn = GetDescriptionNetwork(str.upper, str.split, max_followers=30, min_listed_count=1,
+                                scheduler=RateLimitScheduler([api], limits={}))
+    gdn.lookup_batch_size = 10
+    gdn.description_stopwords = []
+    return gdn
+
+
+@pytest.fixture(scope='module')
+def serial():
+    gdn = crawler(Api())
+    return gdn.get_network('u0'), gdn
+
+
+@pytest.mark.parametrize('concurrency', [1, 6])
+def test_same_network_as_serial(serial, concurrency):
+    (adj_list, users_info), expected = serial
+    api = Api()
+    gdn = crawler(api)
+    assert asyncio.run(gdn.get_network_async('u0', concurrency=concurrency)) == (adj_list, users_info)
+    assert gdn.network == expected.network
+    assert gdn.history == expected.history
+    assert len(expected.network) > 10
+    # 探索キューの先頭concurrency人のフォロワーを先読みする
+    assert api.max_active == 1 if concurrency == 1 else api.max_active > 1
+
+
+def test_checkpoint_matches_serial(tmp_path):
+    crawler(Api()).get_network('u0', checkpoint=str(tmp_path / 'serial.jsonl'))
+    asyncio.run(crawler(Api()).get_network_async('u0', concurrency=4, checkpoint=str(tmp_path / 'async.jsonl')))
+    assert (tmp_path / 'serial.jsonl').read_text() == (tmp_path / 'async.jsonl').read_text()
+
+
+def test_resume_async(serial, tmp_path):
+    (adj_list, users_info), expected = serial
+    path = str(tmp_path / 'checkpoint.jsonl')
+    with pytest.raises(Stop):
+        asyncio.run(crawler(Api(stop=20)).get_network_async('u0', concurrency=4, checkpoint=path))
+    gdn = crawler(Api())
+    assert asyncio.run(gdn.resume_async(path, concurrency=4)) == (adj_list, users_info)
+    assert gdn.network == expected.network
+    assert gdn.history == expected.history
@@ -0,0 +1,95 @@
+import numpy as np
+import networkx as nx
+import pytest
+from influence.csr import bfs, condense, reachable_weights, forest_subtree_weights, topological_levels
+from influence.pmc import InfuenceMaximizer
+
+
+def random_graph(n, m, seed):
+    rs = np.random.RandomState(seed)
+    src, dst = rs.randint(0, n, m), rs.randint(0, n, m)
+    keep = src != dst
+    return src[keep], dst[keep]
+
+
+def to_networkx(src, dst, n):
+    G = nx.DiGraph()
+    G.add_nodes_from(range(n))
+    G.add_edges_from(zip(src.tolist(), dst.tolist()))
+    return G
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_condense_matches_networkx(seed):
+    n = 60
+    src, dst = random_graph(n, 120, seed)
+    comp, dag = condense(src, dst, n)
+    C = nx.condensation(to_networkx(src, dst, n))
+    mapping = C.graph['mapping']
+
+    # 強連結成分の分け方と枝が、番号の付け方を除いて一致する
+    assert dag.n == C.number_of_nodes()
+    pairs = {(comp[v], mapping[v]) for v in range(n)}
+    assert len(pairs) == dag.n
+    relabel = dict(pairs)
+    edges = {(relabel[c], relabel[int(d)]) for c in range(dag.n) for d in dag.successors(c)}
+    assert edges == set(C.edges())
+    assert np.array_equal(dag.weight, np.bincount(comp, minlength=dag.n))
+    # 逆方向のCSRは順方向と同じ枝を持つ
+    assert sorted((int(p), c) for c in range(dag.n) for p in dag.predecessors(c)) == \
+        sorted((c, int(d)) for c in range(dag.n) for d in dag.successors(c))
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('max_bytes', [1 << 26, 1])
+def test_reachable_weights_matches_networkx(seed, max_bytes):
+    n = 80
+    src, dst = random_graph(n, 200, seed)
+    comp, dag = condense(src, dst, n)
+    G = to_networkx(np.repeat(np.arange(dag.n), np.diff(dag.indptr)), dag.indices, dag.n)
+    weight = np.random.RandomState(seed).randint(0, 5, dag.n)
+
+    # max_bytes=1では列を64個ずつのブロックに分けて計算する
+    total = reachable_weights(dag, weight, max_bytes=max_bytes)
+    expected = [weight[list(nx.descendants(G, c) | {c})].sum() for c in range(dag.n)]
+    assert total.tolist() == expected
+    assert np.array_equal(reachable_weights(dag), [dag.weight[list(nx.descendants(G, c) | {c})].sum()
+                                                   for c in range(dag.n)])
+
+
+def test_topological_levels_order():
+    src, dst = random_graph(50, 150, 0)
+    _, dag = condense(src, dst, 50)
+    level_of = np.empty(dag.n, dtype=int)
+    for l, level in enumerate(topological_levels(dag)):
+        level_of[level] = l
+    for c in range(dag.n):
+        assert all(level_of[d] < level_of[c] for d in dag.successors(c))
+
+
+def test_bfs_blocked():
+    # 0 -> 1 -> 2, 0 -> 3
+    comp, dag = condense(np.array([0, 1, 0]), np.array([1, 2, 3]), 4)
+    blocked = np.zeros(dag.n, dtype=bool)
+    blocked[comp[1]] = True
+    assert sorted(bfs(dag.indptr, dag.indices, [comp[0]]).tolist()) == sorted(comp.tolist())
+    assert sorted(bfs(dag.indptr, dag.indices, [comp[0]], blocked=blocked).tolist()) == sorted([comp[0], comp[3]])
+
+
+def test_forest_subtree_weights():
+    # 入次数が1以下の森 : 0 -> 1, 0 -> 2, 2 -> 3, 4
+    _, dag = condense(np.array([0, 0, 2]), np.array([1, 2, 3]), 5)
+    assert np.array_equal(forest_subtree_weights(dag), reachable_weights(dag))
+
+
+@pytest.mark.parametrize('greedy', ['exhaustive', 'celf'])
+def test_array_backend_matches_networkx_backend(greedy):
+    rs = np.random.RandomState(1)
+    src, dst = random_graph(40, 120, 1)
+    network = np.c_[src, dst, rs.uniform(0.1, 0.9, len(src))].astype(float)
+    results = []
+    for backend in ('networkx', 'array'):
+        np.random.seed(0)
+        inf = InfuenceMaximizer(network, 4, 10, backend=backend, greedy=greedy)
+        results.append((inf.run(), dict(inf.v_gain)))
+    assert results[0] == results[1]
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from influence.edges import intern_edges, node_index
+
+
+def test_string_nodes():
+    nodes, src, dst, prob = intern_edges([['a', 'b', 0.1], ['b', 'c', 0.2], ['c', 'a', 0.3]])
+    assert nodes.tolist() == ['a', 'b', 'c']
+    assert nodes[src].tolist() == ['a', 'b', 'c']
+    assert nodes[dst].tolist() == ['b', 'c', 'a']
+    assert src.dtype == dst.dtype == np.int32
+    assert prob.dtype == np.float32
+
+
+def test_float_array_nodes_become_int():
+    nodes, src, dst, prob = intern_edges(np.array([[10, 3, 0.5], [3, 7, 0.25]]))
+    assert nodes.dtype == np.int64
+    assert nodes.tolist() == [3, 7, 10]
+    assert nodes[src].tolist() == [10, 3]
+    assert prob.tolist() == [0.5, 0.25]
+
+
+def test_large_integer_ids_keep_precision():
+    # 2**53を超えるid(TwitterのユーザIDなど)がfloatで丸められて重ならない
+    network = [[1600000000000000001, 1600000000000000002, 0.5], [3, 1600000000000000001, 0.25]]
+    nodes, src, dst, prob = intern_edges(network)
+    assert nodes.dtype == np.int64
+    assert nodes.tolist() == [3, 1600000000000000001, 1600000000000000002]
+    assert nodes[src].tolist() == [1600000000000000001, 3]
+    assert nodes[dst].tolist() == [1600000000000000002, 1600000000000000001]
+
+
+def test_mixed_labels():
+    with pytest.raises(ValueError, match='all strings or all numbers'):
+        intern_edges([['a', 1, 0.1]])
+
+
+def test_node_index():
+    nodes, *_ = intern_edges([['a', 'bb', 0.1], ['ccc', 'a', 0.2]])
+    assert node_index(nodes, ['ccc', 'a']).tolist() == [2, 0]
+    with pytest.raises(ValueError, match='unknown seeds'):
+        node_index(nodes, ['a', 'zz'])
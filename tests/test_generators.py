@@ -0,0 +1,16 @@
+import numpy as np
+import pytest
+from benchmarks.generators import GENERATORS
+
+
+@pytest.mark.parametrize('name', list(GENERATORS))
+def test_generators(name):
+    network = GENERATORS[name](500, seed=0)
+    assert network.ndim == 2 and network.shape[1] == 3
+    src, dst, prob = network.T
+    assert np.all((0 <= src) & (src < 500) & (0 <= dst) & (dst < 500))
+    assert np.all(src != dst)
+    assert np.all((0 < prob) & (prob <= 1))
+    # seedが同じなら同じグラフ
+    assert np.array_equal(network, GENERATORS[name](500, seed=0))
+    assert not np.array_equal(network, GENERATORS[name](500, seed=1))
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from influence.pmc import InfuenceMaximizer, hub_sets
+from influence.store import snapshot_key, save_snapshots, load_snapshots
+
+
+def random_network(seed, n=120, m=360):
+    rs = np.random.RandomState(seed)
+    return np.c_[rs.randint(0, n, m), rs.randint(0, n, m), rs.uniform(0.1, 0.6, m)]
+
+
+def descendants(dag, v, alive=None):
+    # vから(消去されていないノードを)たどって到達するノード
+    X, stack = {v}, [v]
+    while stack:
+        for w in dag.successors(stack.pop()).tolist():
+            if w not in X and (alive is None or alive[w]):
+                X.add(w)
+                stack.append(w)
+    return X
+
+
+def assert_gains(inf):
+    for i in range(inf.R):
+        alive = inf.V[i]
+        expected = [int(inf.G[i].weight[list(descendants(inf.G[i], v, alive))].sum()) if alive[v] else 0
+                    for v in range(inf.G[i].n)]
+        assert [inf.gain_array(i, v) for v in range(inf.G[i].n)] == expected
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('greedy', ['exhaustive', 'celf'])
+def test_multiple_hubs_match_single_hub(seed, greedy):
+    network = random_network(seed)
+    single = InfuenceMaximizer(network, 4, 10, seed=seed, greedy=greedy)
+    multiple = InfuenceMaximizer(network, 4, 10, seed=seed, greedy=greedy, n_hubs=8)
+    assert multiple.run() == single.run()
+    assert multiple.v_gain == single.v_gain
+    assert max(len(multiple.h[i]) for i in range(multiple.R)) > 1
+
+
+def test_hub_sets_disjoint():
+    inf = InfuenceMaximizer(random_network(0), 1, 5, seed=0)
+    inf.make_random_DAGs()
+    for i in range(inf.R):
+        dag = inf.G[i]
+        h, A, D = hub_sets(dag, 8)
+        desc = [descendants(dag, v) for v in range(dag.n)]
+        for j, c in enumerate(h.tolist()):
+            # ハブから到達するノードは他のハブから到達するノードと重ならない
+            assert all(D[w] == j for w in desc[c])
+            assert [bool(A[v] >> j & 1) for v in range(dag.n)] == [v != c and c in desc[v] for v in range(dag.n)]
+        assert np.count_nonzero(D >= 0) == sum(len(desc[c]) for c in h.tolist())
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_gains_after_removing_hub(seed):
+    inf = InfuenceMaximizer(random_network(seed), 1, 10, seed=seed, n_hubs=8)
+    inf.make_random_DAGs()
+    assert_gains(inf)
+    # ハブのgainを使い回しているノードも、ハブを消去した後は正しいgainになる
+    for i in range(inf.R):
+        if len(inf.h[i]):
+            inf.update_array(i, int(inf.h[i][0]))
+    assert_gains(inf)
+    for i in range(inf.R):
+        for c in inf.h[i][1:].tolist():
+            inf.update_array(i, c)
+    assert_gains(inf)
+
+
+def test_store_keeps_hubs(tmp_path):
+    network = random_network(0)
+    inf = InfuenceMaximizer(network, 3, 8, seed=1, n_hubs=4, cache_dir=str(tmp_path))
+    inf.make_random_DAGs()
+    loaded = InfuenceMaximizer(network, 3, 8, seed=1, n_hubs=4, cache_dir=str(tmp_path))
+    loaded.make_random_DAGs()
+    for i in range(inf.R):
+        for name in ('h', 'A', 'D'):
+            assert np.array_equal(getattr(inf, name)[i], getattr(loaded, name)[i])
+
+    # ハブの数が異なる場合は読み込まない
+    path = str(tmp_path / 'snapshots')
+    key = snapshot_key(inf.nodes, inf.src, inf.dst, inf.prob, inf.R, inf.seed, inf.model)
+    save_snapshots(path, inf, key)
+    assert not load_snapshots(path, InfuenceMaximizer(network, 3, 8, seed=1, n_hubs=2), key)
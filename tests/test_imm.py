@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from influence.engine import make_maximizer
+from influence.imm import IMMInfuenceMaximizer
+from influence.pmc import InfuenceMaximizer
+
+
+def star(n):
+    # ハブ0から全てのノードに確率1の枝があり、他の枝は確率0.01
+    rs = np.random.RandomState(0)
+    edges = [[0, v, 1.0] for v in range(1, n)]
+    edges += [[u, v, 0.01] for u, v in rs.randint(1, n, (n, 2)) if u != v]
+    return np.array(edges, dtype=float)
+
+
+def test_imm_finds_hub():
+    inf = IMMInfuenceMaximizer(star(100), 1, epsilon=0.3, seed=0)
+    assert inf.run() == [0]
+    assert inf.v_gain[0] > 90
+    assert inf.influence_result() is inf.v_gain
+
+
+def test_k_larger_than_cover():
+    # ハブだけで全てのRR集合を被覆するため、残りはgainが0のノードから重複せずに選ぶ
+    S = IMMInfuenceMaximizer(star(10), 5, epsilon=0.3, seed=0).run()
+    assert S[0] == 0
+    assert len(set(S)) == 5
+
+
+def test_imm_string_nodes():
+    network = [['hub', f'u{v}', 1.0] for v in range(20)] + [['u1', 'u2', 0.5]]
+    assert IMMInfuenceMaximizer(network, 2, epsilon=0.3, seed=0).run()[0] == 'hub'
+
+
+def test_imm_reproducible():
+    a = IMMInfuenceMaximizer(star(80), 3, epsilon=0.3, seed=1)
+    b = IMMInfuenceMaximizer(star(80), 3, epsilon=0.3, seed=1)
+    assert a.run() == b.run()
+    assert a.theta == b.theta
+
+
+def test_max_samples():
+    inf = IMMInfuenceMaximizer(star(80), 2, epsilon=0.1, seed=0, max_samples=500)
+    inf.run()
+    assert inf.theta <= 500
+
+
+def test_make_maximizer():
+    assert isinstance(make_maximizer(star(10), 1, engine='imm', seed=0), IMMInfuenceMaximizer)
+    assert isinstance(make_maximizer(star(10), 1, R=5), InfuenceMaximizer)
+    with pytest.raises(ValueError, match='unknown engine'):
+        make_maximizer(star(10), 1, engine='other')
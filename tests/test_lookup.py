@@ -0,0 +1,85 @@
+import types
+import datetime
+import pytest
+
+# twitterパッケージの読み込みに必要なもの
+for module in ('pandas', 'tweepy', 'MeCab', 'emoji', 'mojimoji', 'neologdn'):
+    pytest.importorskip(module)
+
+import tweepy
+from twitter.get_network import GetDescriptionNetwork
+from twitter.rate_limit import RateLimitScheduler
+
+
+def user(i):
+    return types.SimpleNamespace(
+        id=i, screen_name=f'u{i}', location='', url=None, description=f'hello {i}',
+        followers_count=i, friends_count=1, listed_count=0, favourites_count=4, statuses_count=6,
+        created_at=datetime.datetime(2020, 1, 1))
+
+
+class Api:
+    """
+    7の倍数のidのユーザは凍結・削除されていて、failを含むまとまりのusers/lookupは失敗する
+    """
+    def __init__(self, fail=None):
+        self.fail = fail
+        self.batches = []
+        self.shown = []
+
+    def lookup_users(self, user_ids):
+        self.batches.append(list(user_ids))
+        if self.fail in user_ids:
+            raise tweepy.error.TweepError('lookup failed')
+        # users/lookupは順序を保証しない
+        return [user(i) for i in reversed(user_ids) if i % 7]
+
+    def get_user(self, user_id):
+        self.shown.append(user_id)
+        if user_id % 7 == 0:
+            raise tweepy.error.TweepError('user not found')
+        return user(user_id)
+
+
+def crawler(api):
+    return GetDescriptionNetwork(lambda s: s.upper(), str.split, scheduler=RateLimitScheduler([api], limits={}))
+
+
+def test_batches_of_100():
+    api = Api()
+    ids = list(range(1, 251))
+    users = crawler(api).lookup_users(ids)
+    assert [len(batch) for batch in api.batches] == [100, 100, 50]
+    assert sum(api.batches, []) == ids
+    # idsと同じ順で、取得できなかったユーザはNone
+    assert [None if res is None else res.id for res in users] == [i if i % 7 else None for i in ids]
+    assert api.shown == []
+
+
+def test_missing_reported_once_per_batch(capsys):
+    crawler(Api()).lookup_users(list(range(1, 251)))
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 3
+    assert lines[0] == f'14 users not found : {list(range(7, 101, 7))}'
+
+
+def test_fallback_per_user(capsys):
+    # 失敗したまとまりのみ1人ずつ取得し直す
+    api = Api(fail=150)
+    ids = list(range(1, 251))
+    users = crawler(api).lookup_users(ids)
+    assert api.shown == list(range(101, 201))
+    assert [None if res is None else res.id for res in users] == [i if i % 7 else None for i in ids]
+    out = capsys.readouterr().out
+    assert 'lookup failed' in out
+    assert f'14 users not found : {list(range(105, 201, 7))}' in out.splitlines()
+
+
+def test_lookup_users_info_matches_get_user_info():
+    ids = [5, 14, 3, 150, 9]
+    gdn = crawler(Api(fail=150))
+    info = gdn.lookup_users_info(ids)
+    expected = [gdn.get_user_info(i) for i in ids]
+    assert info == expected
+    assert info[1]['id'] is None
+    assert info[0]['description_clean'] == 'HELLO 5'
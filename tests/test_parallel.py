@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from multiprocessing import shared_memory
+from influence.pmc import InfuenceMaximizer
+
+
+@pytest.fixture(scope='module')
+def network():
+    rs = np.random.RandomState(0)
+    n, m = 400, 1600
+    return np.c_[rs.randint(0, n, m), rs.randint(0, n, m), rs.uniform(0, 0.3, m)]
+
+
+@pytest.mark.parametrize('options', [{}, {'greedy': 'celf'}, {'n_hubs': 4}, {'model': 'lt'}])
+def test_gain_pool_matches_serial(network, options):
+    serial = InfuenceMaximizer(network, 4, 12, seed=0, progress=False, **options)
+    parallel = InfuenceMaximizer(network, 4, 12, seed=0, n_jobs=2, progress=False, **options)
+    assert parallel.run() == serial.run()
+    assert parallel.v_gain == serial.v_gain
+    # runの終了時にworkerを終了し、共有メモリを解放する
+    assert parallel._pool is None
+
+
+def test_close_releases_shared_memory(network):
+    inf = InfuenceMaximizer(network, 2, 6, seed=0, n_jobs=2, progress=False)
+    inf.make_random_DAGs()
+    inf.all_node_gains()
+    name = inf._pool.shm.name
+    inf.close_gain_pool()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name)
+    # 状態は親プロセスに残る
+    assert inf.run() == InfuenceMaximizer(network, 2, 6, seed=0, progress=False).run()
+
+
+def test_parent_uses_shared_memory(network):
+    # 親プロセスのDAGと状態は共有メモリのviewに置き換え、closeで元の配列に戻す
+    inf = InfuenceMaximizer(network, 2, 6, seed=0, n_jobs=2, progress=False)
+    inf.make_random_DAGs()
+    comp = inf.comp.copy()
+    indices = [inf.G[i].indices.copy() for i in range(inf.R)]
+    pool = inf.gain_pool()
+    buf = np.ndarray(pool.shm.size, dtype=np.uint8, buffer=pool.shm.buf)
+    assert np.shares_memory(inf.comp, buf)
+    for i in range(inf.R):
+        for a in (inf.G[i].indices, inf.h[i], inf.A[i], inf.D[i], inf.V[i]):
+            assert np.shares_memory(a, buf)
+    del buf
+    inf.close_gain_pool()
+    assert np.array_equal(inf.comp, comp)
+    assert all(np.array_equal(inf.G[i].indices, indices[i]) for i in range(inf.R))
+    assert inf.run() == InfuenceMaximizer(network, 2, 6, seed=0, progress=False).run()
@@ -0,0 +1,104 @@
+import os
+import importlib.util
+import types
+import datetime
+import pytest
+
+
+def load_module(name):
+    # twitter/__init__.pyはMeCab, pandasなどを読み込むため、モジュールのファイルを直接読み込む
+    path = os.path.join(os.path.dirname(__file__), os.pardir, 'twitter', f'{name}.py')
+    spec = importlib.util.spec_from_file_location(f'twitter_{name}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+profile_cache = load_module('profile_cache')
+ProfileCache, CachedUser, PROFILE_FIELDS = profile_cache.ProfileCache, profile_cache.CachedUser, profile_cache.PROFILE_FIELDS
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def user(i, description='hello'):
+    return types.SimpleNamespace(id=i, screen_name=f'User{i}', location='Tokyo', url=None, description=description,
+                                 followers_count=10, friends_count=5, listed_count=0, favourites_count=3,
+                                 statuses_count=7, created_at=datetime.datetime(2020, 1, 2, 3, 4, 5))
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def cache(clock):
+    cache = ProfileCache(':memory:', ttl=100, followers_ttl=50, clock=clock)
+    yield cache
+    cache.close()
+
+
+def test_users_round_trip(cache):
+    cache.put_users([user(1), user(2)], ['clean 1', 'clean 2'], [['a'], None])
+    users = cache.get_users([1, 2, 3])
+    assert set(users) == {1, 2}
+    assert isinstance(users[1], CachedUser)
+    assert all(getattr(users[1], name) == getattr(user(1), name) for name in PROFILE_FIELDS)
+    assert users[1].description_clean == 'clean 1'
+    assert (users[1].tokens, users[2].tokens) == (['a'], None)
+    # screen_nameは大文字と小文字を区別せず、intはidとして引く
+    assert cache.get_user('user1').id == 1
+    assert cache.get_user(2).screen_name == 'User2'
+    assert cache.get_user('nobody') is None
+    assert cache.stats()['profiles'] == {'hits': 4, 'misses': 2, 'hit_rate': 4 / 6}
+
+
+def test_tokens_kept_while_description_unchanged(cache):
+    cache.put_users([user(1)], ['clean'])
+    cache.put_tokens(1, ['tok'])
+    cache.put_users([user(1)], ['clean'])
+    assert cache.get_tokens(1) == ['tok']
+    cache.put_users([user(1, 'changed')], ['changed'])
+    assert cache.get_tokens(1) is None
+
+
+def test_ttl(cache, clock):
+    cache.put_users([user(1)], ['clean'])
+    cache.put_follower_ids('User1', [5, 6])
+    clock.now += 60
+    # フォロワーのidのリストの方が有効期間が短い
+    assert cache.get_user('user1') is not None
+    assert cache.get_follower_ids('user1') is None
+    clock.now += 50
+    assert cache.get_users([1]) == {}
+    assert cache.get_tokens(1) is None
+    assert cache.purge() == 2
+    clock.now -= 110
+    assert cache.get_user('user1') is None
+
+
+def test_eviction_by_last_access(clock):
+    cache = ProfileCache(':memory:', max_entries=2, clock=clock)
+    cache.put_users([user(1)], ['1'])
+    clock.now += 1
+    cache.put_users([user(2)], ['2'])
+    clock.now += 1
+    # 1を使ったので、最後に使った時刻が最も古いのは2
+    cache.get_users([1])
+    clock.now += 1
+    cache.put_users([user(3)], ['3'])
+    assert set(cache.get_users([1, 2, 3])) == {1, 3}
+
+    for i, name in enumerate(['a', 'b', 'c']):
+        clock.now += 1
+        cache.put_follower_ids(name, [i])
+    assert [cache.get_follower_ids(name) for name in ['a', 'b', 'c']] == [None, [1], [2]]
+    cache.clear()
+    assert cache.get_users([1, 3]) == {}
+    cache.close()
@@ -0,0 +1,115 @@
+import os
+import importlib.util
+import types
+import pytest
+
+tweepy = pytest.importorskip('tweepy')
+
+
+def load_module(name):
+    # twitter/__init__.pyはMeCab, pandasなどを読み込むため、モジュールのファイルを直接読み込む
+    path = os.path.join(os.path.dirname(__file__), os.pardir, 'twitter', f'{name}.py')
+    spec = importlib.util.spec_from_file_location(f'twitter_{name}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+rate_limit = load_module('rate_limit')
+TokenBucket, RateLimitScheduler = rate_limit.TokenBucket, rate_limit.RateLimitScheduler
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class Api:
+    def __init__(self, name, fail=0, reset=None):
+        self.name = name
+        self.fail = fail
+        self.reset = reset
+        self.calls = 0
+
+    def get_user(self, screen_name):
+        self.calls += 1
+        if self.fail > 0:
+            self.fail -= 1
+            headers = {} if self.reset is None else {'x-rate-limit-reset': str(self.reset)}
+            raise tweepy.error.RateLimitError('rate limited', types.SimpleNamespace(headers=headers))
+        return self.name
+
+
+def test_token_bucket():
+    bucket = TokenBucket(2, 0.5, now=0)
+    assert bucket.take(0) == 0
+    assert bucket.take(0) == 0
+    # 空になったら1個貯まるまで(1 / 0.5秒)待つ
+    assert bucket.take(0) == 2
+    assert bucket.wait(1) == 1
+    assert bucket.take(2) == 0
+    bucket.refill(100)
+    assert bucket.tokens == 2
+    # 429の後はuntilまで補充しない
+    bucket.drain(until=110)
+    assert bucket.wait(105) == 7
+    assert bucket.wait(110) == 2
+    assert bucket.wait(111) == 1
+
+
+def test_spreads_calls_and_waits_when_exhausted():
+    clock = Clock()
+    apis = [Api('a'), Api('b')]
+    scheduler = RateLimitScheduler(apis, limits={'users/show': 2}, window=10, clock=clock, sleep=clock.sleep)
+    assert sorted(scheduler.call('get_user', 'x') for _ in range(4)) == ['a', 'a', 'b', 'b']
+    assert clock.slept == []
+    # 全ての認証情報でトークンがない場合のみ待つ
+    scheduler.call('get_user', 'x')
+    assert clock.slept == [5]
+    assert scheduler.metrics() == {'users/show': {'calls': 5, 'wait': 5, 'throttled': 0}}
+
+
+def test_unlimited_endpoint():
+    clock = Clock()
+    scheduler = RateLimitScheduler([Api('a')], limits={}, clock=clock, sleep=clock.sleep)
+    assert [scheduler.call('get_user', 'x') for _ in range(100)] == ['a'] * 100
+    assert clock.slept == []
+
+
+def test_rate_limit_error_moves_to_other_credential():
+    clock = Clock()
+    apis = [Api('a', fail=1), Api('b')]
+    scheduler = RateLimitScheduler(apis, limits={'users/show': 5}, window=10, clock=clock, sleep=clock.sleep)
+    assert scheduler.call('get_user', 'x') == 'b'
+    # 429を返したaはリセット時刻が分からないため窓の長さだけ使わない
+    assert [scheduler.call('get_user', 'x') for _ in range(4)] == ['b'] * 4
+    # 429を返したaは窓の長さ(リセット時刻が分からない場合)だけ使わず、bのトークンが貯まるのを待つ
+    assert scheduler.call('get_user', 'x') == 'b'
+    assert clock.slept == [2]
+    clock.now = 20
+    assert scheduler.call('get_user', 'x') == 'a'
+    assert apis[0].calls == 2
+    assert scheduler.metrics()['users/show']['throttled'] == 1
+
+
+def test_reset_header_from_error(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, 'time', lambda: 1000.0)
+    scheduler = RateLimitScheduler([Api('a', fail=1, reset=1003)], limits={'users/show': 5}, window=10,
+                                   clock=clock, sleep=clock.sleep)
+    assert scheduler.call('get_user', 'x') == 'a'
+    # リセット時刻(3秒後) + 1秒まで補充しない
+    assert clock.now == pytest.approx(4 + 1 / 0.5)
+
+
+def test_requires_credentials():
+    with pytest.raises(ValueError):
+        RateLimitScheduler([])
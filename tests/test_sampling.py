@@ -0,0 +1,45 @@
+import numpy as np
+from influence.sampling import LiveEdgeSampler, LTLiveEdgeSampler, lt_table, lt_live
+
+
+def test_block_sampling_matches_sequential_draws():
+    prob = np.random.RandomState(0).uniform(0, 1, 37)
+    sampler = LiveEdgeSampler(prob, 10, block_size=4)
+    sampler.sample(np.random.RandomState(1))
+
+    # 1回ずつ枝数個の一様乱数を生成した場合と同じ
+    rs = np.random.RandomState(1)
+    for i in range(10):
+        assert np.array_equal(sampler.live(i), rs.uniform(0, 1, len(prob)) < prob)
+    assert np.array_equal(sampler.live_count(), [sampler.live(i).sum() for i in range(10)])
+    assert np.array_equal(sampler.live_edges(3), np.flatnonzero(sampler.live(3)))
+
+
+def test_split_snapshots_match_whole():
+    prob = np.random.RandomState(0).uniform(0, 1, 20)
+    whole = LiveEdgeSampler(prob, 9, block_size=2)
+    whole.sample(np.random.RandomState(5))
+    split = LiveEdgeSampler(prob, 9, block_size=2)
+    rs = np.random.RandomState(5)
+    split.sample(rs, range(0, 4))
+    split.sample(rs, range(4, 9))
+    assert np.array_equal(whole.masks, split.masks)
+
+
+def test_lt_keeps_at_most_one_in_edge():
+    rs = np.random.RandomState(0)
+    n, m = 15, 60
+    dst = rs.randint(0, n, m)
+    prob = rs.uniform(0, 1, m)
+    sampler = LTLiveEdgeSampler(prob, 50, dst, n, block_size=7)
+    sampler.sample(np.random.RandomState(2))
+    for i in range(50):
+        assert np.bincount(dst[sampler.live(i)], minlength=n).max() <= 1
+
+
+def test_lt_live_follows_weights():
+    # ノード0に重み0.2, 0.3の枝が入り、合計が1以下なので0.5の確率でどちらも残らない
+    table = lt_table(np.array([0, 0]), np.array([0.2, 0.3]), 1)
+    assert lt_live(table, np.array([0.1]), 2).tolist() == [True, False]
+    assert lt_live(table, np.array([0.4]), 2).tolist() == [False, True]
+    assert lt_live(table, np.array([0.6]), 2).tolist() == [False, False]
@@ -0,0 +1,100 @@
+import json
+import threading
+import http.client
+import numpy as np
+import pytest
+from influence.pmc import InfuenceMaximizer
+from influence.server import LRUCache, InfluenceService, make_server
+
+
+@pytest.fixture(scope='module')
+def network():
+    rs = np.random.RandomState(0)
+    return np.c_[rs.randint(0, 100, 400), rs.randint(0, 100, 400), rs.uniform(0, 0.4, 400)]
+
+
+@pytest.fixture(scope='module')
+def service(network):
+    service = InfluenceService(network, 20, seed=3)
+    yield service
+    service.close()
+
+
+def test_lru_cache():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == (True, 1)
+    cache.put('c', 3)
+    # 最後に使った時刻が最も古いbを消す
+    assert cache.get('b') == (False, None)
+    assert len(cache) == 2 and (cache.hits, cache.misses) == (1, 1)
+
+
+def test_seeds_match_maximizer(network, service):
+    expected = InfuenceMaximizer(network, 4, 20, seed=3, progress=False).run()
+    assert service.query('seeds', k=2)['seeds'] == expected[:2]
+    result = service.query('seeds', k=4)
+    assert result['seeds'] == expected
+    # シード集合の期待影響数はgainの合計と同じ
+    assert service.spread(result['seeds'])['mean'] == pytest.approx(result['spread'])
+
+
+def test_marginal(service):
+    seeds = service.query('seeds', k=1)['seeds']
+    top = service.marginal(seeds, limit=3)
+    assert top['nodes'][0] == service.query('seeds', k=2)['seeds'][1]
+    assert service.marginal(seeds, candidates=top['nodes'])['gains'] == pytest.approx(top['gains'])
+
+
+def test_query_cache(service):
+    hits = service.cache.hits
+    service.query('spread', seeds=[1, 2])
+    service.query('spread', seeds=[1, 2])
+    assert service.cache.hits == hits + 1
+    with pytest.raises(ValueError):
+        service.query('other')
+
+
+def test_http(service):
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        conn = http.client.HTTPConnection(*server.server_address)
+        conn.request('POST', '/seeds', body=json.dumps({'k': 2}))
+        response = conn.getresponse()
+        assert response.status == 200
+        assert json.loads(response.read())['seeds'] == service.seeds(2)['seeds']
+        conn.request('POST', '/spread', body=json.dumps({'seeds': ['unknown']}))
+        response = conn.getresponse()
+        assert response.status == 400
+        response.read()
+        conn.request('GET', '/health')
+        assert json.loads(conn.getresponse().read())['R'] == 20
+        conn.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_http_unexpected_error(service, monkeypatch):
+    def fail(kind, **params):
+        raise RuntimeError('broken')
+    monkeypatch.setattr(service, 'query', fail)
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        # 想定外の例外は500で返し、同じ接続で次のリクエストを受け付ける
+        conn = http.client.HTTPConnection(*server.server_address)
+        conn.request('POST', '/seeds', body=json.dumps({'k': 2}))
+        response = conn.getresponse()
+        assert response.status == 500
+        assert json.loads(response.read()) == {'error': 'RuntimeError: broken'}
+        conn.request('GET', '/health')
+        assert conn.getresponse().status == 200
+        conn.close()
+    finally:
+        server.shutdown()
+        server.server_close()
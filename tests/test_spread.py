@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from influence.spread import SpreadEstimator, estimate_spread
+
+
+def test_deterministic_edges():
+    # 確率1の枝 0 -> 1 -> 2 と、確率0の枝 2 -> 3
+    network = [[0, 1, 1.0], [1, 2, 1.0], [2, 3, 0.0]]
+    result = estimate_spread(network, [0], n_sims=100, seed=0)
+    assert result['mean'] == 3
+    assert result['std_error'] == 0
+    assert estimate_spread(network, [2, 3], n_sims=10, seed=0)['mean'] == 2
+
+
+@pytest.mark.parametrize('model', ['ic', 'lt'])
+def test_single_edge_probability(model):
+    estimator = SpreadEstimator(np.array([0]), np.array([1]), np.array([0.3]), 2, model=model)
+    result = estimator.estimate([0], n_sims=20000, seed=0)
+    assert result['ci'][0] < result['mean'] < result['ci'][1]
+    assert abs(result['mean'] - 1.3) < 4 * result['std_error']
+
+
+def test_seed_reproducible():
+    rs = np.random.RandomState(0)
+    network = np.c_[rs.randint(0, 50, 200), rs.randint(0, 50, 200), rs.uniform(0, 0.3, 200)]
+    a = estimate_spread(network, [1, 2], n_sims=500, seed=3)
+    b = estimate_spread(network, [1, 2], n_sims=500, seed=3)
+    assert a == b
@@ -0,0 +1,35 @@
+import json
+import numpy as np
+from influence.pmc import InfuenceMaximizer
+from influence.stats import RunStats, peak_rss
+
+
+def test_phase_and_counters():
+    stats = RunStats()
+    with stats.phase('gain'):
+        pass
+    stats.add_times({'gain': 1.0, 'update': 2.0})
+    stats.count('cache_hits')
+    stats.count('cache_hits', np.int64(2))
+    d = stats.as_dict()
+    assert d['timers']['gain'] >= 1.0 and d['timers']['update'] == 2.0
+    assert d['counters'] == {'cache_hits': 3}
+    json.dumps(d)
+
+
+def test_peak_rss():
+    peak = peak_rss()
+    assert peak is None or peak > 0
+
+
+def test_callback_events():
+    events = []
+    rs = np.random.RandomState(0)
+    network = np.c_[rs.randint(0, 50, 200), rs.randint(0, 50, 200), rs.uniform(0, 0.3, 200)]
+    inf = InfuenceMaximizer(network, 3, 5, seed=0, progress=False,
+                            callback=lambda event, stats: events.append(event))
+    inf.run()
+    assert events == ['dags', 'round', 'round', 'round', 'done']
+    d = inf.stats.as_dict()
+    assert d['dags']['count'] == 5
+    assert d['counters']['cache_misses'] > 0
@@ -0,0 +1,67 @@
+import os
+import json
+import numpy as np
+import pytest
+from influence.pmc import InfuenceMaximizer
+from influence.store import FORMAT_VERSION, snapshot_key, save_snapshots, load_snapshots
+
+
+@pytest.fixture
+def network():
+    rs = np.random.RandomState(0)
+    n, m = 300, 1200
+    return np.c_[rs.randint(0, n, m), rs.randint(0, n, m), rs.uniform(0, 0.4, m)].astype(float)
+
+
+def maximizer(network, **kwargs):
+    return InfuenceMaximizer(network, 3, 12, backend='array', seed=7, **kwargs)
+
+
+def key_of(inf):
+    return snapshot_key(inf.nodes, inf.src, inf.dst, inf.prob, inf.R, inf.seed, inf.model)
+
+
+def test_round_trip(network, tmp_path):
+    inf = maximizer(network, cache_dir=str(tmp_path))
+    inf.make_random_DAGs()
+    assert inf.G[0].indices.flags.writeable
+
+    # 同じネットワーク, R, seedでは保存したものを読み込み(読み込み専用のmemory map)、DAGを作り直さない
+    loaded = maximizer(network, cache_dir=str(tmp_path))
+    loaded.make_random_DAGs()
+    assert not loaded.G[0].indices.flags.writeable
+    assert np.array_equal(inf.sampler.masks, loaded.sampler.masks)
+    for i in range(inf.R):
+        assert np.array_equal(inf.comp[i], loaded.comp[i])
+        assert np.array_equal(inf.h[i], loaded.h[i])
+        for name in ('A', 'D'):
+            assert np.array_equal(getattr(inf, name)[i], getattr(loaded, name)[i])
+        for name in ('weight', 'indptr', 'indices', 'rindptr', 'rindices'):
+            assert np.array_equal(getattr(inf.G[i], name), getattr(loaded.G[i], name))
+    assert inf.run() == loaded.run() == maximizer(network).run()
+
+
+def test_rejects_mismatch(network, tmp_path):
+    inf = maximizer(network)
+    inf.make_random_DAGs()
+    path = str(tmp_path / 'snapshots')
+    save_snapshots(path, inf, key_of(inf))
+
+    assert not load_snapshots(path, maximizer(network), 'other key')
+    assert not load_snapshots(str(tmp_path / 'missing'), maximizer(network), key_of(inf))
+    with open(os.path.join(path, 'manifest.json')) as f:
+        manifest = json.load(f)
+    manifest['version'] = FORMAT_VERSION - 1
+    with open(os.path.join(path, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+    assert not load_snapshots(path, maximizer(network), key_of(inf))
+
+
+def test_key_depends_on_inputs(network):
+    inf = maximizer(network)
+    key = key_of(inf)
+    assert key == key_of(maximizer(network))
+    assert key != snapshot_key(inf.nodes, inf.src, inf.dst, inf.prob, inf.R + 1, inf.seed)
+    assert key != snapshot_key(inf.nodes, inf.src, inf.dst, inf.prob, inf.R, inf.seed + 1)
+    assert key != snapshot_key(inf.nodes, inf.src, inf.dst, inf.prob, inf.R, inf.seed, 'lt')
+
@@ -1,3 +1,6 @@
 from twitter.get_tweets import *
 from twitter.cleansing_tweets import *
 from twitter.get_network import *
+from twitter.rate_limit import *
+from twitter.profile_cache import *
+from twitter.checkpoint import *
@@ -0,0 +1,174 @@
+import os
+import json
+import datetime
+from collections import deque
+from itertools import islice
+
+
+def _encode(o):
+    if isinstance(o, datetime.datetime):
+        return {'__datetime__': o.isoformat()}
+    raise TypeError(f'{type(o).__name__} is not JSON serializable')
+
+
+def _decode(d):
+    if '__datetime__' in d and len(d) == 1:
+        return datetime.datetime.fromisoformat(d['__datetime__'])
+    return d
+
+
+def _tail(d, n):
+    # dictの最後に加えたn個の要素(挿入順)
+    return list(islice(reversed(d.items()), n))[::-1]
+
+
+class CrawlCheckpoint:
+    """
+    get_networkの探索の途中経過を、追記のみのJSON Linesファイルに保存する
+    1行目はルートユーザの情報、以降は探索したユーザごとに、そのユーザの探索で加えたもの
+    (users_info, history, networkの要素, 探索キューに入れたユーザ, 隣接リストの行)を1行ずつ書く
+    探索で加えたものだけを書くため、1人あたりの保存の手間は、それまでのネットワークの大きさによらない
+
+    書き込み中に止まった場合の途中までの行は、読み込むときに捨てる
+
+    Attributes
+    ----------
+    path : str
+        チェックポイントのファイル
+    every : int
+        何人探索するごとにファイルに書き出すか
+    """
+
+    def __init__(self, path, every=1):
+        """
+        Parameters
+        ----------
+        path : str
+            チェックポイントのファイル
+        every : int
+            何人探索するごとにファイルに書き出すか(止まった場合は最大でevery - 1人分を探索し直す)
+        """
+        self.path = path
+        self.every = every
+        self._file = None
+        self._pending = 0
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False, default=_encode) + '\n')
+
+    def start(self, root_user, root_user_info, network_keywords):
+        """
+        新しくチェックポイントを作る(既にある場合は上書きする)
+        """
+        self.close()
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._write({'type': 'start', 'root_user': root_user, 'root_user_info': root_user_info,
+                     'network_keywords': network_keywords})
+        self._file.flush()
+
+    def load(self):
+        """
+        チェックポイントから探索の途中経過を復元し、続きを追記できるようにする
+
+        Returns
+        -------
+        state : dict
+            {
+            'root_user': ルートユーザ,
+            'network_keywords': ルートユーザのディスクリプションの単語リスト,
+            'users_info', 'history', 'network': get_networkと同じ,
+            'adj_list': それまでの隣接リスト,
+            'queue': 探索キュー(deque),
+            'visited': 探索済みのユーザ数
+            }
+        """
+        self.close()
+        state = None
+        offset = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError('incomplete record')
+                    record = json.loads(line, object_hook=_decode)
+                except ValueError:
+                    # 書き込み中に止まった最後の行は捨てる
+                    break
+                offset += len(line)
+                if record['type'] == 'start':
+                    state = {
+                        'root_user': record['root_user'],
+                        'network_keywords': record['network_keywords'],
+                        'users_info': {record['root_user']: record['root_user_info']},
+                        'history': {record['root_user']: []},
+                        'network': {},
+                        'adj_list': [],
+                        'queue': deque([record['root_user']]),
+                        'visited': 0,
+                    }
+                    continue
+                if state is None or state['queue'][0] != record['user']:
+                    raise ValueError(f'{self.path} is not a valid checkpoint')
+                state['queue'].popleft()
+                state['users_info'].update(record['users_info'])
+                state['history'].update(record['history'])
+                state['network'].update(record['network'])
+                state['queue'].extend(record['queue'])
+                state['adj_list'] += record['adj_list']
+                state['visited'] += 1
+        if state is None:
+            raise ValueError(f'{self.path} is not a valid checkpoint')
+        with open(self.path, 'r+b') as f:
+            f.truncate(offset)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        return state
+
+    def mark(self, crawler, queue, adj_list):
+        """
+        ユーザを探索する前の大きさを記録する(recordに渡す)
+        """
+        return len(crawler.users_info), len(crawler.history), len(crawler.network), len(queue), len(adj_list)
+
+    def record(self, user, crawler, queue, adj_list, sizes):
+        """
+        userを探索して加えたもの(markの後に加えたもの)を書く
+        探索が途中で失敗した場合も、それまでに加えたものを書く
+
+        Parameters
+        ----------
+        user : str
+            探索したユーザ(探索キューから取り出したもの)
+        crawler : GetDescriptionNetwork
+        queue : deque
+            探索キュー
+        adj_list : list
+            隣接リスト
+        sizes : tuple
+            markの返り値
+        """
+        n_users_info, n_history, n_network, n_queue, n_adj_list = sizes
+        self._write({
+            'type': 'visit',
+            'user': user,
+            'users_info': _tail(crawler.users_info, len(crawler.users_info) - n_users_info),
+            'history': _tail(crawler.history, len(crawler.history) - n_history),
+            'network': _tail(crawler.network, len(crawler.network) - n_network),
+            # markの後にuserを取り出しているため、1人少ない状態から加えた分
+            'queue': list(islice(reversed(queue), len(queue) - (n_queue - 1)))[::-1],
+            'adj_list': adj_list[n_adj_list:],
+        })
+        self._pending += 1
+        if self._pending >= self.every:
+            self.flush()
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
@@ -1,8 +1,46 @@
 import MeCab
 from tqdm import tqdm
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import asyncio
 import tweepy
 import datetime
+from twitter.rate_limit import default_scheduler
+from twitter.profile_cache import CachedUser
+from twitter.checkpoint import CrawlCheckpoint
+
+
+def clean_and_tokenize(cleansing, tokenizer, descriptions):
+    """
+    ディスクリプションをまとめてクレンジングし、分かち書きする(executorで実行する)
+    
+    Parameters
+    ----------
+    cleansing : function
+        テキスト(str)をクレンジングする関数
+    tokenizer : function
+        テキストを分かち書きする関数
+    descriptions : list of str
+        ディスクリプションのリスト
+    
+    Returns
+    -------
+    descriptions_clean : list of str
+        クレンジング済みのディスクリプション
+    tokens : list
+        分かち書きした単語のリスト(分かち書きに失敗した場合はNone)
+    """
+    descriptions_clean = [cleansing(description) for description in descriptions]
+    tokens = []
+    for description_clean in descriptions_clean:
+        try:
+            tokens.append(tokenizer(description_clean))
+        except Exception:
+            # 直列のクロールと同じ場所で失敗させるため、探索時に分かち書きし直す
+            tokens.append(None)
+    return descriptions_clean, tokens
+
 
 class GetDescriptionNetwork:
     """
@@ -65,10 +103,19 @@ class GetDescriptionNetwork:
         閾値1以下のユーザ : ノンアクティブユーザ
         閾値1以上、閾値2以下 : ノーマルユーザ
         閾値2以上 : アクティブユーザ
+    lookup_batch_size : int
+        users/lookupで一度に取得するユーザ数(APIの上限は100)
+    scheduler : RateLimitScheduler
+        APIの呼び出しを認証情報に割り振り、上限まで待つ(非同期のクロールでは全てのタスクで共有する)
+    cache : ProfileCache or None
+        プロフィール、フォロワーのidのリスト、分かち書きした単語のキャッシュ
     """
+    lookup_batch_size = 100
+    
     def __init__(self, cleansing, tokenizer, 
                  max_depth=3, max_followers=1000, min_listed_count=0, 
-                 probability=[0.3, 0.8, 1.0], favorite_thres=[0.2, 2.0], tweet_thres=[0.3, 4.4]):
+                 probability=[0.3, 0.8, 1.0], favorite_thres=[0.2, 2.0], tweet_thres=[0.3, 4.4],
+                 scheduler=None, cache=None):
         """
         Parameters
         ----------
@@ -92,13 +139,16 @@ class GetDescriptionNetwork:
             閾値1以下のユーザ : インアクティブユーザ
             閾値1以上、閾値2以下 : ノーマルユーザ
             閾値2以上 : アクティブユーザ
+        scheduler : RateLimitScheduler, optional
+            指定しない場合はkeys_and_tokensの認証情報を使う、GetTweetと共有するスケジューラ(default_scheduler)
+        cache : ProfileCache, optional
+            指定した場合、get_user_info, get_follower_ids, lookup_users, tokenizeはAPIやtokenizerより先にキャッシュを引く
         """
         # keys_and_tokensにtwitterAPIのkeyとtokenが格納してある
         # keys_and_tokens.pyを編集して、API情報を記入する必要がある
-        import twitter.keys_and_tokens as config
-        auth = tweepy.OAuthHandler(config.CONSUMER_KEY, config.CONSUMER_SECRET)
-        auth.set_access_token(config.ACCESS_TOKEN, config.ACCESS_TOKEN_SECRET)
-        self.api = tweepy.API(auth, wait_on_rate_limit=True, retry_count=5)
+        self.scheduler = scheduler or default_scheduler()
+        self.api = self.scheduler.apis[0]
+        self.cache = cache
         
         self.max_depth = max_depth
         self.max_followers = max_followers
@@ -124,8 +174,8 @@ class GetDescriptionNetwork:
         
         Parameters
         ----------
-        screen_name : str
-            twitterでの「@user」
+        screen_name : str or int
+            twitterでの「@user」、またはuser id
         
         Returns
         -------
@@ -148,49 +198,163 @@ class GetDescriptionNetwork:
             'tweet_per_day': 一日あたりのツイート数
             }
         """
+        if self.cache is not None:
+            res = self.cache.get_user(screen_name)
+            if res is not None:
+                return self.make_user_info(res)
         try:
-            res = self.api.get_user(screen_name)
-            elapsed_date = (datetime.datetime.now() - res.created_at).days
-            if elapsed_date == 0:
-                elapsed_date = 1
-            user_info = {
-                'id': res.id,
-                'screen_name': res.screen_name,
-                'location': res.location,
-                'url': res.url,
-                'description': res.description,
-                'description_clean': self.cleansing(res.description),
-                'followers_count': res.followers_count,
-                'friends_count': res.friends_count,
-                'listed_count': res.listed_count,
-                'favourites_count': res.favourites_count,
-                'statuses_count': res.statuses_count,
-                'created_at': res.created_at,
-                'elapsed_date': elapsed_date,
-                'favorite_per_day': res.favourites_count / elapsed_date,
-                'tweet_per_day': res.statuses_count / elapsed_date
-                }
+            res = self.scheduler.call('get_user', screen_name)
+            user_info = self.make_user_info(res)
+            if self.cache is not None:
+                self.cache.put_users([res], [user_info['description_clean']])
             return user_info
         except tweepy.error.TweepError as e:
             print(e.reason)
-            user_info = {
-                'id': None,
-                'screen_name': None,
-                'location': None,
-                'url': None,
-                'description': None,
-                'description_clean': None,
-                'followers_count': None,
-                'friends_count': None,
-                'listed_count': None,
-                'favourites_count': None,
-                'statuses_count': None,
-                'created_at': None,
-                'elapsed_date': None,
-                'favorite_per_day': None,
-                'tweet_per_day': None
-                }
-            return user_info
+            return self.empty_user_info()
+    
+    def make_user_info(self, res, description_clean=None):
+        """
+        APIから得たユーザ(tweepy.models.User)をユーザー情報に変換する
+        
+        Parameters
+        ----------
+        res : tweepy.models.User or CachedUser
+        description_clean : str, optional
+            クレンジング済みの自己紹介文
+            指定しない場合はキャッシュのもの、キャッシュから引いたユーザでない場合はcleansingでクレンジングする
+        
+        Returns
+        -------
+        user_info : dict
+            get_user_infoを参照
+        """
+        if description_clean is None:
+            description_clean = getattr(res, 'description_clean', None)
+        if description_clean is None:
+            description_clean = self.cleansing(res.description)
+        elapsed_date = (datetime.datetime.now() - res.created_at).days
+        if elapsed_date == 0:
+            elapsed_date = 1
+        user_info = {
+            'id': res.id,
+            'screen_name': res.screen_name,
+            'location': res.location,
+            'url': res.url,
+            'description': res.description,
+            'description_clean': description_clean,
+            'followers_count': res.followers_count,
+            'friends_count': res.friends_count,
+            'listed_count': res.listed_count,
+            'favourites_count': res.favourites_count,
+            'statuses_count': res.statuses_count,
+            'created_at': res.created_at,
+            'elapsed_date': elapsed_date,
+            'favorite_per_day': res.favourites_count / elapsed_date,
+            'tweet_per_day': res.statuses_count / elapsed_date
+            }
+        return user_info
+    
+    def empty_user_info(self):
+        """
+        ユーザー情報を取得できなかった場合のユーザー情報(全ての値がNone)
+        
+        Returns
+        -------
+        user_info : dict
+        """
+        user_info = {
+            'id': None,
+            'screen_name': None,
+            'location': None,
+            'url': None,
+            'description': None,
+            'description_clean': None,
+            'followers_count': None,
+            'friends_count': None,
+            'listed_count': None,
+            'favourites_count': None,
+            'statuses_count': None,
+            'created_at': None,
+            'elapsed_date': None,
+            'favorite_per_day': None,
+            'tweet_per_day': None
+            }
+        return user_info
+    
+    def lookup_users(self, user_ids, progress=None):
+        """
+        複数のユーザを、users/lookupでlookup_batch_size人ずつまとめて取得する
+        
+        凍結や削除により取得できなかったユーザは、そのユーザのみNoneになる
+        まとめて取得する呼び出し自体が失敗した場合は、そのまとまりのユーザをusers/showで1人ずつ取得する
+        キャッシュにあるユーザはAPIで取得しない(APIで取得したユーザは保存しないため、呼び出し側で保存する)
+        
+        Parameters
+        ----------
+        user_ids : list of int
+            ユーザのidのリスト
+        progress : tqdm, optional
+            取得したユーザ数だけ進める進捗バー
+        
+        Returns
+        -------
+        users : list of tweepy.models.User or CachedUser
+            user_idsと同じ順のユーザ(取得できなかったユーザはNone)
+        """
+        cached = self.cache.get_users(user_ids) if self.cache is not None else dict()
+        if progress is not None:
+            progress.update(len(cached))
+        missing = [user_id for user_id in user_ids if user_id not in cached]
+        
+        users = []
+        for start in range(0, len(missing), self.lookup_batch_size):
+            batch = missing[start:start + self.lookup_batch_size]
+            try:
+                found = {res.id: res for res in self.scheduler.call('lookup_users', user_ids=batch)}
+            except tweepy.error.TweepError as e:
+                print(e.reason)
+                found = dict()
+                for user_id in batch:
+                    try:
+                        found[user_id] = self.scheduler.call('get_user', user_id)
+                    except tweepy.error.TweepError:
+                        pass
+            # 凍結・削除されたユーザは返ってこないため、バッチごとにまとめて表示する
+            not_found = [user_id for user_id in batch if user_id not in found]
+            if not_found:
+                print(f'{len(not_found)} users not found : {not_found}')
+            users += [found.get(user_id) for user_id in batch]
+            if progress is not None:
+                progress.update(len(batch))
+        
+        # user_idsの順に並べ直す
+        fetched = iter(users)
+        return [cached[user_id] if user_id in cached else next(fetched) for user_id in user_ids]
+    
+    def lookup_users_info(self, user_ids, progress=None):
+        """
+        複数のユーザー情報を、users/lookupでlookup_batch_size人ずつまとめて取得する
+        取得できなかったユーザは、そのユーザのみ全ての値がNoneのユーザー情報になる(lookup_usersを参照)
+        
+        Parameters
+        ----------
+        user_ids : list of int
+            ユーザのidのリスト
+        progress : tqdm, optional
+            取得したユーザ数だけ進める進捗バー
+        
+        Returns
+        -------
+        user_info_list : list of dict
+            user_idsと同じ順のユーザー情報(get_user_infoを参照)
+        """
+        users = self.lookup_users(user_ids, progress)
+        user_info_list = [self.make_user_info(res) if res is not None else self.empty_user_info() for res in users]
+        if self.cache is not None:
+            fetched = [(res, user_info) for res, user_info in zip(users, user_info_list)
+                       if res is not None and not isinstance(res, CachedUser)]
+            self.cache.put_users([res for res, _ in fetched], [user_info['description_clean'] for _, user_info in fetched])
+        return user_info_list
 
 
 
@@ -208,10 +372,19 @@ class GetDescriptionNetwork:
         follower_id_list : list
             フォロワーのidのリスト
         """
+        if self.cache is not None:
+            follower_id_list = self.cache.get_follower_ids(screen_name)
+            if follower_id_list is not None:
+                return follower_id_list
         try:
-            #Cursorを使ってフォロワーのidを逐次的に取得
-            follower_ids = tweepy.Cursor(self.api.followers_ids, screen_name=screen_name, cursor=-1).items()
-            follower_id_list = [followers_id for followers_id in follower_ids]
+            # カーソルでページごとにフォロワーのidを逐次的に取得
+            follower_id_list = []
+            cursor = -1
+            while cursor != 0:
+                ids, (_, cursor) = self.scheduler.call('followers_ids', screen_name=screen_name, cursor=cursor)
+                follower_id_list += ids
+            if self.cache is not None:
+                self.cache.put_follower_ids(screen_name, follower_id_list)
             return follower_id_list
             
         except tweepy.error.TweepError as e:
@@ -236,10 +409,11 @@ class GetDescriptionNetwork:
         # フォロワーのid情報を取得する
         follower_ids = self.get_follower_ids(screen_name)
         
-        # id情報からユーザの情報を取得する
-        progress = tqdm(follower_ids, leave=False)
+        # id情報からユーザの情報を、lookup_batch_size人ずつまとめて取得する
+        progress = tqdm(total=len(follower_ids), leave=False)
         progress.set_description(f'current user : {screen_name}')
-        user_info_list = [self.get_user_info(user_id) for user_id in progress]
+        user_info_list = self.lookup_users_info(follower_ids, progress)
+        progress.close()
 
         return user_info_list
     
@@ -321,13 +495,17 @@ class GetDescriptionNetwork:
             to_node_look_prob = 0
         return to_node_look_prob * self.convert_probability(from_node_state) * self.convert_probability(to_node_state)
         
-    def get_network(self, root_user):
+    def get_network(self, root_user, checkpoint=None, checkpoint_every=1):
         """
         Parameters
         ----------
         root_user : str
             screen name 「@(user)」
             ネットワークのルートとするユーザ
+        checkpoint : str, optional
+            指定した場合、探索の途中経過をこのファイルに保存する(止まった場合はresumeで続きから探索する)
+        checkpoint_every : int
+            何人探索するごとにチェックポイントを書き出すか
         
         Returns
         -------
@@ -344,43 +522,333 @@ class GetDescriptionNetwork:
         
         # ルートユーザの情報を取得し、ディスクリプションを単語ごとに分ける
         root_user_info = self.get_user_info(root_user)
-        self.network_keywords = list(set(self.tokenizer(root_user_info['description_clean'])) - set(self.description_stopwords))
+        self.network_keywords = list(set(self.tokenize(root_user_info)) - set(self.description_stopwords))
         self.history = {root_user : []}
         self.network = {}
         
         self.users_info = {root_user: root_user_info}
         adj_list = []
+        queue = deque([root_user])
+        
+        if checkpoint is not None:
+            checkpoint = CrawlCheckpoint(checkpoint, checkpoint_every)
+            checkpoint.start(root_user, root_user_info, self.network_keywords)
+        return self.crawl(queue, adj_list, checkpoint)
+    
+    def resume(self, checkpoint, checkpoint_every=1):
+        """
+        get_networkのチェックポイントから、止まったところの続きを探索する
+        探索済みのユーザのフォロワーは取得し直さない
         
-        # 幅優先探索
+        Parameters
+        ----------
+        checkpoint : str
+            get_networkのcheckpointに指定したファイル(続きも追記する)
+        checkpoint_every : int
+            何人探索するごとにチェックポイントを書き出すか
+        
+        Returns
+        -------
+        get_networkを参照
+        """
+        checkpoint = CrawlCheckpoint(checkpoint, checkpoint_every)
+        queue, adj_list = self.restore(checkpoint)
+        return self.crawl(queue, adj_list, checkpoint)
+    
+    def restore(self, checkpoint):
+        """
+        チェックポイントからnetwork_keywords, users_info, history, networkを復元する
+        
+        Parameters
+        ----------
+        checkpoint : CrawlCheckpoint
+        
+        Returns
+        -------
+        queue : deque
+            探索キュー
+        adj_list : list of list
+            それまでの隣接リスト
+        """
+        state = checkpoint.load()
+        self.network_keywords = state['network_keywords']
+        self.users_info = state['users_info']
+        self.history = state['history']
+        self.network = state['network']
+        print(f"resume : {state['visited']} users visited, {len(state['queue'])} users in queue")
+        return state['queue'], state['adj_list']
+    
+    def crawl(self, queue, adj_list, checkpoint=None):
+        """
+        探索キューが空になるまで幅優先探索する
+        
+        Parameters
+        ----------
+        queue : deque
+            探索キュー
+        adj_list : list of list
+            隣接リスト
+        checkpoint : CrawlCheckpoint, optional
+            探索したユーザごとに途中経過を書く
+        
+        Returns
+        -------
+        get_networkを参照
+        """
+        try:
+            # 幅優先探索
+            while queue:
+                if checkpoint is not None:
+                    sizes = checkpoint.mark(self, queue, adj_list)
+                user_pointed = queue.popleft()
+                
+                try:
+                    followers_info = self.get_follower_info(user_pointed)
+                    self.visit(user_pointed, followers_info, queue, adj_list)
+                
+                except Exception as e:
+                    print('error')
+                    print(e)
+                if checkpoint is not None:
+                    checkpoint.record(user_pointed, self, queue, adj_list, sizes)
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+        
+        if self.cache is not None:
+            print(f'profile cache : {self.cache.stats()}')
+        return adj_list, self.users_info
+    
+    def tokenize(self, user_info):
+        """
+        ユーザのクレンジング済みの自己紹介文を分かち書きする
+        キャッシュがある場合は先に引き、なければtokenizerで分かち書きしてキャッシュに保存する
+        
+        Parameters
+        ----------
+        user_info : dict
+            ユーザー情報(get_user_infoを参照)
+        
+        Returns
+        -------
+        tokens : list
+            分かち書きした単語
+        """
+        if self.cache is None or user_info['id'] is None:
+            return self.tokenizer(user_info['description_clean'])
+        tokens = self.cache.get_tokens(user_info['id'])
+        if tokens is None:
+            tokens = self.tokenizer(user_info['description_clean'])
+            self.cache.put_tokens(user_info['id'], tokens)
+        return tokens
+    
+    def visit(self, user_pointed, followers_info, queue, adj_list, tokens=None):
+        """
+        user_pointedのフォロワーをネットワークに加え、枝かりで残ったフォロワーを探索キューに入れる
+        
+        Parameters
+        ----------
+        user_pointed : str
+            探索中のユーザ
+        followers_info : list of dict
+            user_pointedのフォロワーのユーザー情報
+        queue : deque
+            探索キュー
+        adj_list : list of list
+            隣接リスト(user_pointedからの枝を加える)
+        tokens : list, optional
+            followers_infoと同じ順の分かち書き済みのディスクリプション
+            指定しない場合、またはNoneの要素はtokenizeで分かち書きする
+        """
+        self.network[user_pointed] = [follower_info['screen_name'] for follower_info in followers_info]
+        
+        for j, follower_info in enumerate(followers_info):
+            if follower_info['screen_name'] not in self.users_info:
+                if tokens is not None and tokens[j] is not None:
+                    follower_description_tokenize = tokens[j]
+                else:
+                    follower_description_tokenize = self.tokenize(follower_info)
+                self.users_info[follower_info['screen_name']] = follower_info
+                self.history[follower_info['screen_name']] = self.history[user_pointed] + [user_pointed]
+                
+                # 枝かり
+                if len((set(follower_description_tokenize) & set(self.network_keywords))) > 0  and \
+                (follower_info['listed_count'] >= self.min_listed_count) and \
+                (len(self.history[follower_info['screen_name']]) < self.max_depth):
+                    # フォロワーが多すぎるため、枝かりをする(情報として、取っておきたい)
+                    if follower_info['followers_count'] <= self.max_followers:
+                        queue.append(follower_info['screen_name'])
+                    else:
+                        self.network[follower_info['screen_name']] = follower_info['followers_count']
+        
+        adj_list += [[user_pointed, to_node, self.set_probability(user_pointed, to_node)]
+                     for to_node in self.network[user_pointed]]
+    
+    async def fetch_followers_async(self, screen_name, io_executor, cpu_executor):
+        """
+        フォロワーのユーザー情報と分かち書き済みのディスクリプションを取得する
+        APIの呼び出しはio_executor、クレンジングと分かち書きはcpu_executorで実行する
+        
+        Returns
+        -------
+        followers_info : list of dict
+            get_follower_infoと同じユーザー情報
+        tokens : list
+            followers_infoと同じ順の分かち書き済みのディスクリプション(取得できなかったユーザはNone)
+        """
+        loop = asyncio.get_running_loop()
+        follower_ids = await loop.run_in_executor(io_executor, self.get_follower_ids, screen_name)
+        users = await loop.run_in_executor(io_executor, self.lookup_users, follower_ids)
+        
+        # キャッシュから引いたユーザはクレンジングと分かち書きをし直さない
+        found = [res for res in users if res is not None and not isinstance(res, CachedUser)]
+        descriptions_clean, found_tokens = await loop.run_in_executor(
+            cpu_executor, clean_and_tokenize, self.cleansing, self.tokenizer, [res.description for res in found])
+        if self.cache is not None:
+            self.cache.put_users(found, descriptions_clean, found_tokens)
+        
+        followers_info = []
+        tokens = []
+        it = iter(zip(descriptions_clean, found_tokens))
+        for res in users:
+            if res is None:
+                followers_info.append(self.empty_user_info())
+                tokens.append(None)
+            elif isinstance(res, CachedUser):
+                followers_info.append(self.make_user_info(res))
+                tokens.append(res.tokens)
+            else:
+                description_clean, token = next(it)
+                followers_info.append(self.make_user_info(res, description_clean))
+                tokens.append(token)
+        return followers_info, tokens
+    
+    async def get_network_async(self, root_user, concurrency=4, executor=None, checkpoint=None, checkpoint_every=1):
+        """
+        get_networkと同じネットワークを、複数のユーザのフォロワーを並行して取得しながら探索する
+        探索キューの先頭からconcurrency人のフォロワーを先読みし、ネットワークへはキューの順に加えるため、
+        結果(users_info, network, adj_list)とチェックポイントは直列のget_networkと同じになる
+        APIの呼び出しはschedulerを全てのタスクで共有して制限する
+        
+        Parameters
+        ----------
+        root_user : str
+            screen name 「@(user)」
+            ネットワークのルートとするユーザ
+        concurrency : int
+            同時にフォロワーを取得するユーザ数
+        executor : concurrent.futures.Executor, optional
+            クレンジングと分かち書きを実行するexecutor
+            指定しない場合は1スレッドで実行する(MeCabのTaggerをスレッド間で共有しないため)
+            ProcessPoolExecutorを使う場合は、cleansingとtokenizerがpickle可能である必要がある
+        checkpoint : str, optional
+            指定した場合、探索の途中経過をこのファイルに保存する(resume, resume_asyncで続きから探索する)
+        checkpoint_every : int
+            何人探索するごとにチェックポイントを書き出すか
+        
+        Returns
+        -------
+        get_networkを参照
+        
+        Example
+        -------
+        >>> adj_list, users_info = asyncio.run(gdn.get_network_async('user', concurrency=8))
+        jupyterなどイベントループが動いている場合
+        >>> adj_list, users_info = await gdn.get_network_async('user', concurrency=8)
+        """
+        if concurrency < 1:
+            raise ValueError('concurrency must be at least 1')
+        loop = asyncio.get_running_loop()
+        # ルートユーザの情報を取得し、ディスクリプションを単語ごとに分ける
+        # 他の分かち書きと並行しないため、キャッシュを引くtokenizeをそのまま使う
+        root_user_info = await loop.run_in_executor(None, self.get_user_info, root_user)
+        root_tokens = await loop.run_in_executor(None, self.tokenize, root_user_info)
+        self.network_keywords = list(set(root_tokens) - set(self.description_stopwords))
+        self.history = {root_user : []}
+        self.network = {}
+        
+        self.users_info = {root_user: root_user_info}
+        adj_list = []
         queue = deque([root_user])
-        while queue:
-            user_pointed = queue.popleft()
-            
-            try:
-                followers_info = self.get_follower_info(user_pointed)
-                self.network[user_pointed] = [follower_info['screen_name'] for follower_info in followers_info]
+        
+        if checkpoint is not None:
+            checkpoint = CrawlCheckpoint(checkpoint, checkpoint_every)
+            checkpoint.start(root_user, root_user_info, self.network_keywords)
+        return await self.crawl_async(queue, adj_list, concurrency, executor, checkpoint)
+    
+    async def resume_async(self, checkpoint, concurrency=4, executor=None, checkpoint_every=1):
+        """
+        resumeと同じく、チェックポイントから止まったところの続きを、get_network_asyncと同じく並行して探索する
+        
+        Parameters
+        ----------
+        checkpoint : str
+            get_network(_async)のcheckpointに指定したファイル(続きも追記する)
+        concurrency, executor, checkpoint_every
+            get_network_asyncを参照
+        
+        Returns
+        -------
+        get_networkを参照
+        """
+        if concurrency < 1:
+            raise ValueError('concurrency must be at least 1')
+        checkpoint = CrawlCheckpoint(checkpoint, checkpoint_every)
+        queue, adj_list = self.restore(checkpoint)
+        return await self.crawl_async(queue, adj_list, concurrency, executor, checkpoint)
+    
+    async def crawl_async(self, queue, adj_list, concurrency, executor=None, checkpoint=None):
+        """
+        crawlと同じ幅優先探索を、探索キューの先頭concurrency人のフォロワーを先読みしながら行う
+        
+        Parameters
+        ----------
+        queue, adj_list, checkpoint
+            crawlを参照
+        concurrency, executor
+            get_network_asyncを参照
+        
+        Returns
+        -------
+        get_networkを参照
+        """
+        io_executor = ThreadPoolExecutor(max_workers=concurrency)
+        cpu_executor = executor or ThreadPoolExecutor(max_workers=1)
+        pending = {}
+        try:
+            # 幅優先探索
+            progress = tqdm(leave=False)
+            while queue:
+                # キューの先頭concurrency人のフォロワーを先読みする
+                for user in islice(queue, concurrency):
+                    if user not in pending:
+                        pending[user] = asyncio.ensure_future(
+                            self.fetch_followers_async(user, io_executor, cpu_executor))
+                if checkpoint is not None:
+                    sizes = checkpoint.mark(self, queue, adj_list)
+                user_pointed = queue.popleft()
+                progress.set_description(f'current user : {user_pointed}')
                 
-                for follower_info in followers_info:
-                    if follower_info['screen_name'] not in self.users_info:
-                        follower_description_tokenize = self.tokenizer(follower_info['description_clean'])
-                        self.users_info[follower_info['screen_name']] = follower_info
-                        self.history[follower_info['screen_name']] = self.history[user_pointed] + [user_pointed]
-                        
-                        # 枝かり
-                        if len((set(follower_description_tokenize) & set(self.network_keywords))) > 0  and \
-                        (follower_info['listed_count'] >= self.min_listed_count) and \
-                        (len(self.history[follower_info['screen_name']]) < self.max_depth):
-                            # フォロワーが多すぎるため、枝かりをする(情報として、取っておきたい)
-                            if follower_info['followers_count'] <= self.max_followers:
-                                queue.append(follower_info['screen_name'])
-                            else:
-                                self.network[follower_info['screen_name']] = follower_info['followers_count']
+                try:
+                    followers_info, tokens = await pending.pop(user_pointed)
+                    self.visit(user_pointed, followers_info, queue, adj_list, tokens)
                 
-                adj_list += [[user_pointed, to_node, self.set_probability(user_pointed, to_node)]
-                             for to_node in self.network[user_pointed]]
-            
-            except Exception as e:
-                print('error')
-                print(e)
+                except Exception as e:
+                    print('error')
+                    print(e)
+                if checkpoint is not None:
+                    checkpoint.record(user_pointed, self, queue, adj_list, sizes)
+                progress.update(1)
+            progress.close()
+        finally:
+            for task in pending.values():
+                task.cancel()
+            io_executor.shutdown(wait=False)
+            if executor is None:
+                cpu_executor.shutdown(wait=False)
+            if checkpoint is not None:
+                checkpoint.close()
         
-        return adj_list, self.users_info
\ No newline at end of file
+        if self.cache is not None:
+            print(f'profile cache : {self.cache.stats()}')
+        return adj_list, self.users_info
@@ -1,5 +1,5 @@
-import tweepy
 import pandas as pd
+from twitter.rate_limit import default_scheduler
 
 class GetTweet:
     """
@@ -9,19 +9,44 @@ class GetTweet:
     ----------
     api : 
         twitter API情報
+    scheduler : RateLimitScheduler
+        APIの呼び出しを認証情報に割り振り、上限まで待つ
     """
     
-    def __init__(self):
+    def __init__(self, scheduler=None):
         """
         keys_and_tokensにtwitterAPIのkeyとtokenが格納してある
         keys_and_tokens.pyを編集して、API情報を記入する必要がある
+        
+        Parameters
+        ----------
+        scheduler : RateLimitScheduler, optional
+            指定しない場合はkeys_and_tokensの認証情報を使う、GetDescriptionNetworkと共有するスケジューラ(default_scheduler)
         """
-        import twitter.keys_and_tokens as config
-
-        auth = tweepy.OAuthHandler(config.CONSUMER_KEY, config.CONSUMER_SECRET)
-        auth.set_access_token(config.ACCESS_TOKEN, config.ACCESS_TOKEN_SECRET)
+        self.scheduler = scheduler or default_scheduler()
+        self.api = self.scheduler.apis[0]
+    
+    def pages(self, method, **kwargs):
+        """
+        max_idでページをたどり、schedulerでmethodを呼び出してツイートを逐次的に取得する
+        (tweepy.Cursor(...).items()と同じ順)
         
-        self.api = tweepy.API(auth, wait_on_rate_limit = True, retry_count=5)
+        Parameters
+        ----------
+        method : str
+            'user_timeline' or 'search'
+        **kwargs
+            methodの引数
+        """
+        max_id = None
+        while True:
+            if max_id is not None:
+                kwargs['max_id'] = max_id
+            page = self.scheduler.call(method, **kwargs)
+            if len(page) == 0:
+                return
+            yield from page
+            max_id = page[-1].id - 1
     
     def get_tweets_target(self, target):
         """
@@ -38,7 +63,7 @@ class GetTweet:
             {"tweet_id": , "created_at": , "text": , "favorite_count": , "retweet_count": }
         """
         tweets = {"tweet_id": [], "created_at": [], "text": [], "favorite_count": [], "retweet_count": []}
-        for tweet in tweepy.Cursor(self.api.user_timeline, screen_name = target, exclude_replies = True).items():
+        for tweet in self.pages('user_timeline', screen_name = target, exclude_replies = True):
             tweets["tweet_id"].append(tweet.id)
             tweets["created_at"].append(tweet.created_at)
             tweets["text"].append(tweet.text)
@@ -84,7 +109,7 @@ class GetTweet:
             "favorite_count": [], 
             "retweet_count": []
         }
-        for tweet in tweepy.Cursor(self.api.search, q=keyword, include_entities=True, tweet_mode='extended', lang='ja').items():
+        for tweet in self.pages('search', q=keyword, include_entities=True, tweet_mode='extended', lang='ja'):
             tweets["tweet_id"].append(tweet.id)
             tweets["created_at"].append(tweet.created_at)
             tweets["screen_name"].append(tweet.user.screen_name)
@@ -0,0 +1,308 @@
+import json
+import time
+import types
+import sqlite3
+import datetime
+import threading
+from collections import defaultdict
+
+# キャッシュするtweepy.models.Userの属性(elapsed_dateなどはユーザー情報を作るときに計算し直す)
+PROFILE_FIELDS = ('id', 'screen_name', 'location', 'url', 'description', 'followers_count', 'friends_count',
+                  'listed_count', 'favourites_count', 'statuses_count', 'created_at')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS profiles (
+    id INTEGER PRIMARY KEY,
+    screen_name TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    description_clean TEXT,
+    tokens TEXT,
+    fetched REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS profiles_screen_name ON profiles (screen_name);
+CREATE INDEX IF NOT EXISTS profiles_accessed ON profiles (accessed);
+CREATE TABLE IF NOT EXISTS followers (
+    screen_name TEXT PRIMARY KEY,
+    ids TEXT NOT NULL,
+    fetched REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS followers_accessed ON followers (accessed);
+'''
+
+
+class CachedUser(types.SimpleNamespace):
+    """
+    キャッシュから引いたユーザ
+    tweepy.models.Userと同じ属性(PROFILE_FIELDS)と、description_clean, tokens(分かち書きしていない場合はNone)を持つ
+    """
+
+
+class ProfileCache:
+    """
+    ユーザのプロフィールとフォロワーのidのリストをSQLiteに保存するキャッシュ
+    プロフィールはユーザのidとscreen_name(大文字と小文字を区別しない)で引き、
+    APIから得た属性(PROFILE_FIELDS)とクレンジング済みの自己紹介文、分かち書きした単語を保持する
+    クレンジング済みの自己紹介文と単語は、作成したcleansing, tokenizerを変えた場合はclearで消す必要がある
+
+    取得からttl秒経ったものは使わず(ヒットしない)、max_entriesを超えたものは最後に使った時刻が古い順に消す
+    スレッドセーフなので、非同期のクロールのexecutorから使える
+
+    Attributes
+    ----------
+    path : str
+        SQLiteのファイル(':memory:'ならメモリ上)
+    ttl : float
+        プロフィールの有効期間(秒)
+    followers_ttl : float
+        フォロワーのidのリストの有効期間(秒)
+    max_entries : int or None
+        テーブルごとの最大の件数(Noneなら上限なし)
+    hits : dict
+        {'profiles', 'followers', 'tokens' : ヒットした回数}
+    misses : dict
+        {'profiles', 'followers', 'tokens' : ヒットしなかった回数}
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 60 * 60, followers_ttl=None, max_entries=None, clock=time.time):
+        """
+        Parameters
+        ----------
+        path : str
+            SQLiteのファイル
+        ttl : float
+            プロフィールの有効期間(秒)、デフォルトは7日
+        followers_ttl : float, optional
+            フォロワーのidのリストの有効期間(秒)、指定しない場合はttl
+        max_entries : int, optional
+            テーブルごとの最大の件数
+        clock : callable
+            現在時刻(UNIX時間)を返す関数
+        """
+        self.path = path
+        self.ttl = ttl
+        self.followers_ttl = ttl if followers_ttl is None else followers_ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def _record(self, kind, hit, n=1):
+        if hit:
+            self.hits[kind] += n
+        else:
+            self.misses[kind] += n
+
+    def _user(self, row):
+        # プロフィールをtweepy.models.Userと同じ属性を持つオブジェクトに戻す
+        profile, description_clean, tokens = row
+        profile = json.loads(profile)
+        if profile['created_at'] is not None:
+            profile['created_at'] = datetime.datetime.fromisoformat(profile['created_at'])
+        user = CachedUser(**profile)
+        user.description_clean = description_clean
+        user.tokens = None if tokens is None else json.loads(tokens)
+        return user
+
+    def get_users(self, user_ids):
+        """
+        idからプロフィールを引く
+
+        Parameters
+        ----------
+        user_ids : list of int
+
+        Returns
+        -------
+        users : dict
+            {id : CachedUser}、ヒットしなかったidは含まない
+        """
+        now = self.clock()
+        users = dict()
+        with self._lock, self._conn:
+            # SQLiteの変数の上限を超えないように分けて引く
+            for start in range(0, len(user_ids), 500):
+                batch = list(user_ids[start:start + 500])
+                rows = self._conn.execute(
+                    f'SELECT id, profile, description_clean, tokens FROM profiles '
+                    f'WHERE id IN ({",".join("?" * len(batch))}) AND fetched >= ?',
+                    batch + [now - self.ttl]).fetchall()
+                users.update((row[0], self._user(row[1:])) for row in rows)
+                self._conn.executemany('UPDATE profiles SET accessed = ? WHERE id = ?',
+                                       [(now, row[0]) for row in rows])
+            self._record('profiles', True, len(users))
+            self._record('profiles', False, len(user_ids) - len(users))
+        return users
+
+    def get_user(self, screen_name):
+        """
+        screen_nameからプロフィールを引く
+
+        Parameters
+        ----------
+        screen_name : str or int
+            screen_name(intの場合はidとして引く)
+
+        Returns
+        -------
+        user : CachedUser or None
+            ヒットしなかった場合はNone
+        """
+        if isinstance(screen_name, int):
+            return self.get_users([screen_name]).get(screen_name)
+        now = self.clock()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT id, profile, description_clean, tokens FROM profiles '
+                'WHERE screen_name = ? AND fetched >= ? ORDER BY fetched DESC LIMIT 1',
+                (str(screen_name).lower(), now - self.ttl)).fetchone()
+            if row is not None:
+                self._conn.execute('UPDATE profiles SET accessed = ? WHERE id = ?', (now, row[0]))
+            self._record('profiles', row is not None)
+        return None if row is None else self._user(row[1:])
+
+    def put_users(self, users, descriptions_clean, tokens=None):
+        """
+        APIから得たプロフィールを保存する
+        自己紹介文が変わっていない場合は、保存済みの分かち書きした単語を残す
+
+        Parameters
+        ----------
+        users : list of tweepy.models.User
+        descriptions_clean : list of str
+            usersと同じ順のクレンジング済みの自己紹介文
+        tokens : list, optional
+            usersと同じ順の分かち書きした単語(Noneの要素は保存しない)
+        """
+        if tokens is None:
+            tokens = [None] * len(users)
+        now = self.clock()
+        rows = []
+        for user, description_clean, token in zip(users, descriptions_clean, tokens):
+            profile = {name: getattr(user, name) for name in PROFILE_FIELDS}
+            if profile['created_at'] is not None:
+                profile['created_at'] = profile['created_at'].isoformat()
+            rows.append((user.id, user.screen_name.lower(), json.dumps(profile, ensure_ascii=False),
+                         description_clean, None if token is None else json.dumps(token, ensure_ascii=False),
+                         now, now))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT INTO profiles (id, screen_name, profile, description_clean, tokens, fetched, accessed) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (id) DO UPDATE SET screen_name = excluded.screen_name, profile = excluded.profile, '
+                'tokens = CASE WHEN excluded.tokens IS NOT NULL THEN excluded.tokens '
+                'WHEN description_clean IS excluded.description_clean THEN tokens END, '
+                'description_clean = excluded.description_clean, '
+                'fetched = excluded.fetched, accessed = excluded.accessed', rows)
+            self._evict('profiles', 'id')
+
+    def get_tokens(self, user_id):
+        """
+        idから分かち書きした単語を引く
+
+        Returns
+        -------
+        tokens : list or None
+            ヒットしなかった場合はNone
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT tokens FROM profiles WHERE id = ? AND fetched >= ?',
+                                     (user_id, self.clock() - self.ttl)).fetchone()
+            hit = row is not None and row[0] is not None
+            self._record('tokens', hit)
+        return json.loads(row[0]) if hit else None
+
+    def put_tokens(self, user_id, tokens):
+        """
+        保存済みのプロフィールに分かち書きした単語を加える(プロフィールがない場合は何もしない)
+        """
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE profiles SET tokens = ? WHERE id = ?',
+                               (json.dumps(tokens, ensure_ascii=False), user_id))
+
+    def get_follower_ids(self, screen_name):
+        """
+        screen_nameのフォロワーのidのリストを引く
+
+        Returns
+        -------
+        follower_ids : list of int or None
+            ヒットしなかった場合はNone
+        """
+        now = self.clock()
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT ids FROM followers WHERE screen_name = ? AND fetched >= ?',
+                                     (screen_name.lower(), now - self.followers_ttl)).fetchone()
+            if row is not None:
+                self._conn.execute('UPDATE followers SET accessed = ? WHERE screen_name = ?',
+                                   (now, screen_name.lower()))
+            self._record('followers', row is not None)
+        return None if row is None else json.loads(row[0])
+
+    def put_follower_ids(self, screen_name, follower_ids):
+        """
+        screen_nameのフォロワーのidのリストを保存する
+        """
+        now = self.clock()
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO followers (screen_name, ids, fetched, accessed) '
+                               'VALUES (?, ?, ?, ?)', (screen_name.lower(), json.dumps(follower_ids), now, now))
+            self._evict('followers', 'screen_name')
+
+    def _evict(self, table, key):
+        # 最後に使った時刻が古い順にmax_entriesを超えた分を消す
+        if self.max_entries is None:
+            return
+        over = self._conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] - self.max_entries
+        if over > 0:
+            self._conn.execute(f'DELETE FROM {table} WHERE {key} IN '
+                               f'(SELECT {key} FROM {table} ORDER BY accessed LIMIT ?)', (over,))
+
+    def purge(self):
+        """
+        有効期間が過ぎたものを消す
+
+        Returns
+        -------
+        n : int
+            消した件数
+        """
+        now = self.clock()
+        with self._lock, self._conn:
+            n = self._conn.execute('DELETE FROM profiles WHERE fetched < ?', (now - self.ttl,)).rowcount
+            n += self._conn.execute('DELETE FROM followers WHERE fetched < ?', (now - self.followers_ttl,)).rowcount
+        return n
+
+    def clear(self):
+        """
+        全て消す
+        """
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM profiles')
+            self._conn.execute('DELETE FROM followers')
+
+    def stats(self):
+        """
+        ヒットした回数とヒットしなかった回数
+
+        Returns
+        -------
+        stats : dict
+            {'profiles' or 'followers' or 'tokens' : {'hits': 回数, 'misses': 回数, 'hit_rate': 割合}}
+        """
+        stats = dict()
+        with self._lock:
+            hits, misses = dict(self.hits), dict(self.misses)
+        for kind in ('profiles', 'followers', 'tokens'):
+            hit, miss = hits.get(kind, 0), misses.get(kind, 0)
+            stats[kind] = {'hits': hit, 'misses': miss, 'hit_rate': hit / (hit + miss) if hit + miss > 0 else None}
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
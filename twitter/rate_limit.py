@@ -0,0 +1,264 @@
+import time
+import threading
+from collections import defaultdict
+import tweepy
+
+# 15分間の窓あたりのリクエスト数の上限(ユーザ認証, API v1.1)
+RATE_LIMITS = {
+    'users/show': 900,
+    'users/lookup': 900,
+    'followers/ids': 15,
+    'statuses/user_timeline': 900,
+    'search/tweets': 180,
+}
+# 上限が設定されている窓の長さ(秒)
+WINDOW = 15 * 60
+# tweepyが呼び出し直すステータスコード(429はスケジューラが別の認証情報に割り振り直すため含めない)
+RETRY_ERRORS = {500, 502, 503, 504}
+# tweepy.APIのメソッド名 -> エンドポイント
+ENDPOINTS = {
+    'get_user': 'users/show',
+    'lookup_users': 'users/lookup',
+    'followers_ids': 'followers/ids',
+    'user_timeline': 'statuses/user_timeline',
+    'search': 'search/tweets',
+}
+
+
+class TokenBucket:
+    """
+    トークンバケット
+    capacity個までトークンを貯め、1秒あたりrate個ずつ補充する
+
+    Attributes
+    ----------
+    capacity : float
+        貯められるトークンの最大数
+    rate : float
+        1秒あたりに補充するトークン数
+    tokens : float
+        現在のトークン数
+    updated : float
+        最後に補充した時刻
+    """
+
+    def __init__(self, capacity, rate, now):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self, now):
+        """
+        トークンを1つ取り出せるまでの秒数(取り出せる場合は0)
+        """
+        self.refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        """
+        トークンを1つ取り出す
+
+        Returns
+        -------
+        wait : float
+            取り出せた場合は0, 取り出せなかった場合はトークンが貯まるまでの秒数
+        """
+        wait = self.wait(now)
+        if wait == 0:
+            self.tokens -= 1
+        return wait
+
+    def drain(self, until):
+        """
+        時刻untilまでトークンを補充しない(429が返ってきた場合)
+        """
+        self.tokens = 0
+        self.updated = max(self.updated, until)
+
+
+class RateLimitScheduler:
+    """
+    エンドポイントと認証情報(tweepy.API)ごとのトークンバケットで、APIの呼び出しを割り振る
+    呼び出しは残りのトークンが最も多い認証情報に割り振り、全ての認証情報でトークンがない場合のみ待つ
+    スレッドセーフで、待つ間はロックを持たないため、あるエンドポイントが上限に達していても他のエンドポイントの呼び出しは進む
+    GetTweetとGetDescriptionNetworkはdefault_schedulerで1つを共有する
+
+    Attributes
+    ----------
+    apis : list of tweepy.API
+        認証情報ごとのAPI(wait_on_rate_limit=Falseで作成する)
+    limits : dict
+        {エンドポイント : 窓あたりの上限}
+    window : float
+        窓の長さ(秒)
+    calls : dict
+        {エンドポイント : 呼び出し回数}
+    waits : dict
+        {エンドポイント : トークンを待った秒数の合計}
+    throttled : dict
+        {エンドポイント : 429(RateLimitError)が返ってきた回数}
+    """
+
+    def __init__(self, apis, limits=None, window=WINDOW, clock=time.monotonic, sleep=time.sleep):
+        """
+        Parameters
+        ----------
+        apis : list of tweepy.API
+            認証情報ごとのAPI
+        limits : dict, optional
+            {エンドポイント : 窓あたりの上限}、指定しない場合はRATE_LIMITS
+            limitsにないエンドポイントは制限しない
+        window : float
+            窓の長さ(秒)
+        clock : callable
+            現在時刻(秒)を返す関数
+        sleep : callable
+            指定した秒数待つ関数
+        """
+        if len(apis) == 0:
+            raise ValueError('at least one credential is required')
+        self.apis = list(apis)
+        self.limits = dict(RATE_LIMITS if limits is None else limits)
+        self.window = window
+        self.clock = clock
+        self.sleep = sleep
+        self.calls = defaultdict(int)
+        self.waits = defaultdict(float)
+        self.throttled = defaultdict(int)
+        self._lock = threading.Lock()
+        self._buckets = dict()
+
+    def _bucket(self, endpoint, c, now):
+        if (endpoint, c) not in self._buckets:
+            limit = self.limits[endpoint]
+            self._buckets[endpoint, c] = TokenBucket(limit, limit / self.window, now)
+        return self._buckets[endpoint, c]
+
+    def acquire(self, endpoint):
+        """
+        endpointを1回呼び出せる認証情報を選ぶ(全ての認証情報でトークンがない場合は待つ)
+
+        Parameters
+        ----------
+        endpoint : str
+            'followers/ids'など
+
+        Returns
+        -------
+        c : int
+            apis上の認証情報のindex
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                if endpoint not in self.limits:
+                    self.calls[endpoint] += 1
+                    return 0
+                now = self.clock()
+                buckets = [self._bucket(endpoint, c, now) for c in range(len(self.apis))]
+                waits = [bucket.wait(now) for bucket in buckets]
+                c = min(range(len(buckets)), key=lambda c: (waits[c], -buckets[c].tokens))
+                if waits[c] == 0:
+                    buckets[c].take(now)
+                    self.calls[endpoint] += 1
+                    self.waits[endpoint] += waited
+                    return c
+            self.sleep(waits[c])
+            waited += waits[c]
+
+    def call(self, method, *args, **kwargs):
+        """
+        tweepy.APIのメソッドを、トークンが残っている認証情報で呼び出す
+        429が返ってきた場合は、その認証情報のエンドポイントをリセット時刻まで使わず、別の認証情報で呼び出し直す
+
+        Parameters
+        ----------
+        method : str
+            tweepy.APIのメソッド名(ENDPOINTSのキー)
+        *args, **kwargs
+            メソッドの引数
+
+        Example
+        -------
+        >>> scheduler.call('get_user', 'user')
+        """
+        endpoint = ENDPOINTS.get(method, method)
+        while True:
+            c = self.acquire(endpoint)
+            try:
+                return getattr(self.apis[c], method)(*args, **kwargs)
+            except tweepy.error.RateLimitError as e:
+                self._throttle(endpoint, c, e.response)
+
+    def _throttle(self, endpoint, c, response):
+        # リセット時刻(UNIX時間)が分からない場合は窓の長さだけ使わない
+        # api.last_responseは同じ認証情報を使う他のスレッドに上書きされるため、例外のレスポンスを使う
+        delay = self.window
+        reset = getattr(response, 'headers', None) or {}
+        reset = reset.get('x-rate-limit-reset')
+        if reset is not None:
+            delay = min(max(float(reset) - time.time(), 0) + 1, self.window)
+        with self._lock:
+            self.throttled[endpoint] += 1
+            if endpoint in self.limits:
+                now = self.clock()
+                self._bucket(endpoint, c, now).drain(now + delay)
+
+    def metrics(self):
+        """
+        エンドポイントごとの呼び出し回数、待った秒数、429の回数
+
+        Returns
+        -------
+        metrics : dict
+            {エンドポイント : {'calls': 回数, 'wait': 秒, 'throttled': 回数}}
+        """
+        with self._lock:
+            endpoints = set(self.calls) | set(self.waits) | set(self.throttled)
+            return {endpoint: {'calls': self.calls[endpoint], 'wait': self.waits[endpoint],
+                               'throttled': self.throttled[endpoint]}
+                    for endpoint in sorted(endpoints)}
+
+
+def make_apis(config):
+    """
+    keys_and_tokensの認証情報からtweepy.APIを作成する
+    CREDENTIALS([{'CONSUMER_KEY': , 'CONSUMER_SECRET': , 'ACCESS_TOKEN': , 'ACCESS_TOKEN_SECRET': }, ...])があれば、
+    CONSUMER_KEYなどに加えて全て使う
+
+    Returns
+    -------
+    apis : list of tweepy.API
+    """
+    credentials = [{name: getattr(config, name) for name in
+                    ('CONSUMER_KEY', 'CONSUMER_SECRET', 'ACCESS_TOKEN', 'ACCESS_TOKEN_SECRET')}]
+    credentials += [c for c in getattr(config, 'CREDENTIALS', []) if c not in credentials]
+    apis = []
+    for c in credentials:
+        auth = tweepy.OAuthHandler(c['CONSUMER_KEY'], c['CONSUMER_SECRET'])
+        auth.set_access_token(c['ACCESS_TOKEN'], c['ACCESS_TOKEN_SECRET'])
+        # 上限はスケジューラが管理し、429は別の認証情報に割り振り直すため、tweepyでは待たず、5xxのみ呼び出し直す
+        apis.append(tweepy.API(auth, wait_on_rate_limit=False, retry_count=5, retry_errors=RETRY_ERRORS))
+    return apis
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def default_scheduler():
+    """
+    keys_and_tokensの認証情報を使う、プロセスで共有するスケジューラ
+    keys_and_tokens.pyを編集して、API情報を記入する必要がある
+    """
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            import twitter.keys_and_tokens as config
+            _default_scheduler = RateLimitScheduler(make_apis(config))
+        return _default_scheduler